@@ -0,0 +1,263 @@
+# VisaTier 4.0 - Headless JSON API over the calculation engine
+
+import math
+import numpy as np
+from typing import Dict
+from fastapi import Body, FastAPI, HTTPException, Response
+from fastapi.responses import PlainTextResponse
+
+from engine import (
+    ENHANCED_COUNTRIES, ENHANCED_PROFILES, GOAL_METRICS, RECOMMEND_RANKINGS, ROI_RESULT_CACHE, ROICalculator,
+    Scenario, _SCENARIO_LIMITS, calculate_cached, data_version, goal_seek, recommend_destinations, reference_data,
+    watch_reference_data
+)
+from metrics import METRICS, METRICS_CONTENT_TYPE
+from tracing import current_trace_id, record_error, span, trace_request
+
+# =========================
+# HEADLESS API
+# =========================
+
+API_PORT = 7861
+API_MAX_BATCH = 1000
+API_MAX_ITERATIONS = 1_000_000
+API_SAMPLING = ("pseudo", "sobol")
+API_VARIANCE_REDUCTION = ("antithetic", "control_variate")
+
+def _integer_setting(name: str, value) -> int:
+    """An integer, integral float or integer string; anything else raises ValueError"""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{name} must be an integer")
+    try:
+        number = int(value) if isinstance(value, str) else value
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if isinstance(number, float) and not number.is_integer():
+        raise ValueError(f"{name} must be an integer")
+    return int(number)
+
+def _iterations_setting(value) -> int:
+    return max(1, min(API_MAX_ITERATIONS, _integer_setting("monte_carlo_iterations", value)))
+
+def _seed_setting(value):
+    if value is None:
+        return None
+    seed = _integer_setting("monte_carlo_seed", value)
+    if seed < 0:
+        raise ValueError("monte_carlo_seed must not be negative")
+    return seed
+
+def _sampling_setting(value) -> str:
+    if value not in API_SAMPLING:
+        raise ValueError(f"sampling must be one of {list(API_SAMPLING)}")
+    return value
+
+def _variance_reduction_setting(value) -> tuple:
+    if not isinstance(value, list) or any(technique not in API_VARIANCE_REDUCTION for technique in value):
+        raise ValueError(f"variance_reduction must be a list of {list(API_VARIANCE_REDUCTION)}")
+    return tuple(value)
+
+def _boolean_setting(value) -> bool:
+    # bool("false") is True, so strings are not accepted
+    if not isinstance(value, bool):
+        raise ValueError("global_sensitivity must be true or false")
+    return value
+
+# Engine settings an API request may override, with their validation; invalid values raise ValueError
+API_SETTINGS = {
+    "monte_carlo_iterations": _iterations_setting,
+    "monte_carlo_seed": _seed_setting,
+    "sampling": _sampling_setting,
+    "variance_reduction": _variance_reduction_setting,
+    "global_sensitivity": _boolean_setting
+}
+
+def to_json_compatible(value):
+    """NumPy values to plain Python, non-finite floats to None"""
+    if isinstance(value, dict):
+        return {str(key): to_json_compatible(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [to_json_compatible(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+def evaluate_api_request(payload: Dict) -> Dict:
+    """Numeric results for {"scenario": {...}} or {"scenarios": [...]}, with optional "settings".
+    
+    Each scenario names profile_id and country_key plus any Scenario inputs;
+    missing inputs take their defaults. Identical scenarios in a batch are
+    computed once, and invalid entries get an "error" instead of a result.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Request body must be a JSON object")
+    single = "scenario" in payload
+    entries = [payload["scenario"]] if single else payload.get("scenarios")
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("Provide a \"scenario\" object or a non-empty \"scenarios\" list")
+    if len(entries) > API_MAX_BATCH:
+        raise ValueError(f"At most {API_MAX_BATCH} scenarios per request")
+    
+    settings = payload.get("settings") or {}
+    if not isinstance(settings, dict):
+        raise ValueError("\"settings\" must be an object")
+    calculator = ROICalculator()
+    for name, value in settings.items():
+        if name not in API_SETTINGS:
+            raise ValueError(f"Unknown setting: {name}")
+        setattr(calculator, name, API_SETTINGS[name](value))
+    
+    computed = {}
+    results = []
+    for entry in entries:
+        try:
+            entry = dict(entry)
+            profile_id, key = entry.pop("profile_id", None), entry.pop("country_key", None)
+            if profile_id not in ENHANCED_PROFILES or key not in ENHANCED_COUNTRIES:
+                raise ValueError(f"Unknown profile_id or country_key: {profile_id!r}, {key!r}")
+            unknown = set(entry) - set(_SCENARIO_LIMITS)
+            if unknown:
+                raise ValueError(f"Unknown inputs: {sorted(unknown)}")
+            scenario = Scenario.create(profile_id, key, **entry)
+        except (TypeError, ValueError) as e:
+            results.append({"error": str(e)})
+            continue
+        if scenario not in computed:
+            with span("scenario", profile=profile_id, country=key):
+                computed[scenario] = to_json_compatible(calculate_cached(calculator, scenario))
+        results.append({"scenario": scenario.to_dict(), "result": computed[scenario]})
+    
+    return {"data_version": data_version(), **({"result": results[0]} if single else {"results": results})}
+
+def evaluate_recommend_request(payload: Dict) -> Dict:
+    """Top destinations for {"scenario": {...}} with optional k, max_payback_months, max_risk and rank_by.
+    
+    The scenario names profile_id plus any Scenario inputs; country_key is not needed.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get("scenario"), dict):
+        raise ValueError("Provide a \"scenario\" object")
+    entry = dict(payload["scenario"])
+    profile_id = entry.pop("profile_id", None)
+    entry.pop("country_key", None)
+    if profile_id not in ENHANCED_PROFILES:
+        raise ValueError(f"Unknown profile_id: {profile_id!r}")
+    unknown = set(entry) - set(_SCENARIO_LIMITS)
+    if unknown:
+        raise ValueError(f"Unknown inputs: {sorted(unknown)}")
+    rank_by = payload.get("rank_by", "npv")
+    if rank_by not in RECOMMEND_RANKINGS:
+        raise ValueError(f"rank_by must be one of {sorted(RECOMMEND_RANKINGS)}")
+    
+    try:
+        scenario = Scenario.create(profile_id, next(iter(ENHANCED_COUNTRIES)), **entry)
+        k = max(1, min(len(ENHANCED_COUNTRIES), int(payload.get("k", 5))))
+        limits = {name: float(payload[name]) for name in ("max_payback_months", "max_risk")
+                  if payload.get(name) is not None}
+    except TypeError as e:
+        raise ValueError(str(e))
+    return to_json_compatible(recommend_destinations(scenario, k=k, rank_by=rank_by, **limits))
+
+def evaluate_goal_seek_request(payload: Dict) -> Dict:
+    """Threshold for {"scenario": {...}, "input": name, "metric": one of GOAL_METRICS, "target": number}"""
+    if not isinstance(payload, dict) or not isinstance(payload.get("scenario"), dict):
+        raise ValueError("Provide a \"scenario\" object")
+    entry = dict(payload["scenario"])
+    profile_id, key = entry.pop("profile_id", None), entry.pop("country_key", None)
+    if profile_id not in ENHANCED_PROFILES or key not in ENHANCED_COUNTRIES:
+        raise ValueError(f"Unknown profile_id or country_key: {profile_id!r}, {key!r}")
+    unknown = set(entry) - set(_SCENARIO_LIMITS)
+    if unknown:
+        raise ValueError(f"Unknown inputs: {sorted(unknown)}")
+    if payload.get("input") not in _SCENARIO_LIMITS:
+        raise ValueError(f"input must be one of {list(_SCENARIO_LIMITS)}")
+    if payload.get("metric") not in GOAL_METRICS:
+        raise ValueError(f"metric must be one of {list(GOAL_METRICS)}")
+    
+    try:
+        scenario = Scenario.create(profile_id, key, **entry)
+        target = float(payload["target"])
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Invalid scenario or target: {e}")
+    if not math.isfinite(target):
+        raise ValueError("target must be a finite number")
+    return {
+        "data_version": data_version(),
+        "scenario": scenario.to_dict(),
+        **to_json_compatible(goal_seek(scenario, payload["input"], payload["metric"], target))
+    }
+
+def create_api_app(ui=None) -> FastAPI:
+    """JSON API over the engine; mounts a Gradio Blocks UI at / when one is given"""
+    api = FastAPI(title="VisaTier ROI API")
+    
+    @api.post("/api/v1/roi")
+    def roi(response: Response, payload: Dict = Body(...)):
+        with trace_request("api.roi"):
+            response.headers["X-Trace-Id"] = current_trace_id()
+            try:
+                return evaluate_api_request(payload)
+            except ValueError as e:
+                record_error("Invalid API request", e)
+                raise HTTPException(status_code=422, detail=str(e), headers={"X-Trace-Id": current_trace_id()})
+    
+    @api.post("/api/v1/recommend")
+    def recommend(response: Response, payload: Dict = Body(...)):
+        with trace_request("api.recommend"):
+            response.headers["X-Trace-Id"] = current_trace_id()
+            try:
+                return evaluate_recommend_request(payload)
+            except ValueError as e:
+                record_error("Invalid API request", e)
+                raise HTTPException(status_code=422, detail=str(e), headers={"X-Trace-Id": current_trace_id()})
+    
+    @api.post("/api/v1/goal-seek")
+    def goal_seek_route(response: Response, payload: Dict = Body(...)):
+        with trace_request("api.goal_seek"):
+            response.headers["X-Trace-Id"] = current_trace_id()
+            try:
+                return evaluate_goal_seek_request(payload)
+            except ValueError as e:
+                record_error("Invalid API request", e)
+                raise HTTPException(status_code=422, detail=str(e), headers={"X-Trace-Id": current_trace_id()})
+    
+    @api.get("/api/v1/reference")
+    def reference():
+        data = reference_data()
+        return {
+            "profiles": list(data.profiles),
+            "countries": list(data.countries),
+            "inputs": {name: {"min": low, "max": high, "default": default}
+                       for name, (low, high, default) in _SCENARIO_LIMITS.items()},
+            "data_version": data.version,
+            # Per-entry versions; a cached result stays valid while its profile and country keep theirs
+            "versions": {"profiles": data.profile_versions, "countries": data.country_versions}
+        }
+    
+    @api.get("/api/v1/cache")
+    def cache():
+        return ROI_RESULT_CACHE.stats()
+    
+    @api.get("/metrics", response_class=PlainTextResponse)
+    def metrics():
+        return PlainTextResponse(METRICS.render(), media_type=METRICS_CONTENT_TYPE)
+    
+    if ui is not None:
+        import gradio as gr
+        api = gr.mount_gradio_app(api, ui, path="/")
+    return api
+
+# Served on its own by `uvicorn api:app` or `python -m api`; neither imports Gradio or Plotly
+app = create_api_app()
+
+# =========================
+# MAIN EXECUTION
+# =========================
+
+if __name__ == "__main__":
+    import uvicorn
+    
+    # Pick up edits to the reference data file without a restart
+    watch_reference_data()
+    uvicorn.run(app, host="0.0.0.0", port=API_PORT)
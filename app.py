@@ -1,20 +1,28 @@
 # VisaTier 4.0 - Premium Immigration ROI Calculator (FIXED)
 # Enhanced with advanced analytics, monetization, and enterprise features
 
-import math
 import numpy as np
-import pandas as pd
 import gradio as gr
 import plotly.graph_objects as go
-import plotly.express as px
+import plotly.io as pio
 from plotly.subplots import make_subplots
-import json
-from datetime import datetime, timedelta
-import hashlib
-import secrets
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List
+from functools import lru_cache
 import asyncio
-from dataclasses import dataclass
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# The engine lives in engine.py; its public names stay importable from app
+from engine import (
+    ENHANCED_COUNTRIES, ENHANCED_PROFILES, FALLBACK_OFFER, OFFER_TIERS, RADAR_CATEGORIES, CountryData,
+    LeadEngine, ROICalculator, SENSITIVITY_LABELS, Scenario, UserProfile, calculate_cached, data_version,
+    generate_pdf_report, get_country_table, goal_seek, iter_cached, recommend_destinations,
+    schedule_consultation, send_to_crm, watch_reference_data
+)
+from metrics import METRICS, METRICS_PORT, start_metrics_server
+from tracing import current_trace_id, record_error, trace_request
 
 # =========================
 # ENHANCED STYLING SYSTEM - FIXED
@@ -439,563 +447,120 @@ PREMIUM_THEME = gr.themes.Soft(
 )
 
 # =========================
-# ENHANCED DATA MODELS - FIXED
+# ENHANCED VISUALIZATION ENGINE
 # =========================
 
-@dataclass
-class UserProfile:
-    id: str
-    name: str
-    icon: str
-    typical_revenue: float
-    risk_tolerance: int
-    key_concerns: List[str]
-    success_multiplier: float
-    margin_expectations: Tuple[float, float]
-    
-@dataclass
-class CountryData:
-    name: str
-    corp_tax: float
-    pers_tax: float
-    living_cost: float
-    business_cost: float
-    setup_cost: float
-    currency: str
-    market_growth: float
-    ease_score: float
-    banking_score: float
-    partnership_score: float
-    visa_options: List[str]
-    market_insights: Dict[str, str]
-    risk_factors: Dict[str, float]
-    seasonality: List[float]
+# Most points any dashboard line ships to the browser
+DASHBOARD_MAX_POINTS = 61
 
-# Enhanced user profiles with FIXED emojis
-ENHANCED_PROFILES = {
-    "tech_startup": UserProfile(
-        id="tech_startup",
-        name="Tech Startup Founder",
-        icon="🚀",
-        typical_revenue=45000,
-        risk_tolerance=80,
-        key_concerns=["talent_access", "ip_protection", "scaling"],
-        success_multiplier=1.4,
-        margin_expectations=(15, 35)
-    ),
-    "crypto_defi": UserProfile(
-        id="crypto_defi",
-        name="Crypto/DeFi Entrepreneur",
-        icon="₿",
-        typical_revenue=85000,
-        risk_tolerance=90,
-        key_concerns=["regulatory_clarity", "banking", "tax_optimization"],
-        success_multiplier=1.8,
-        margin_expectations=(25, 60)
-    ),
-    "consulting": UserProfile(
-        id="consulting",
-        name="Strategic Consultant",
-        icon="💼",
-        typical_revenue=35000,
-        risk_tolerance=50,
-        key_concerns=["client_proximity", "reputation", "networking"],
-        success_multiplier=1.1,
-        margin_expectations=(40, 70)
-    ),
-    "ecommerce": UserProfile(
-        id="ecommerce",
-        name="E-commerce Owner",
-        icon="🛒",
-        typical_revenue=55000,
-        risk_tolerance=65,
-        key_concerns=["logistics", "market_access", "compliance"],
-        success_multiplier=1.3,
-        margin_expectations=(10, 25)
-    ),
-    "real_estate": UserProfile(
-        id="real_estate",
-        name="Real Estate Investor",
-        icon="🏠",
-        typical_revenue=28000,
-        risk_tolerance=40,
-        key_concerns=["property_laws", "financing", "market_stability"],
-        success_multiplier=0.9,
-        margin_expectations=(8, 18)
-    ),
-    "content_creator": UserProfile(
-        id="content_creator",
-        name="Content Creator/Influencer",
-        icon="📱",
-        typical_revenue=25000,
-        risk_tolerance=70,
-        key_concerns=["internet_infrastructure", "tax_treaties", "lifestyle"],
-        success_multiplier=1.2,
-        margin_expectations=(60, 85)
-    )
-}
-
-# Comprehensive country database with enhanced metrics
-ENHANCED_COUNTRIES = {
-    "UAE": CountryData(
-        name="UAE (Dubai)",
-        corp_tax=0.09, pers_tax=0.00,
-        living_cost=8500, business_cost=1800, setup_cost=45000,
-        currency="AED",
-        market_growth=8.2, ease_score=9.4, banking_score=8.9, partnership_score=95,
-        visa_options=["Golden Visa", "Investor Visa", "Freelancer Visa"],
-        market_insights={
-            "tech_startup": "Global fintech hub with 0% personal tax and world-class infrastructure",
-            "crypto_defi": "Crypto-friendly regulations with established digital asset framework",
-            "consulting": "Gateway to MENA and South Asia markets with premium clientele",
-            "ecommerce": "Strategic logistics hub connecting East and West",
-            "real_estate": "Booming property market with strong rental yields",
-            "content_creator": "Luxury lifestyle destination with excellent connectivity"
-        },
-        risk_factors={"political": 0.1, "economic": 0.15, "regulatory": 0.05},
-        seasonality=[1.1, 1.0, 0.9, 0.8, 0.7, 0.6, 0.5, 0.6, 0.8, 1.0, 1.2, 1.3]
-    ),
-    "Singapore": CountryData(
-        name="Singapore",
-        corp_tax=0.17, pers_tax=0.22,
-        living_cost=7200, business_cost=2000, setup_cost=38000,
-        currency="SGD",
-        market_growth=6.8, ease_score=9.6, banking_score=9.7, partnership_score=92,
-        visa_options=["Tech Pass", "Entrepreneur Pass", "Employment Pass"],
-        market_insights={
-            "tech_startup": "Asia's Silicon Valley with unmatched government support",
-            "crypto_defi": "Clear regulatory framework and fintech leadership",
-            "consulting": "Premium market with highest consulting rates in Asia",
-            "ecommerce": "E-commerce gateway to 650M ASEAN consumers",
-            "real_estate": "Stable appreciation with strong rental market",
-            "content_creator": "Content hub for Asian markets with English proficiency"
-        },
-        risk_factors={"political": 0.02, "economic": 0.08, "regulatory": 0.03},
-        seasonality=[0.9, 0.85, 0.9, 1.0, 1.05, 1.1, 1.2, 1.15, 1.05, 1.0, 0.95, 1.0]
-    ),
-    "Estonia": CountryData(
-        name="Estonia",
-        corp_tax=0.20, pers_tax=0.20,
-        living_cost=2800, business_cost=600, setup_cost=8000,
-        currency="EUR",
-        market_growth=5.5, ease_score=9.0, banking_score=8.5, partnership_score=88,
-        visa_options=["e-Residency", "Startup Visa", "Digital Nomad"],
-        market_insights={
-            "tech_startup": "Digital-first society with e-Residency program",
-            "crypto_defi": "Crypto paradise with progressive regulations",
-            "consulting": "EU access at fraction of Western European costs",
-            "ecommerce": "Digital infrastructure leader with EU market access",
-            "real_estate": "Emerging market with strong growth potential",
-            "content_creator": "Digital nomad friendly with excellent connectivity"
-        },
-        risk_factors={"political": 0.05, "economic": 0.12, "regulatory": 0.04},
-        seasonality=[0.8, 0.7, 0.8, 0.9, 1.0, 1.2, 1.4, 1.3, 1.1, 1.0, 0.9, 0.8]
-    ),
-    "Portugal": CountryData(
-        name="Portugal",
-        corp_tax=0.21, pers_tax=0.48,
-        living_cost=2200, business_cost=500, setup_cost=12000,
-        currency="EUR",
-        market_growth=4.8, ease_score=7.8, banking_score=8.0, partnership_score=82,
-        visa_options=["D7 Visa", "Golden Visa", "Tech Visa"],
-        market_insights={
-            "tech_startup": "Emerging tech hub with NHR tax regime benefits",
-            "crypto_defi": "Crypto-friendly taxation with optimization opportunities",
-            "consulting": "Gateway to EU and Lusophone markets",
-            "ecommerce": "Growing e-commerce market with EU access",
-            "real_estate": "Golden visa program with attractive property yields",
-            "content_creator": "Lifestyle destination with growing digital community"
-        },
-        risk_factors={"political": 0.03, "economic": 0.18, "regulatory": 0.08},
-        seasonality=[0.8, 0.8, 0.9, 1.0, 1.2, 1.4, 1.6, 1.5, 1.2, 1.0, 0.9, 0.9]
-    ),
-    "USA": CountryData(
-        name="USA (Delaware)",
-        corp_tax=0.21, pers_tax=0.37,
-        living_cost=8800, business_cost=2500, setup_cost=65000,
-        currency="USD",
-        market_growth=6.2, ease_score=8.4, banking_score=9.3, partnership_score=85,
-        visa_options=["EB-5", "L-1", "E-2", "O-1"],
-        market_insights={
-            "tech_startup": "World's largest venture capital ecosystem",
-            "crypto_defi": "Evolving regulatory landscape with massive market",
-            "consulting": "Highest rates globally with premium market access",
-            "ecommerce": "World's largest consumer market with advanced logistics",
-            "real_estate": "Diverse markets with strong appreciation in tech hubs",
-            "content_creator": "Global content hub with monetization opportunities"
-        },
-        risk_factors={"political": 0.15, "economic": 0.12, "regulatory": 0.10},
-        seasonality=[1.0, 0.95, 1.05, 1.15, 1.1, 1.05, 0.95, 0.9, 1.1, 1.2, 1.25, 1.4]
-    ),
-    "UK": CountryData(
-        name="United Kingdom",
-        corp_tax=0.25, pers_tax=0.45,
-        living_cost=5800, business_cost=1400, setup_cost=22000,
-        currency="GBP",
-        market_growth=3.2, ease_score=8.2, banking_score=9.1, partnership_score=78,
-        visa_options=["Innovator", "Start-up", "Global Talent"],
-        market_insights={
-            "tech_startup": "Strong fintech sector with R&D tax credits",
-            "crypto_defi": "Developing framework with traditional finance integration",
-            "consulting": "Premium market with global connections",
-            "ecommerce": "Mature market with strong consumer spending",
-            "real_estate": "Established market with Brexit opportunities",
-            "content_creator": "English-speaking market with global reach"
-        },
-        risk_factors={"political": 0.12, "economic": 0.15, "regulatory": 0.08},
-        seasonality=[0.9, 0.85, 0.9, 1.0, 1.1, 1.2, 1.3, 1.25, 1.1, 1.05, 1.0, 1.2]
-    )
-}
+# Axis references make_subplots assigns to each cell of the 2x2 dashboard grid
+DASHBOARD_AXES = {(1, 1): ('x', 'y'), (1, 2): ('x2', 'y2'), (2, 1): ('x3', 'y3'), (2, 2): ('x4', 'y4')}
 
-# =========================
-# ADVANCED CALCULATION ENGINE - IMPROVED
-# =========================
+# The parts of plotly_white the dashboard's cartesian scatter and bar traces use; go.Figure
+# validates the template of every dashboard it builds, and the full one dominates that cost
+DASHBOARD_THEME_LAYOUT = ('annotationdefaults', 'autotypenumbers', 'colorway', 'font', 'hoverlabel',
+                          'hovermode', 'paper_bgcolor', 'plot_bgcolor', 'title', 'xaxis', 'yaxis')
+DASHBOARD_THEME_TRACES = ('scatter', 'bar')
 
-class ROICalculator:
-    def __init__(self):
-        self.monte_carlo_iterations = 1000
-        self.confidence_intervals = [0.1, 0.25, 0.5, 0.75, 0.9]
-    
-    def calculate_enhanced_roi(
-        self,
-        profile: UserProfile,
-        country: CountryData,
-        current_revenue: float,
-        current_margin: float,
-        current_corp_tax: float,
-        current_pers_tax: float,
-        current_living: float,
-        current_business: float,
-        revenue_multiplier: float,
-        margin_improvement: float,
-        success_probability: float,
-        time_horizon: int,
-        discount_rate: float
-    ) -> Dict:
-        """Advanced ROI calculation with Monte Carlo simulation"""
+class ChartGenerator:
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def _dashboard_template(profile_key: str, data_version: str) -> Dict:
+        """Dashboard layout and static Risk vs Return trace for a profile, as a plain figure dict"""
+        fig = make_subplots(
+            rows=2, cols=2,
+            subplot_titles=("Cash Flow Projection", "ROI Distribution", "Risk vs Return", "Sensitivity Analysis"),
+            specs=[[{"type": "scatter"}, {"type": "histogram"}],
+                   [{"type": "scatter"}, {"type": "bar"}]]
+        )
         
-        try:
-            # Base calculations
-            base_result = self._calculate_deterministic_roi(
-                profile, country, current_revenue, current_margin,
-                current_corp_tax, current_pers_tax, current_living, current_business,
-                revenue_multiplier, margin_improvement, success_probability,
-                time_horizon, discount_rate
-            )
-            
-            # Monte Carlo simulation for risk assessment
-            monte_carlo_result = self._run_monte_carlo_simulation(
-                profile, country, current_revenue, current_margin,
-                revenue_multiplier, margin_improvement, time_horizon, discount_rate
-            )
-            
-            # Sensitivity analysis
-            sensitivity_result = self._perform_sensitivity_analysis(
-                profile, country, current_revenue, current_margin,
-                revenue_multiplier, margin_improvement, time_horizon, discount_rate
+        # Risk vs Return comparison only depends on the profile and the country table
+        table = get_country_table()
+        profile = ENHANCED_PROFILES.get(profile_key, list(ENHANCED_PROFILES.values())[0])
+        
+        fig.add_trace(
+            go.Scatter(
+                x=table.market_growth, 
+                y=table.risk_scores(profile),
+                mode='markers+text',
+                text=list(table.keys),
+                textposition="top center",
+                name='Countries',
+                marker=dict(size=10, color='#f59e0b')
+            ),
+            row=2, col=1
+        )
+        
+        white = pio.templates["plotly_white"]
+        fig.update_layout(
+            height=600,
+            showlegend=False,
+            template=go.layout.Template(
+                layout={key: white.layout[key] for key in DASHBOARD_THEME_LAYOUT},
+                data={kind: white.data[kind] for kind in DASHBOARD_THEME_TRACES}
             )
-            
-            return {
-                **base_result,
-                "monte_carlo": monte_carlo_result,
-                "sensitivity": sensitivity_result,
-                "risk_score": self._calculate_risk_score(country, profile),
-                "opportunity_score": self._calculate_opportunity_score(base_result, country, profile)
-            }
-        except Exception as e:
-            print(f"ROI Calculation Error: {e}")
-            # Return safe fallback values
-            return {
-                "npv": 0,
-                "roi": 0,
-                "irr_annual": 0,
-                "payback_months": float('inf'),
-                "payback_years": float('inf'),
-                "monthly_delta": 0,
-                "total_return": 0,
-                "monthly_flows": [0] * time_horizon,
-                "setup_cost": country.setup_cost,
-                "risk_score": 50,
-                "opportunity_score": 50
-            }
-    
-    def _calculate_deterministic_roi(self, profile, country, *args) -> Dict:
-        """Core deterministic ROI calculation"""
-        try:
-            (current_revenue, current_margin, current_corp_tax, current_pers_tax,
-             current_living, current_business, revenue_multiplier, margin_improvement,
-             success_probability, time_horizon, discount_rate) = args
-            
-            # Ensure values are valid
-            current_revenue = max(1000, float(current_revenue or 45000))
-            current_margin = max(1, min(80, float(current_margin or 25)))
-            
-            # Current situation
-            current_profit = current_revenue * (current_margin / 100)
-            current_after_tax = current_profit * (1 - current_corp_tax/100) * (1 - current_pers_tax/100)
-            current_net = current_after_tax - current_living - current_business
-            
-            # New situation
-            new_revenue = current_revenue * revenue_multiplier * profile.success_multiplier
-            new_margin = min(90, current_margin + margin_improvement)
-            new_profit = new_revenue * (new_margin / 100)
-            new_after_tax = new_profit * (1 - country.corp_tax * 100) * (1 - country.pers_tax * 100)
-            new_net = new_after_tax - country.living_cost - country.business_cost
-            
-            # Cash flow analysis
-            monthly_delta = (new_net - current_net) * (success_probability / 100)
-            setup_cost = country.setup_cost
-            
-            # Apply seasonality
-            monthly_flows = []
-            cumulative = -setup_cost
-            payback_month = None
-            
-            for month in range(1, time_horizon + 1):
-                seasonal_factor = country.seasonality[(month - 1) % 12]
-                monthly_cf = monthly_delta * seasonal_factor
-                monthly_flows.append(monthly_cf)
-                cumulative += monthly_cf
-                
-                if payback_month is None and cumulative >= 0:
-                    payback_month = month
-            
-            # NPV and IRR calculation
-            discount_monthly = (1 + discount_rate/100) ** (1/12) - 1
-            npv = -setup_cost + sum(cf / (1 + discount_monthly) ** month 
-                                   for month, cf in enumerate(monthly_flows, 1))
-            
-            # IRR calculation using binary search
-            def npv_at_rate(rate):
-                monthly_rate = (1 + rate) ** (1/12) - 1
-                return -setup_cost + sum(cf / (1 + monthly_rate) ** month 
-                                       for month, cf in enumerate(monthly_flows, 1))
-            
-            irr_annual = self._find_irr(npv_at_rate)
-            
-            # ROI calculation
-            total_return = sum(monthly_flows)
-            roi = (total_return / setup_cost) * 100 if setup_cost > 0 else 0
-            
-            return {
-                "npv": npv,
-                "roi": roi,
-                "irr_annual": irr_annual * 100 if irr_annual else 0,
-                "payback_months": payback_month or float('inf'),
-                "payback_years": (payback_month / 12) if payback_month else float('inf'),
-                "monthly_delta": monthly_delta,
-                "total_return": total_return,
-                "monthly_flows": monthly_flows,
-                "setup_cost": setup_cost
-            }
-        except Exception as e:
-            print(f"Deterministic ROI calculation error: {e}")
-            return {
-                "npv": 0, "roi": 0, "irr_annual": 0,
-                "payback_months": float('inf'), "payback_years": float('inf'),
-                "monthly_delta": 0, "total_return": 0,
-                "monthly_flows": [0] * 60, "setup_cost": 50000
-            }
-    
-    def _run_monte_carlo_simulation(self, profile, country, *args) -> Dict:
-        """Monte Carlo simulation for risk assessment"""
-        try:
-            results = []
-            
-            for _ in range(self.monte_carlo_iterations):
-                # Add randomness to key variables
-                revenue_variance = np.random.normal(1.0, 0.15)
-                margin_variance = np.random.normal(1.0, 0.10)
-                success_variance = np.random.normal(1.0, 0.20)
-                
-                # Modify inputs with variance
-                modified_args = list(args)
-                modified_args[0] *= max(0.5, revenue_variance)  # revenue
-                modified_args[1] *= max(0.5, margin_variance)   # margin
-                modified_args[7] *= max(0.1, success_variance)  # success probability
-                
-                result = self._calculate_deterministic_roi(profile, country, *modified_args)
-                results.append(result)
-            
-            # Calculate confidence intervals
-            rois = [r['roi'] for r in results]
-            npvs = [r['npv'] for r in results]
-            
-            confidence_intervals = {}
-            for ci in self.confidence_intervals:
-                confidence_intervals[f'roi_{int(ci*100)}'] = np.percentile(rois, ci * 100)
-                confidence_intervals[f'npv_{int(ci*100)}'] = np.percentile(npvs, ci * 100)
-            
-            return {
-                "mean_roi": np.mean(rois),
-                "std_roi": np.std(rois),
-                "mean_npv": np.mean(npvs),
-                "std_npv": np.std(npvs),
-                "confidence_intervals": confidence_intervals,
-                "probability_positive_roi": sum(1 for roi in rois if roi > 0) / len(rois)
-            }
-        except Exception as e:
-            print(f"Monte Carlo simulation error: {e}")
-            return {
-                "mean_roi": 0, "std_roi": 0, "mean_npv": 0, "std_npv": 0,
-                "confidence_intervals": {}, "probability_positive_roi": 0
-            }
-    
-    def _perform_sensitivity_analysis(self, profile, country, *args) -> Dict:
-        """Sensitivity analysis for key variables"""
-        try:
-            base_result = self._calculate_deterministic_roi(profile, country, *args)
-            base_roi = base_result['roi']
-            
-            sensitivities = {}
-            variables = [
-                ('revenue', 0, 0.1),
-                ('margin', 1, 5.0),
-                ('revenue_multiplier', 6, 0.2),
-                ('success_probability', 8, 10.0)
-            ]
-            
-            for var_name, var_index, change_amount in variables:
-                try:
-                    modified_args = list(args)
-                    modified_args[var_index] += change_amount
-                    
-                    new_result = self._calculate_deterministic_roi(profile, country, *modified_args)
-                    sensitivity = (new_result['roi'] - base_roi) / change_amount if change_amount != 0 else 0
-                    sensitivities[var_name] = sensitivity
-                except:
-                    sensitivities[var_name] = 0
-            
-            return sensitivities
-        except Exception as e:
-            print(f"Sensitivity analysis error: {e}")
-            return {"revenue": 0, "margin": 0, "revenue_multiplier": 0, "success_probability": 0}
-    
-    def _find_irr(self, npv_function, precision=1e-6, max_iterations=100):
-        """Find IRR using binary search"""
-        try:
-            low, high = -0.99, 5.0
-            
-            for _ in range(max_iterations):
-                mid = (low + high) / 2
-                npv = npv_function(mid)
-                
-                if abs(npv) < precision:
-                    return mid
-                elif npv > 0:
-                    low = mid
-                else:
-                    high = mid
-            
-            return None
-        except:
-            return None
+        )
+        return fig.to_dict()
     
-    def _calculate_risk_score(self, country: CountryData, profile: UserProfile) -> float:
-        """Calculate overall risk score (0-100, lower is better)"""
-        try:
-            political_risk = country.risk_factors.get('political', 0.1) * 30
-            economic_risk = country.risk_factors.get('economic', 0.1) * 40
-            regulatory_risk = country.risk_factors.get('regulatory', 0.1) * 30
-            
-            # Adjust for profile risk tolerance
-            risk_adjustment = (100 - profile.risk_tolerance) / 100
-            
-            total_risk = (political_risk + economic_risk + regulatory_risk) * (1 + risk_adjustment)
-            return min(100, total_risk)
-        except:
-            return 50
+    @staticmethod
+    def _on_cell(trace, row: int, col: int) -> Dict:
+        """Trace as a plain dict placed on one cell of the dashboard grid"""
+        data = trace.to_plotly_json()
+        data['xaxis'], data['yaxis'] = DASHBOARD_AXES[(row, col)]
+        return data
     
-    def _calculate_opportunity_score(self, result: Dict, country: CountryData, profile: UserProfile) -> float:
-        """Calculate opportunity score (0-100, higher is better)"""
-        try:
-            roi_score = min(50, result['roi'] / 4)  # Cap at 200% ROI = 50 points
-            growth_score = country.market_growth * 5  # Market growth contribution
-            ease_score = country.ease_score * 2  # Ease of business
-            partnership_score = country.partnership_score / 2  # Partnership potential
-            
-            return min(100, roi_score + growth_score + ease_score + partnership_score)
-        except:
-            return 50
-
-# =========================
-# ENHANCED VISUALIZATION ENGINE
-# =========================
-
-class ChartGenerator:
     @staticmethod
-    def create_roi_dashboard(result: Dict, country_name: str, profile_name: str) -> go.Figure:
+    def create_roi_dashboard(result: Dict, country_name: str, profile_name: str,
+                             profile_key: str = 'tech_startup') -> go.Figure:
         """Create comprehensive ROI dashboard"""
         try:
-            fig = make_subplots(
-                rows=2, cols=2,
-                subplot_titles=("Cash Flow Projection", "ROI Distribution", "Risk vs Return", "Sensitivity Analysis"),
-                specs=[[{"type": "scatter"}, {"type": "histogram"}],
-                       [{"type": "scatter"}, {"type": "bar"}]]
-            )
+            # The cached template is only read; only scenario traces are built per call
+            template = ChartGenerator._dashboard_template(profile_key, get_country_table().version)
+            traces, layout = [], {}
             
-            # Cash flow projection
+            # Cash flow projection, thinned to a fixed number of points
             monthly_flows = result.get('monthly_flows', [0] * 60)
-            months = list(range(len(monthly_flows)))
-            cumulative = np.cumsum([-result.get('setup_cost', 50000)] + monthly_flows)
+            cumulative = np.cumsum([-result.get('setup_cost', 50000)] + list(monthly_flows))
+            months = np.unique(np.linspace(0, len(cumulative) - 1, min(len(cumulative), DASHBOARD_MAX_POINTS)).round().astype(np.int16))
             
-            fig.add_trace(
+            traces.append(ChartGenerator._on_cell(
                 go.Scatter(
                     x=months, 
-                    y=cumulative, 
+                    y=cumulative[months].round(2), 
                     mode='lines+markers', 
                     name='Cumulative Cash Flow',
                     line=dict(color='#2563eb', width=3)
                 ),
                 row=1, col=1
-            )
+            ))
             
-            # ROI distribution (Monte Carlo)
-            if 'monte_carlo' in result:
-                mc_data = result['monte_carlo']
-                roi_samples = np.random.normal(
-                    mc_data.get('mean_roi', 0),
-                    max(1, mc_data.get('std_roi', 10)),
-                    500
-                )
-                fig.add_trace(
-                    go.Histogram(
-                        x=roi_samples, 
+            # ROI distribution, pre-binned by the Monte Carlo engine
+            histogram = result.get('monte_carlo', {}).get('roi_histogram')
+            if histogram:
+                edges = np.asarray(histogram['edges'])
+                traces.append(ChartGenerator._on_cell(
+                    go.Bar(
+                        x=((edges[:-1] + edges[1:]) / 2).round(2),
+                        y=np.asarray(histogram['counts'], dtype=np.int32),
+                        width=float(edges[1] - edges[0]),
                         name='ROI Distribution', 
                         opacity=0.7,
-                        marker_color='#10b981'
+                        marker_color='#10b981',
+                        hovertemplate='ROI %{x:.1f}%: %{y:,} paths<extra></extra>'
                     ),
                     row=1, col=2
-                )
-            
-            # Risk vs Return comparison
-            countries = list(ENHANCED_COUNTRIES.keys())
-            calculator = ROICalculator()
-            risk_scores = [calculator._calculate_risk_score(
-                ENHANCED_COUNTRIES[c], 
-                ENHANCED_PROFILES.get('tech_startup', list(ENHANCED_PROFILES.values())[0])
-            ) for c in countries]
-            return_scores = [ENHANCED_COUNTRIES[c].market_growth for c in countries]
+                ))
             
-            fig.add_trace(
-                go.Scatter(
-                    x=return_scores, 
-                    y=risk_scores,
-                    mode='markers+text',
-                    text=countries,
-                    textposition="top center",
-                    name='Countries',
-                    marker=dict(size=10, color='#f59e0b')
-                ),
-                row=2, col=1
-            )
-            
-            # Sensitivity analysis
-            if 'sensitivity' in result:
+            # Sensitivity analysis as a tornado around the base ROI
+            if result.get('tornado'):
+                for trace in ChartGenerator._tornado_traces(result['tornado'], result.get('roi', 0)):
+                    traces.append(ChartGenerator._on_cell(trace, row=2, col=2))
+                layout['barmode'] = 'overlay'
+            elif 'sensitivity' in result:
                 sens_vars = list(result['sensitivity'].keys())
                 sens_values = list(result['sensitivity'].values())
                 
-                fig.add_trace(
+                traces.append(ChartGenerator._on_cell(
                     go.Bar(
                         x=sens_vars, 
                         y=sens_values, 
@@ -1003,18 +568,14 @@ class ChartGenerator:
                         marker_color='#8b5cf6'
                     ),
                     row=2, col=2
-                )
+                ))
             
-            fig.update_layout(
-                height=600,
-                title_text=f"ROI Analysis Dashboard: {profile_name} → {country_name}",
-                showlegend=False,
-                template="plotly_white"
-            )
+            layout['title'] = {'text': f"ROI Analysis Dashboard: {profile_name} → {country_name}"}
             
-            return fig
+            return go.Figure(data=[*template['data'], *traces], layout={**template['layout'], **layout})
         except Exception as e:
-            print(f"Chart generation error: {e}")
+            record_error("Chart generation error", e)
+            METRICS.increment("fallbacks_total", stage="chart")
             # Return empty figure
             fig = go.Figure()
             fig.add_annotation(
@@ -1024,11 +585,32 @@ class ChartGenerator:
             )
             return fig
     
+    @staticmethod
+    def _tornado_traces(tornado: List[Dict], base_roi: float, limit: int = 8) -> List[go.Bar]:
+        """Low and high ROI bars for the inputs with the widest swing, widest on top"""
+        rows = sorted(tornado, key=lambda row: row['roi_swing'], reverse=True)[:limit][::-1]
+        labels = [row['label'] for row in rows]
+        return [
+            go.Bar(
+                y=labels,
+                x=[row[f'roi_{side}'] - base_roi for row in rows],
+                base=base_roi,
+                orientation='h',
+                name=f'{side.title()} input',
+                marker_color=color,
+                customdata=[[row[f'{side}_value'], row[f'npv_{side}']] for row in rows],
+                hovertemplate='%{y}: %{customdata[0]:,.2f}<br>ROI %{x:+.1f} pp<br>NPV €%{customdata[1]:,.0f}<extra></extra>'
+            )
+            for side, color in (('low', '#ef4444'), ('high', '#10b981'))
+        ]
+    
     @staticmethod
     def create_country_comparison_radar(countries: List[str], profile: str) -> go.Figure:
         """Create radar chart comparing countries"""
         try:
-            categories = ['Tax Efficiency', 'Cost of Living', 'Market Growth', 'Ease of Business', 'Banking', 'Overall Score']
+            categories = list(RADAR_CATEGORIES)
+            table = get_country_table()
+            scores = table.radar_scores()
             
             fig = go.Figure()
             
@@ -1036,23 +618,14 @@ class ChartGenerator:
             
             for i, country_key in enumerate(countries[:5]):  # Limit to 5 countries
                 if country_key in ENHANCED_COUNTRIES:
-                    country = ENHANCED_COUNTRIES[country_key]
-                    
-                    # Normalize scores to 0-100 scale
-                    tax_eff = (1 - (country.corp_tax + country.pers_tax)) * 100
-                    cost_eff = max(0, 100 - (country.living_cost / 100))
-                    market = country.market_growth * 10
-                    ease = country.ease_score * 10
-                    banking = country.banking_score * 10
-                    overall = country.partnership_score
-                    
-                    values = [tax_eff, cost_eff, market, ease, banking, overall]
+                    row = table.rows([country_key])[0]
+                    values = scores[row].tolist()
                     
                     fig.add_trace(go.Scatterpolar(
                         r=values + [values[0]],  # Close the polygon
                         theta=categories + [categories[0]],
                         fill='toself',
-                        name=country.name,
+                        name=table.names[row],
                         line_color=colors[i % len(colors)],
                         opacity=0.6
                     ))
@@ -1070,95 +643,495 @@ class ChartGenerator:
             
             return fig
         except Exception as e:
-            print(f"Radar chart error: {e}")
+            record_error("Radar chart error", e)
             fig = go.Figure()
             fig.add_annotation(text=f"Radar chart error: {str(e)}", x=0.5, y=0.5)
             return fig
 
 # =========================
-# LEAD GENERATION & MONETIZATION ENGINE
+# RESULT TEMPLATES
 # =========================
 
-class LeadEngine:
-    def __init__(self):
-        self.conversion_thresholds = {
-            'email_capture': {'roi_min': 50, 'confidence': 0.3},
-            'consultation_booking': {'roi_min': 150, 'confidence': 0.6},
-            'premium_service': {'roi_min': 250, 'confidence': 0.8}
-        }
+# Static fragments are rendered once and reused; per request only the numbers are formatted
+
+def progress_html(fraction, label):
+    return f"""
+    <div class="progress-container">
+        <div class="progress-bar" style="width: {fraction*100:.0f}%;"></div>
+    </div>
+    <div class="kpi-note">{label}</div>
+"""
+
+def irr_text(result):
+    """IRR for display; without a root in the solver's -99%..500% range it is
+    either above 500% (the setup cost is recovered) or undefined"""
+    if result['irr_converged']:
+        return f"{result['irr_annual']:.1f}%"
+    return "> 500%" if result['payback_months'] != float('inf') else "n/a"
+
+def kpi_html(result):
+    roi_status = "success" if result['roi'] > 100 else "warning" if result['roi'] > 50 else "error"
+    payback_str = f"{result['payback_years']:.1f} years" if result['payback_years'] != float('inf') else "Never"
+    return f"""
+    <div class="kpi-grid fadeIn">
+        <div class="kpi-card {roi_status}">
+            <div class="kpi-label">🚀 5-Year ROI</div>
+            <div class="kpi-value">{result['roi']:.1f}%</div>
+            <div class="kpi-note">Total return on investment</div>
+        </div>
+        <div class="kpi-card">
+            <div class="kpi-label">💰 Payback Period</div>
+            <div class="kpi-value">{payback_str}</div>
+            <div class="kpi-note">Time to break even</div>
+        </div>
+        <div class="kpi-card">
+            <div class="kpi-label">💎 Net Present Value</div>
+            <div class="kpi-value">€{result['npv']:,.0f}</div>
+            <div class="kpi-note">Today's value of future returns</div>
+        </div>
+        <div class="kpi-card">
+            <div class="kpi-label">📈 Internal Rate of Return</div>
+            <div class="kpi-value">{irr_text(result)}</div>
+            <div class="kpi-note">Annualized rate of return</div>
+        </div>
+    </div>
+"""
+
+def _monte_carlo_card(mc, progress):
+    estimate = f"""
+                Probability of positive ROI: {mc['probability_positive_roi']*100:.1f}%
+                <br>Mean ROI: {mc['mean_roi']:.1f}% ± {mc['std_roi']:.1f}%
+                <br>90% Confidence Interval: {mc['confidence_intervals'].get('roi_10', 0):.1f}% - {mc['confidence_intervals'].get('roi_90', 0):.1f}%
+""" if mc else ""
+    return f"""
+        <div class="insight-card">
+            <div class="insight-header">
+                <span class="insight-icon">🎲</span>
+                <h3 class="insight-title">Monte Carlo Analysis{' (preliminary)' if mc and mc.get('preview') else ''}</h3>
+            </div>
+            <div class="insight-description">
+                {estimate}
+            </div>
+            {progress}
+        </div>
+"""
+
+def insights_html(result, profile, country, progress=""):
+    """Recommendation and Monte Carlo cards; progress is shown in the Monte Carlo card until the run is final"""
+    mc = result.get('monte_carlo')
+    return f"""
+    <div class="insights-grid fadeIn">
+        <div class="insight-card">
+            <div class="insight-header">
+                <span class="insight-icon">🎯</span>
+                <h3 class="insight-title">Investment Recommendation</h3>
+            </div>
+            <div class="insight-description">
+                Based on your {profile.name} profile and {country.name} opportunity analysis:
+                <br><strong>Risk Score:</strong> {result.get('risk_score', 50):.1f}/100
+                <br><strong>Opportunity Score:</strong> {result.get('opportunity_score', 50):.1f}/100
+            </div>
+        </div>
+        {_monte_carlo_card(mc, progress) if mc or progress else ""}
+    </div>
+"""
+
+# The lead modal is LEAD_MODAL_HEAD + the offer's title + its cached body
+LEAD_MODAL_HEAD = """
+    <div class="lead-modal slideUp">
+        <h3>🎁 Claim Your """
+
+@lru_cache(maxsize=16)
+def _offer_body(value, discount_price, urgency, includes, cta, guarantee) -> str:
+    """Lead modal after the title; one per distinct offer content"""
+    items = "".join(f"<li>{item}</li>" for item in includes)
+    return f"""</h3>
+        <div class="value-badge">Worth {value} - Special Price: {discount_price}</div>
+        <div class="urgency-text">{urgency}</div>
+
+        <div style="background: #f8fafc; padding: 1rem; border-radius: 8px; margin: 1rem 0;">
+            <strong>🎯 You'll Get:</strong>
+            <ul style="margin: 0.5rem 0; padding-left: 1.5rem;">
+                {items}
+            </ul>
+        </div>
+
+        <input type="email" placeholder="Enter your email for instant access" class="form-input">
+        <label style="display: block; margin: 0.5rem 0; font-size: 14px;">
+            <input type="checkbox" style="margin-right: 8px;"> I agree to privacy policy and communications
+        </label>
+        <button class="cta-button" style="width: 100%;">{cta}</button>
+        <div style="text-align: center; margin-top: 1rem; font-size: 12px; color: #64748b;">
+            {guarantee} | <a href="#" onclick="requestDataDeletion()">Request data deletion</a>
+        </div>
+    </div>
+
+    <script>
+    function requestDataDeletion() {{
+        alert('Data deletion request recorded. We will process within 30 days per GDPR requirements.');
+    }}
+    </script>
+"""
+
+def offer_body_html(offer: Dict) -> str:
+    return _offer_body(
+        offer['value'], offer['discount_price'], offer['urgency'], tuple(offer['includes']),
+        offer['cta'], offer['guarantee']
+    )
+
+def lead_offer_html(result, profile, country):
+    offer = LEAD_ENGINE.generate_personalized_offer(result, profile, country)
+    return LEAD_MODAL_HEAD + offer['title'] + offer_body_html(offer)
+
+LEAD_ENGINE = LeadEngine()
+# Every offer LeadEngine can make is rendered up front
+for _offer in (*OFFER_TIERS.values(), FALLBACK_OFFER):
+    offer_body_html(_offer)
+
+COMPARISON_HTML = """
+    <div style="margin: 2rem 0;">
+        <h3>Multi-Country Comparison</h3>
+        <div style="background: white; padding: 1rem; border-radius: 12px; box-shadow: var(--shadow);">
+            Compare your results across different countries to make the optimal decision.
+        </div>
+    </div>
+"""
+
+def _insight_card(country, profile, profile_key):
+    return f"""
+    <div class="insight-card fadeIn">
+        <div class="insight-header">
+            <span class="insight-icon">{profile.icon}</span>
+            <h3 class="insight-title">{country.name} Insights for {profile.name}s</h3>
+        </div>
+        <div class="insight-description">{country.market_insights.get(profile_key, "")}</div>
+        <div style="margin-top: 1rem;">
+            <strong>Key Metrics:</strong><br>
+            Corporate Tax: {country.corp_tax*100:.1f}% | Personal Tax: {country.pers_tax*100:.1f}%<br>
+            Living Cost: €{country.living_cost:,}/mo | Setup Cost: €{country.setup_cost:,}
+        </div>
+    </div>
+"""
+
+@lru_cache(maxsize=4)
+def _insight_cards(data_version: str) -> Dict:
+    """Country insight card for every (country key, profile key) of one reference data version"""
+    return {
+        (country_key, profile_key): _insight_card(country, profile, profile_key)
+        for country_key, country in ENHANCED_COUNTRIES.items()
+        for profile_key, profile in ENHANCED_PROFILES.items()
+    }
+
+def insight_card_html(country_key, profile_key):
+    return _insight_cards(data_version()).get((country_key, profile_key), "")
+
+# =========================
+# ANALYSIS HANDLERS
+# =========================
+
+# Threads running full analyses; also the concurrency limit of the "analysis" event group
+ANALYSIS_WORKERS = 4
+# Pending events the Gradio queue accepts before rejecting new ones
+ANALYSIS_QUEUE_SIZE = 64
+# Seconds before a user gets a timeout message instead of a result
+ANALYSIS_TIMEOUT = 30.0
+# Monte Carlo paths behind the preliminary estimate streamed before the full run
+ANALYSIS_PREVIEW_PATHS = 5_000
+
+ANALYSIS_EXECUTOR = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix="analysis")
+
+def error_outputs(message, trace_id=None):
+    # The trace id lets a reported error be matched to its logged trace
+    trace_id = trace_id or current_trace_id()
+    reference = f'<div class="kpi-note">Reference: {trace_id}</div>' if trace_id else ""
+    error_html = f"""
+    <div class="kpi-card error">
+        <div class="kpi-value">Error</div>
+        <div class="kpi-note">{message}</div>
+        {reference}
+    </div>
+    """
+    return (
+        gr.update(value=error_html, visible=True),
+        gr.update(visible=False),
+        gr.update(visible=False),
+        gr.update(visible=False),
+        gr.update(visible=False),
+        {}
+    )
+
+# Main calculation, run on an analysis thread by calculate_advanced_roi; yields one
+# update per finished stage: KPIs, a preliminary and then the final Monte Carlo card,
+# and finally the chart, lead offer and comparison tools
+def stream_advanced_roi(
+    profile_key, country_key, revenue, margin, corp_tax, pers_tax,
+    living, business, rev_mult, margin_imp, success_prob, horizon, discount
+):
+    try:
+        # Input validation
+        if profile_key not in ENHANCED_PROFILES or country_key not in ENHANCED_COUNTRIES:
+            yield [gr.update()] * 6
+            return
+        
+        profile = ENHANCED_PROFILES[profile_key]
+        country = ENHANCED_COUNTRIES[country_key]
+        
+        # Initialize calculator
+        calculator = ROICalculator()
+        paths = calculator.monte_carlo_iterations
+        
+        # Normalize all inputs once
+        scenario = Scenario.create(
+            profile_key, country_key, revenue, margin, corp_tax, pers_tax,
+            living, business, rev_mult, margin_imp, success_prob, horizon, discount
+        )
+        
+        # Run advanced calculation stage by stage; a cached result arrives complete
+        calculation_started = time.perf_counter()
+        html_seconds = 0.0
+        for stage, result in iter_cached(calculator, scenario, ANALYSIS_PREVIEW_PATHS):
+            if stage == "complete":
+                break
+            html_started = time.perf_counter()
+            if stage == "deterministic":
+                # Older results stay hidden until this scenario's are ready
+                update = (
+                    gr.update(value=kpi_html(result), visible=True),
+                    gr.update(visible=False),
+                    gr.update(value=insights_html(result, profile, country, progress_html(
+                        0.25, f"Running Monte Carlo simulation on {paths:,} paths…")), visible=True),
+                    gr.update(visible=False),
+                    gr.update(visible=False),
+                    gr.update()
+                )
+            else:
+                preview = stage == "monte_carlo_preview"
+                progress = progress_html(0.5, f"Estimate from {ANALYSIS_PREVIEW_PATHS:,} paths, refining with {paths:,}…") \
+                    if preview else progress_html(0.8, "Running sensitivity analysis and building charts…")
+                update = (gr.update(), gr.update(), gr.update(value=insights_html(result, profile, country, progress)),
+                          gr.update(), gr.update(), gr.update())
+            html_seconds += time.perf_counter() - html_started
+            yield update
+        METRICS.observe("calculation", time.perf_counter() - calculation_started - html_seconds)
+        
+        # Generate main chart
+        with METRICS.stage("chart"):
+            chart = ChartGenerator.create_roi_dashboard(
+                result, country.name, profile.name, profile_key
+            )
+        
+        html_started = time.perf_counter()
+        kpis = kpi_html(result)
+        insights = insights_html(result, profile, country)
+        lead_html = lead_offer_html(result, profile, country)
+        METRICS.observe("html", html_seconds + time.perf_counter() - html_started)
+        
+        yield (
+            gr.update(value=kpis, visible=True),
+            gr.update(value=chart, visible=True),
+            gr.update(value=insights, visible=True),
+            gr.update(value=lead_html, visible=True),
+            gr.update(value=COMPARISON_HTML, visible=True),
+            result
+        )
+    
+    except Exception as e:
+        record_error("Calculation error", e)
+        METRICS.increment("fallbacks_total", stage="handler")
+        yield error_outputs(f"Calculation failed: {str(e)}")
+
+async def calculate_advanced_roi(*inputs):
+    """Stream the analysis outputs as each stage finishes.
+    
+    stream_advanced_roi runs on an analysis thread and hands every update back
+    through a queue; the whole stream shares one ANALYSIS_TIMEOUT deadline.
+    """
+    loop = asyncio.get_running_loop()
+    updates = asyncio.Queue()
+    stopped = threading.Event()
+    submitted = time.perf_counter()
+    deadline = loop.time() + ANALYSIS_TIMEOUT
+    trace = {}
+    
+    def push(item):
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(updates.put_nowait, item)
     
-    def generate_personalized_offer(self, result: Dict, profile: UserProfile, country: CountryData) -> Dict:
-        """Generate personalized offer based on calculation results"""
+    def produce():
+        with trace_request("calculate_advanced_roi", profile=inputs[0], country=inputs[1]):
+            trace["id"] = current_trace_id()
+            METRICS.observe("queue_wait", time.perf_counter() - submitted)
+            try:
+                with METRICS.stage("handler"):
+                    for outputs in stream_advanced_roi(*inputs):
+                        push(outputs)
+                        if stopped.is_set():
+                            break
+            finally:
+                push(None)
+    
+    # The worker thread runs in a copy of this context, so its spans join the trace
+    loop.run_in_executor(ANALYSIS_EXECUTOR, contextvars.copy_context().run, produce)
+    first = True
+    try:
+        while True:
+            try:
+                outputs = await asyncio.wait_for(updates.get(), timeout=max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                record_error("Calculation timed out", timeout_seconds=ANALYSIS_TIMEOUT, trace_id=trace.get("id"))
+                METRICS.increment("timeouts_total", stage="handler")
+                yield error_outputs("The analysis is taking longer than expected. Please try again shortly.", trace.get("id"))
+                return
+            if outputs is None:
+                return
+            if first:
+                METRICS.observe("first_result", time.perf_counter() - submitted)
+                first = False
+            yield outputs
+    finally:
+        # A timed-out or abandoned stream stops its worker after the current stage
+        stopped.set()
+
+
+# Countries shown by the destination recommender, and its ranking choices
+RECOMMEND_TOP_K = 5
+RECOMMEND_RANK_CHOICES = [
+    ("Net Present Value", "npv"),
+    ("ROI", "roi"),
+    ("Opportunity Score", "opportunity_score"),
+    ("Fastest Payback", "payback_months"),
+    ("Lowest Risk", "risk_score")
+]
+
+def render_recommendations(
+    profile_key, revenue, margin, corp_tax, pers_tax, living, business,
+    rev_mult, margin_imp, success_prob, horizon, discount, max_payback, max_risk, rank_by
+):
+    """Ranked top destinations for the Step 2 metrics and growth assumptions, as HTML"""
+    with trace_request("recommend_destinations", profile=profile_key, rank_by=rank_by):
+        try:
+            if profile_key not in ENHANCED_PROFILES:
+                return gr.update()
+            
+            # Every country is evaluated, so the target country does not matter
+            scenario = Scenario.create(
+                profile_key, next(iter(ENHANCED_COUNTRIES)), revenue, margin, corp_tax, pers_tax,
+                living, business, rev_mult, margin_imp, success_prob, horizon, discount
+            )
+            ranking = recommend_destinations(
+                scenario, k=RECOMMEND_TOP_K,
+                max_payback_months=max_payback or None,
+                max_risk=max_risk if max_risk not in (None, "") else None,
+                rank_by=rank_by
+            )
+            
+            if not ranking['destinations']:
+                return gr.update(value="""
+                <div class="kpi-card warning">
+                    <div class="kpi-value">No match</div>
+                    <div class="kpi-note">No destination meets these limits. Try a longer payback or a higher risk limit.</div>
+                </div>
+                """, visible=True)
+            
+            rows = ""
+            for entry in ranking['destinations']:
+                payback = f"{entry['payback_months']:.0f} mo" if np.isfinite(entry['payback_months']) else "Never"
+                rows += f"""
+                <tr>
+                    <td><strong>#{entry['rank']}</strong></td>
+                    <td>{entry['name']}</td>
+                    <td>€{entry['npv']:,.0f}</td>
+                    <td>{entry['roi']:.1f}%</td>
+                    <td>{payback}</td>
+                    <td>{entry['risk_score']:.1f}</td>
+                    <td>{entry['opportunity_score']:.1f}</td>
+                </tr>
+                """
+            
+            return gr.update(value=f"""
+            <div class="fadeIn" style="background: white; padding: 1rem; border-radius: 12px; box-shadow: var(--shadow);">
+                <div class="kpi-note" style="margin-bottom: 0.5rem;">
+                    {ranking['eligible']} of {ranking['evaluated']} destinations meet your limits
+                </div>
+                <table style="width: 100%; border-collapse: collapse; text-align: left;">
+                    <tr><th></th><th>Country</th><th>NPV</th><th>ROI</th><th>Payback</th><th>Risk</th><th>Opportunity</th></tr>
+                    {rows}
+                </table>
+            </div>
+            """, visible=True)
+        except Exception as e:
+            record_error("Recommendation error", e)
+            return gr.update(value="", visible=False)
+
+# Goal seek targets, and how a goal on each reads in the result
+GOAL_METRIC_CHOICES = [
+    ("ROI (%)", "roi"),
+    ("Net Present Value (€)", "npv"),
+    ("IRR (%)", "irr_annual"),
+    ("Payback (months)", "payback_months")
+]
+GOAL_PHRASES = {
+    "roi": "an ROI of {:.1f}%",
+    "npv": "an NPV of €{:,.0f}",
+    "irr_annual": "an IRR of {:.1f}%",
+    "payback_months": "payback within {:.0f} months"
+}
+
+def render_goal_seek(
+    profile_key, country_key, revenue, margin, corp_tax, pers_tax, living, business,
+    rev_mult, margin_imp, success_prob, horizon, discount, goal_input, goal_metric, goal_target
+):
+    """Threshold value of one input for a target ROI, NPV, IRR or payback, as HTML"""
+    with trace_request("goal_seek", profile=profile_key, country=country_key, input=goal_input, metric=goal_metric):
         try:
-            roi = result.get('roi', 0)
-            confidence = result.get('monte_carlo', {}).get('probability_positive_roi', 0)
+            if profile_key not in ENHANCED_PROFILES or country_key not in ENHANCED_COUNTRIES or goal_target is None:
+                return gr.update()
             
-            if roi >= 250 and confidence >= 0.8:
-                return {
-                    'tier': 'premium',
-                    'title': f'Complete {country.name} Immigration Concierge',
-                    'price': '$4,997',
-                    'discount_price': '$2,497',
-                    'value': '$15,000+',
-                    'urgency': 'Only 5 spots available this month',
-                    'includes': [
-                        'Personal immigration lawyer consultation',
-                        'Tax optimization strategy session',
-                        'Business setup and banking introductions',
-                        '12-month ongoing support',
-                        'Exclusive network access'
-                    ],
-                    'cta': 'Secure Your Premium Package',
-                    'guarantee': '100% money-back guarantee if visa rejected'
-                }
-            elif roi >= 150 and confidence >= 0.6:
-                return {
-                    'tier': 'standard',
-                    'title': f'{country.name} Business Migration Blueprint',
-                    'price': '$997',
-                    'discount_price': '$497',
-                    'value': '$3,000+',
-                    'urgency': 'Limited time 50% discount',
-                    'includes': [
-                        'Complete legal requirements guide',
-                        'Step-by-step timeline and checklist',
-                        'Tax optimization strategies',
-                        '60-day email support',
-                        'Resource directory'
-                    ],
-                    'cta': 'Get Your Blueprint Now',
-                    'guarantee': '30-day money-back guarantee'
-                }
+            scenario = Scenario.create(
+                profile_key, country_key, revenue, margin, corp_tax, pers_tax,
+                living, business, rev_mult, margin_imp, success_prob, horizon, discount
+            )
+            outcome = goal_seek(scenario, goal_input, goal_metric, float(goal_target))
+            
+            label = SENSITIVITY_LABELS[goal_input]
+            goal = GOAL_PHRASES[goal_metric].format(goal_target)
+            if outcome['status'] == "solved":
+                comparison = "at least" if outcome['better'] == "higher" else "at most"
+                status = "success"
+                headline = f"{label} {comparison} {outcome['value']:,.2f}"
+                note = f"Currently {outcome['current_value']:,.2f}"
             else:
-                return {
-                    'tier': 'starter',
-                    'title': f'{country.name} Exploration Package',
-                    'price': '$297',
-                    'discount_price': '$97',
-                    'value': '$500+',
-                    'urgency': 'Free for first 100 users',
-                    'includes': [
-                        'Country overview report',
-                        'Visa options comparison',
-                        'Basic cost calculator',
-                        'Initial checklist'
-                    ],
-                    'cta': 'Start Your Journey',
-                    'guarantee': 'Risk-free trial'
-                }
+                status = "success" if outcome['status'] == "always_met" else "warning"
+                headline = {
+                    "always_met": "Already met",
+                    "unreachable": "Not reachable",
+                    "no_effect": "No effect"
+                }[outcome['status']]
+                note = {
+                    "always_met": f"Any {label.lower()} in range achieves {goal}",
+                    "unreachable": f"No {label.lower()} in range achieves {goal}",
+                    "no_effect": f"{label} does not change this metric"
+                }[outcome['status']]
+                if outcome['status'] == "unreachable" and outcome['value'] is not None:
+                    note += f" (it would take {outcome['value']:,.2f})"
+            
+            return gr.update(value=f"""
+            <div class="kpi-card {status} fadeIn">
+                <div class="kpi-label">🎯 For {goal}</div>
+                <div class="kpi-value" style="font-size: 1.4rem;">{headline}</div>
+                <div class="kpi-note">{note}</div>
+            </div>
+            """, visible=True)
+        except ValueError as e:
+            # A target the metric cannot take, such as an IRR of -100% or lower
+            return gr.update(value=f"""
+            <div class="kpi-card warning fadeIn">
+                <div class="kpi-note">{e}</div>
+            </div>
+            """, visible=True)
         except Exception as e:
-            print(f"Offer generation error: {e}")
-            return {
-                'tier': 'starter',
-                'title': 'Immigration Exploration Package',
-                'price': '$297',
-                'discount_price': '$97',
-                'value': '$500+',
-                'urgency': 'Limited time offer',
-                'includes': ['Basic consultation', 'Initial assessment'],
-                'cta': 'Get Started',
-                'guarantee': 'Money-back guarantee'
-            }
+            record_error("Goal seek error", e)
+            return gr.update(value="", visible=False)
 
 # =========================
 # MAIN APPLICATION BUILDER - FIXED
@@ -1167,6 +1140,9 @@ class LeadEngine:
 def create_premium_immigration_app():
     """Create the enhanced VisaTier 4.0 application"""
     
+    # Country insight cards are built once per reference data version; do it before the first event
+    _insight_cards(data_version())
+    
     with gr.Blocks(theme=PREMIUM_THEME, css=PREMIUM_CSS, title="VisaTier 4.0") as app:
         
         # State management
@@ -1317,40 +1293,23 @@ def create_premium_immigration_app():
                 
                 def update_insights(country_key, profile_key):
                     try:
-                        if country_key in ENHANCED_COUNTRIES and profile_key in ENHANCED_PROFILES:
-                            country = ENHANCED_COUNTRIES[country_key]
-                            profile = ENHANCED_PROFILES[profile_key]
-                            
-                            insight = country.market_insights.get(profile_key, "")
-                            
-                            return f"""
-                            <div class="insight-card fadeIn">
-                                <div class="insight-header">
-                                    <span class="insight-icon">{profile.icon}</span>
-                                    <h3 class="insight-title">{country.name} Insights for {profile.name}s</h3>
-                                </div>
-                                <div class="insight-description">{insight}</div>
-                                <div style="margin-top: 1rem;">
-                                    <strong>Key Metrics:</strong><br>
-                                    Corporate Tax: {country.corp_tax*100:.1f}% | Personal Tax: {country.pers_tax*100:.1f}%<br>
-                                    Living Cost: €{country.living_cost:,}/mo | Setup Cost: €{country.setup_cost:,}
-                                </div>
-                            </div>
-                            """
+                        return insight_card_html(country_key, profile_key)
                     except Exception as e:
-                        print(f"Insights update error: {e}")
+                        record_error("Insights update error", e)
                     return ""
                 
                 target_country.change(
                     update_insights,
                     inputs=[target_country, profile_selector],
-                    outputs=[country_insights]
+                    outputs=[country_insights],
+                    concurrency_limit=None
                 )
                 
                 profile_selector.change(
                     update_insights,
                     inputs=[target_country, profile_selector],
-                    outputs=[country_insights]
+                    outputs=[country_insights],
+                    concurrency_limit=None
                 )
                 
                 with gr.Accordion("🚀 Growth Projections", open=True):
@@ -1385,6 +1344,44 @@ def create_premium_immigration_app():
                         info="Your discount rate for NPV calculation"
                     )
                 
+                with gr.Accordion("🧭 Recommend Destinations", open=False):
+                    gr.Markdown("Rank every destination for your business metrics and growth assumptions.")
+                    with gr.Row():
+                        recommend_max_payback = gr.Number(
+                            value=None,
+                            label="⏱️ Max Payback (months)",
+                            info="Leave empty for no limit"
+                        )
+                        recommend_max_risk = gr.Number(
+                            value=None,
+                            label="🛡️ Max Risk Score",
+                            info="0-100, leave empty for no limit"
+                        )
+                    recommend_rank_by = gr.Dropdown(
+                        choices=RECOMMEND_RANK_CHOICES,
+                        value="npv",
+                        label="🏆 Rank By"
+                    )
+                    recommend_btn = gr.Button("🧭 Find Best Destinations", variant="secondary")
+                    recommendations = gr.HTML("", visible=False)
+                
+                with gr.Accordion("🎯 Goal Seek", open=False):
+                    gr.Markdown("Find the value one input needs for a target, with everything else held.")
+                    with gr.Row():
+                        goal_input = gr.Dropdown(
+                            choices=[(label, name) for name, label in SENSITIVITY_LABELS.items()],
+                            value="revenue_multiplier",
+                            label="🎚️ Solve For"
+                        )
+                        goal_metric = gr.Dropdown(
+                            choices=GOAL_METRIC_CHOICES,
+                            value="payback_months",
+                            label="📐 Target Metric"
+                        )
+                        goal_target = gr.Number(value=24, label="🏁 Target Value")
+                    goal_btn = gr.Button("🎯 Solve", variant="secondary")
+                    goal_result = gr.HTML("", visible=False)
+                
                 # Enhanced Calculate Button
                 calculate_btn = gr.Button(
                     "🚀 Calculate Advanced ROI Analysis",
@@ -1411,189 +1408,7 @@ def create_premium_immigration_app():
                 lead_capture_modal = gr.HTML("", visible=False)
                 comparison_tools = gr.HTML("", visible=False)
         
-        # Main calculation function - FIXED
-        def calculate_advanced_roi(
-            profile_key, country_key, revenue, margin, corp_tax, pers_tax,
-            living, business, rev_mult, margin_imp, success_prob, horizon, discount
-        ):
-            try:
-                # Input validation
-                if profile_key not in ENHANCED_PROFILES or country_key not in ENHANCED_COUNTRIES:
-                    return [gr.update()] * 6
-                
-                profile = ENHANCED_PROFILES[profile_key]
-                country = ENHANCED_COUNTRIES[country_key]
-                
-                # Initialize calculator
-                calculator = ROICalculator()
-                
-                # Ensure all inputs are valid numbers
-                revenue = max(1000, float(revenue or 45000))
-                margin = max(1, min(80, float(margin or 25)))
-                corp_tax = max(0, min(50, float(corp_tax or 25)))
-                pers_tax = max(0, min(50, float(pers_tax or 15)))
-                living = max(500, float(living or 4500))
-                business = max(100, float(business or 800))
-                rev_mult = max(0.5, min(10, float(rev_mult or 2.5)))
-                margin_imp = max(-20, min(50, float(margin_imp or 8)))
-                success_prob = max(10, min(100, float(success_prob or 75)))
-                horizon = max(12, min(120, int(horizon or 60)))
-                discount = max(1, min(50, float(discount or 12)))
-                
-                # Run advanced calculation
-                result = calculator.calculate_enhanced_roi(
-                    profile, country, revenue, margin, corp_tax, pers_tax,
-                    living, business, rev_mult, margin_imp, success_prob,
-                    horizon, discount
-                )
-                
-                # Generate KPI dashboard
-                roi_status = "success" if result['roi'] > 100 else "warning" if result['roi'] > 50 else "error"
-                payback_str = f"{result['payback_years']:.1f} years" if result['payback_years'] != float('inf') else "Never"
-                
-                kpi_html = f"""
-                <div class="kpi-grid fadeIn">
-                    <div class="kpi-card {roi_status}">
-                        <div class="kpi-label">🚀 5-Year ROI</div>
-                        <div class="kpi-value">{result['roi']:.1f}%</div>
-                        <div class="kpi-note">Total return on investment</div>
-                    </div>
-                    <div class="kpi-card">
-                        <div class="kpi-label">💰 Payback Period</div>
-                        <div class="kpi-value">{payback_str}</div>
-                        <div class="kpi-note">Time to break even</div>
-                    </div>
-                    <div class="kpi-card">
-                        <div class="kpi-label">💎 Net Present Value</div>
-                        <div class="kpi-value">€{result['npv']:,.0f}</div>
-                        <div class="kpi-note">Today's value of future returns</div>
-                    </div>
-                    <div class="kpi-card">
-                        <div class="kpi-label">📈 Internal Rate of Return</div>
-                        <div class="kpi-value">{result['irr_annual']:.1f}%</div>
-                        <div class="kpi-note">Annualized rate of return</div>
-                    </div>
-                </div>
-                """
-                
-                # Generate main chart
-                chart = ChartGenerator.create_roi_dashboard(
-                    result, country.name, profile.name
-                )
-                
-                # Generate insights
-                risk_score = result.get('risk_score', 50)
-                opportunity_score = result.get('opportunity_score', 50)
-                
-                insights_html = f"""
-                <div class="insights-grid fadeIn">
-                    <div class="insight-card">
-                        <div class="insight-header">
-                            <span class="insight-icon">🎯</span>
-                            <h3 class="insight-title">Investment Recommendation</h3>
-                        </div>
-                        <div class="insight-description">
-                            Based on your {profile.name} profile and {country.name} opportunity analysis:
-                            <br><strong>Risk Score:</strong> {risk_score:.1f}/100
-                            <br><strong>Opportunity Score:</strong> {opportunity_score:.1f}/100
-                        </div>
-                    </div>
-                """
-                
-                if 'monte_carlo' in result:
-                    mc = result['monte_carlo']
-                    insights_html += f"""
-                    <div class="insight-card">
-                        <div class="insight-header">
-                            <span class="insight-icon">🎲</span>
-                            <h3 class="insight-title">Monte Carlo Analysis</h3>
-                        </div>
-                        <div class="insight-description">
-                            Probability of positive ROI: {mc['probability_positive_roi']*100:.1f}%
-                            <br>Mean ROI: {mc['mean_roi']:.1f}% ± {mc['std_roi']:.1f}%
-                            <br>90% Confidence Interval: {mc['confidence_intervals'].get('roi_10', 0):.1f}% - {mc['confidence_intervals'].get('roi_90', 0):.1f}%
-                        </div>
-                    </div>
-                    """
-                
-                insights_html += "</div>"
-                
-                # Generate lead capture
-                lead_engine = LeadEngine()
-                offer = lead_engine.generate_personalized_offer(result, profile, country)
-                
-                lead_html = f"""
-                <div class="lead-modal slideUp">
-                    <h3>🎁 Claim Your {offer['title']}</h3>
-                    <div class="value-badge">Worth {offer['value']} - Special Price: {offer['discount_price']}</div>
-                    <div class="urgency-text">{offer['urgency']}</div>
-                    
-                    <div style="background: #f8fafc; padding: 1rem; border-radius: 8px; margin: 1rem 0;">
-                        <strong>🎯 You'll Get:</strong>
-                        <ul style="margin: 0.5rem 0; padding-left: 1.5rem;">
-                """
-                
-                for item in offer['includes']:
-                    lead_html += f"<li>{item}</li>"
-                
-                lead_html += f"""
-                        </ul>
-                    </div>
-                    
-                    <input type="email" placeholder="Enter your email for instant access" class="form-input">
-                    <label style="display: block; margin: 0.5rem 0; font-size: 14px;">
-                        <input type="checkbox" style="margin-right: 8px;"> I agree to privacy policy and communications
-                    </label>
-                    <button class="cta-button" style="width: 100%;">{offer['cta']}</button>
-                    <div style="text-align: center; margin-top: 1rem; font-size: 12px; color: #64748b;">
-                        {offer['guarantee']} | <a href="#" onclick="requestDataDeletion()">Request data deletion</a>
-                    </div>
-                </div>
-                
-                <script>
-                function requestDataDeletion() {{
-                    alert('Data deletion request recorded. We will process within 30 days per GDPR requirements.');
-                }}
-                </script>
-                """
-                
-                # Generate comparison tools
-                comparison_html = """
-                <div style="margin: 2rem 0;">
-                    <h3>Multi-Country Comparison</h3>
-                    <div style="background: white; padding: 1rem; border-radius: 12px; box-shadow: var(--shadow);">
-                        Compare your results across different countries to make the optimal decision.
-                    </div>
-                </div>
-                """
-                
-                return (
-                    gr.update(value=kpi_html, visible=True),
-                    gr.update(value=chart, visible=True),
-                    gr.update(value=insights_html, visible=True),
-                    gr.update(value=lead_html, visible=True),
-                    gr.update(value=comparison_html, visible=True),
-                    result
-                )
-                
-            except Exception as e:
-                print(f"Calculation error: {e}")
-                error_html = f"""
-                <div class="kpi-card error">
-                    <div class="kpi-value">Error</div>
-                    <div class="kpi-note">Calculation failed: {str(e)}</div>
-                </div>
-                """
-                return (
-                    gr.update(value=error_html, visible=True),
-                    gr.update(visible=False),
-                    gr.update(visible=False),
-                    gr.update(visible=False),
-                    gr.update(visible=False),
-                    {}
-                )
-        
-        # Connect the calculation
+        # Connect the calculation; heavy analyses share one bounded concurrency group
         calculate_btn.click(
             calculate_advanced_roi,
             inputs=[
@@ -1605,7 +1420,35 @@ def create_premium_immigration_app():
             outputs=[
                 kpi_dashboard, main_chart, insights_panel,
                 lead_capture_modal, comparison_tools, calculation_results
-            ]
+            ],
+            concurrency_limit=ANALYSIS_WORKERS,
+            concurrency_id="analysis"
+        )
+        
+        # One vectorized pass over every country; light enough to skip the analysis group
+        recommend_btn.click(
+            render_recommendations,
+            inputs=[
+                profile_selector, current_revenue, current_margin,
+                current_corp_tax, current_pers_tax, current_living, current_business,
+                revenue_multiplier, margin_improvement, success_probability,
+                time_horizon, discount_rate, recommend_max_payback, recommend_max_risk, recommend_rank_by
+            ],
+            outputs=[recommendations],
+            concurrency_limit=None
+        )
+        
+        # Closed-form solve, or a short bracketed search for the horizon and discount rate
+        goal_btn.click(
+            render_goal_seek,
+            inputs=[
+                profile_selector, target_country, current_revenue, current_margin,
+                current_corp_tax, current_pers_tax, current_living, current_business,
+                revenue_multiplier, margin_improvement, success_probability,
+                time_horizon, discount_rate, goal_input, goal_metric, goal_target
+            ],
+            outputs=[goal_result],
+            concurrency_limit=None
         )
         
         # Auto-update form based on profile selection
@@ -1619,13 +1462,14 @@ def create_premium_immigration_app():
                         profile.risk_tolerance
                     )
             except Exception as e:
-                print(f"Profile update error: {e}")
+                record_error("Profile update error", e)
             return 45000, 25, 75
         
         profile_selector.change(
             update_form_for_profile,
             inputs=[profile_selector],
-            outputs=[current_revenue, current_margin, success_probability]
+            outputs=[current_revenue, current_margin, success_probability],
+            concurrency_limit=None
         )
         
         # Multi-country comparison feature
@@ -1646,13 +1490,14 @@ def create_premium_immigration_app():
                         chart = ChartGenerator.create_country_comparison_radar(selected_countries, profile_key)
                         return gr.update(value=chart, visible=True)
                 except Exception as e:
-                    print(f"Comparison error: {e}")
+                    record_error("Comparison error", e)
                 return gr.update(visible=False)
             
             comparison_countries.change(
                 generate_comparison,
                 inputs=[comparison_countries, profile_selector],
-                outputs=[comparison_chart]
+                outputs=[comparison_chart],
+                concurrency_limit=None
             )
         
         # Enhanced Footer
@@ -1708,31 +1553,27 @@ def create_premium_immigration_app():
         </div>
         """)
     
+    # Bounded queue; light UI events opt out of the default limit, analyses use their own group
+    app.queue(max_size=ANALYSIS_QUEUE_SIZE, default_concurrency_limit=1)
     return app
 
-# =========================
-# ADDITIONAL UTILITY FUNCTIONS
-# =========================
-
-def generate_pdf_report(result: Dict, profile: UserProfile, country: CountryData) -> str:
-    """Generate comprehensive PDF report (placeholder for actual implementation)"""
-    return f"PDF report generated for {profile.name} -> {country.name} migration analysis"
-
-def send_to_crm(email: str, profile: str, result: Dict) -> bool:
-    """Send lead data to CRM system (placeholder)"""
-    print(f"CRM: New lead {email} - {profile} - ROI: {result.get('roi', 0):.1f}%")
-    return True
-
-def schedule_consultation(email: str, profile: str, country: str, roi: float) -> str:
-    """Schedule consultation via Calendly API (placeholder)"""
-    return f"https://calendly.com/visatier/consultation?email={email}&profile={profile}"
-
 # =========================
 # MAIN EXECUTION
 # =========================
 
 if __name__ == "__main__":
-    # Create and launch the enhanced application
+    import sys
+    
+    # Headless JSON API only: python app.py --api, the same as python -m api
+    if "--api" in sys.argv:
+        import runpy
+        runpy.run_module("api", run_name="__main__")
+        sys.exit()
+    
+    # Create and launch the enhanced application, with metrics at http://127.0.0.1:9464/metrics
+    start_metrics_server(port=METRICS_PORT)
+    # Pick up edits to the reference data file without a restart
+    watch_reference_data()
     app = create_premium_immigration_app()
     
     # Development server
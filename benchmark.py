@@ -0,0 +1,202 @@
+# VisaTier 4.0 - Benchmark suite for the engine, charts and analysis handler
+# Usage: python benchmark.py [--only NAME ...] [--output results.json] [--save] [--threshold 0.25]
+#
+# Every case runs a fixed scenario with fixed seeds. Results are compared against
+# benchmark_baseline.json (per machine: regenerate it with --save after an intended change);
+# the run fails when any case is slower than the baseline by more than the threshold.
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+
+import numpy as np
+
+import engine
+from engine import ENHANCED_COUNTRIES, ROI_RESULT_CACHE, ROICalculator, Scenario, goal_seek, recommend_destinations, solve_irr
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+DEFAULT_THRESHOLD = 0.25
+REPEATS = 5
+SEED = 20240601
+
+# Fixed scenario every case runs on
+PROFILE_KEY = "tech_startup"
+COUNTRY_KEY = "UAE"
+SCENARIO = Scenario.create(PROFILE_KEY, COUNTRY_KEY)
+
+def calculator(**settings) -> ROICalculator:
+    """Calculator with a fixed seed and the given attribute overrides"""
+    calc = ROICalculator()
+    calc.monte_carlo_seed = SEED
+    for name, value in settings.items():
+        setattr(calc, name, value)
+    return calc
+
+def monte_carlo_case(**settings):
+    calc = calculator(**settings)
+    profile, country = SCENARIO.profile, SCENARIO.country
+    return lambda: calc._run_monte_carlo_simulation(profile, country, SCENARIO)
+
+def deterministic_case():
+    calc = calculator()
+    profile, country = SCENARIO.profile, SCENARIO.country
+    return lambda: calc._calculate_deterministic_roi(profile, country, SCENARIO)
+
+def irr_case(investments: int):
+    factors = calculator()._seasonal_factors(SCENARIO.country, SCENARIO)
+    flows = factors.seasonal * 2_000.0
+    setup = np.random.default_rng(SEED).uniform(10_000, 200_000, investments)
+    return lambda: solve_irr(flows, setup)
+
+def sensitivity_case():
+    calc = calculator()
+    profile, country = SCENARIO.profile, SCENARIO.country
+    return lambda: calc._perform_sensitivity_analysis(profile, country, SCENARIO)
+
+def global_sensitivity_case():
+    calc = calculator()
+    return lambda: calc.calculate_global_sensitivity(SCENARIO, samples=1 << 12, seed=SEED)
+
+def recommend_case():
+    return lambda: recommend_destinations(SCENARIO, k=5, max_payback_months=36)
+
+def goal_seek_case(name: str):
+    return lambda: goal_seek(SCENARIO, name, "npv", 0.0)
+
+def dashboard_case():
+    from app import ChartGenerator
+    result = calculator().calculate_scenario(SCENARIO)
+    profile, country = SCENARIO.profile, SCENARIO.country
+    return lambda: ChartGenerator.create_roi_dashboard(result, country.name, profile.name, PROFILE_KEY).to_json()
+
+def radar_case():
+    from app import ChartGenerator
+    countries = list(ENHANCED_COUNTRIES)[:5]
+    return lambda: ChartGenerator.create_country_comparison_radar(countries, PROFILE_KEY).to_json()
+
+def handler_case(cached: bool):
+    from app import calculate_advanced_roi
+    inputs = (PROFILE_KEY, COUNTRY_KEY, *SCENARIO.inputs().values())
+
+    async def drain():
+        async for outputs in calculate_advanced_roi(*inputs):
+            pass
+        return outputs
+    
+    def run():
+        if not cached:
+            ROI_RESULT_CACHE.clear()
+        return asyncio.run(drain())
+    return run
+
+# name -> factory returning the zero-argument callable to time
+CASES = {
+    "deterministic_roi": deterministic_case,
+    "irr_single": lambda: irr_case(1),
+    "irr_batch_100k": lambda: irr_case(100_000),
+    "monte_carlo_10k": lambda: monte_carlo_case(monte_carlo_iterations=10_000),
+    "monte_carlo_100k": lambda: monte_carlo_case(monte_carlo_iterations=100_000),
+    "monte_carlo_1m": lambda: monte_carlo_case(monte_carlo_iterations=1_000_000),
+    "monte_carlo_100k_variance_reduced": lambda: monte_carlo_case(
+        monte_carlo_iterations=100_000, variance_reduction=("antithetic", "control_variate")),
+    "monte_carlo_sobol": lambda: monte_carlo_case(sampling="sobol"),
+    "monte_carlo_4m_parallel": lambda: monte_carlo_case(monte_carlo_iterations=4_000_000, parallel_workers=4),
+    "sensitivity_tornado": sensitivity_case,
+    "sensitivity_global_4k": global_sensitivity_case,
+    "recommend_destinations": recommend_case,
+    "goal_seek_linear": lambda: goal_seek_case("revenue_multiplier"),
+    "goal_seek_bracketed": lambda: goal_seek_case("discount_rate"),
+    "chart_dashboard": dashboard_case,
+    "chart_radar": radar_case,
+    "handler_uncached": lambda: handler_case(cached=False),
+    "handler_cached": lambda: handler_case(cached=True),
+}
+
+def measure(function) -> dict:
+    """Best and median seconds per call over REPEATS rounds of an autoranged loop count"""
+    timer = timeit.Timer(function)
+    loops, _ = timer.autorange()
+    rounds = [elapsed / loops for elapsed in timer.repeat(repeat=REPEATS, number=loops)]
+    return {"best_ms": min(rounds) * 1000, "median_ms": statistics.median(rounds) * 1000, "loops": loops}
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "data_version": engine.data_version(),
+    }
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """(name, baseline ms, current ms, ratio) for every case slower than baseline * (1 + threshold)"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if previous is None:
+            continue
+        ratio = current["best_ms"] / previous["best_ms"]
+        if ratio > 1 + threshold:
+            regressions.append((name, previous["best_ms"], current["best_ms"], ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ROI engine, charts and handler")
+    parser.add_argument("--only", nargs="+", choices=sorted(CASES), help="run only these cases")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown against the baseline, as a fraction")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or CASES:
+        started = time.perf_counter()
+        results[name] = measure(CASES[name]())
+        print(f"  {name:<36} {results[name]['best_ms']:10.3f} ms  "
+              f"(median {results[name]['median_ms']:.3f}, {results[name]['loops']} loops, "
+              f"{time.perf_counter() - started:.1f} s)")
+    engine.shutdown_monte_carlo_pool()
+
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(), "benchmarks": results}
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+
+    if args.save:
+        if args.only and os.path.exists(args.baseline):
+            # Partial runs update their cases and keep the rest of the baseline
+            with open(args.baseline) as handle:
+                report["benchmarks"] = {**json.load(handle)["benchmarks"], **results}
+        with open(args.baseline, "w") as handle:
+            json.dump(report, handle, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against; run with --save to create one")
+        return 0
+    with open(args.baseline) as handle:
+        baseline = json.load(handle)
+    if baseline.get("environment", {}).get("machine") != report["environment"]["machine"]:
+        print("Note: baseline was recorded on a different machine")
+
+    regressions = compare(results, baseline, args.threshold)
+    for name, previous, current, ratio in regressions:
+        print(f"REGRESSION: {name} {previous:.3f} ms -> {current:.3f} ms ({ratio:.2f}x)")
+    if regressions:
+        print(f"FAIL: {len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}")
+        return 1
+    print("OK")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
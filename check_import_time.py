@@ -0,0 +1,63 @@
+# VisaTier 4.0 - Cold-start budget for the calculation engine
+# Usage: python check_import_time.py [module] [budget_seconds]
+
+import os
+import subprocess
+import sys
+import time
+
+DEFAULT_MODULE = "engine"
+DEFAULT_BUDGET = 0.5
+RUNS = 5
+
+# UI and plotting packages the engine must never pull in
+FORBIDDEN = ("gradio", "plotly", "pandas", "fastapi")
+
+def measure(module: str):
+    """Wall time of a fresh interpreter importing module, with its -X importtime report"""
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    return time.perf_counter() - started, completed.stderr
+
+def parse_importtime(report: str):
+    """(cumulative microseconds, package) for each top-level package in the report"""
+    packages = {}
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if not cumulative.isdigit():
+            continue
+        top = name.strip().split(".")[0]
+        packages[top] = max(packages.get(top, 0), int(cumulative))
+    return sorted(((us, name) for name, us in packages.items()), reverse=True)
+
+def main():
+    module = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_MODULE
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_BUDGET
+
+    # Best of several runs, so a busy machine does not fail the check
+    runs = [measure(module) for _ in range(RUNS)]
+    elapsed, report = min(runs)
+    packages = parse_importtime(report)
+
+    print(f"Cold start of 'import {module}': {elapsed * 1000:.0f} ms (best of {RUNS}, budget {budget * 1000:.0f} ms)")
+    for us, name in packages[:10]:
+        print(f"  {name:<24} {us / 1000:8.1f} ms")
+
+    loaded = sorted({name for _, name in packages} & set(FORBIDDEN))
+    if module == DEFAULT_MODULE and loaded:
+        print(f"FAIL: engine imports UI packages: {', '.join(loaded)}")
+        return 1
+    if elapsed > budget:
+        print("FAIL: over budget")
+        return 1
+    print("OK")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2166 @@
+# VisaTier 4.0 - Calculation engine
+# Profiles, countries and the ROI engine, importable without the UI stack
+
+import math
+import numpy as np
+import json
+import struct
+import hashlib
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple, Optional
+from dataclasses import dataclass, fields
+from functools import lru_cache
+import atexit
+import copy
+import threading
+import time
+import os
+import tempfile
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import METRICS
+from tracing import record_error
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# =========================
+# ENHANCED DATA MODELS - FIXED
+# =========================
+
+@dataclass
+class UserProfile:
+    id: str
+    name: str
+    icon: str
+    typical_revenue: float
+    risk_tolerance: int
+    key_concerns: List[str]
+    success_multiplier: float
+    margin_expectations: Tuple[float, float]
+    
+@dataclass
+class CountryData:
+    name: str
+    corp_tax: float
+    pers_tax: float
+    living_cost: float
+    business_cost: float
+    setup_cost: float
+    currency: str
+    market_growth: float
+    ease_score: float
+    banking_score: float
+    partnership_score: float
+    visa_options: List[str]
+    market_insights: Dict[str, str]
+    risk_factors: Dict[str, float]
+    seasonality: List[float]
+
+# =========================
+# COLUMNAR COUNTRY TABLE
+# =========================
+
+# Numeric CountryData fields, in column order of the numeric country matrix
+COUNTRY_COLUMNS = ('corp_tax', 'pers_tax', 'living_cost', 'business_cost', 'setup_cost',
+                   'market_growth', 'ease_score', 'banking_score', 'partnership_score')
+# risk_factors entries in column order, their weights, and the value of a missing entry
+RISK_FACTORS = ('political', 'economic', 'regulatory')
+_RISK_WEIGHTS = np.array([30.0, 40.0, 30.0])
+_DEFAULT_RISK_FACTOR = 0.1
+SEASONALITY_MONTHS = 12
+# The matrix holds COUNTRY_COLUMNS, then RISK_FACTORS, then the monthly seasonality
+_RISK_COLUMNS = slice(len(COUNTRY_COLUMNS), len(COUNTRY_COLUMNS) + len(RISK_FACTORS))
+_SEASONALITY_COLUMNS = slice(_RISK_COLUMNS.stop, _RISK_COLUMNS.stop + SEASONALITY_MONTHS)
+# corp_tax, pers_tax, living_cost, business_cost: the country arguments of relocation_delta
+_PARAM_COLUMNS = slice(0, 4)
+_SETUP_COST_COLUMN = COUNTRY_COLUMNS.index('setup_cost')
+# Axes of the country comparison radar, in column order of CountryTable.radar_scores
+RADAR_CATEGORIES = ('Tax Efficiency', 'Cost of Living', 'Market Growth', 'Ease of Business', 'Banking', 'Overall Score')
+
+def risk_score(risk_factors, risk_tolerance):
+    """Overall risk score (0-100, lower is better) from (..., 3) risk factors and a profile's risk tolerance"""
+    total_risk = np.asarray(risk_factors, dtype=float) @ _RISK_WEIGHTS
+    # Adjust for profile risk tolerance
+    return np.minimum(100, total_risk * (1 + (100 - risk_tolerance) / 100))
+
+def opportunity_score(roi, market_growth, ease_score, partnership_score):
+    """Opportunity score (0-100, higher is better); ROI contributes at most 50 points, reached at 200%"""
+    return np.minimum(100, np.minimum(50, np.asarray(roi) / 4) + market_growth * 5 + ease_score * 2 + partnership_score / 2)
+
+def country_matrix(countries: Dict[str, CountryData]) -> np.ndarray:
+    """Numeric country matrix: one row per country, COUNTRY_COLUMNS + RISK_FACTORS + seasonality"""
+    rows = []
+    for key, country in countries.items():
+        if len(country.seasonality) != SEASONALITY_MONTHS:
+            raise ValueError(f"{key}: seasonality needs {SEASONALITY_MONTHS} factors")
+        rows.append(
+            [getattr(country, name) for name in COUNTRY_COLUMNS]
+            + [country.risk_factors.get(factor, _DEFAULT_RISK_FACTOR) for factor in RISK_FACTORS]
+            + list(country.seasonality)
+        )
+    return np.array(rows, dtype=float).reshape(len(rows), _SEASONALITY_COLUMNS.stop)
+
+@dataclass(frozen=True, eq=False)
+class CountryTable:
+    """Read-only columnar view of a country table, one row per country in table order.
+    
+    The columns are views into matrix, which may be memory-mapped.
+    """
+    version: str                # data_version() the table was built from
+    keys: Tuple[str, ...]
+    names: Tuple[str, ...]
+    index: Dict[str, int]       # row of each key
+    matrix: np.ndarray          # see country_matrix
+    corp_tax: np.ndarray
+    pers_tax: np.ndarray
+    living_cost: np.ndarray
+    business_cost: np.ndarray
+    setup_cost: np.ndarray
+    market_growth: np.ndarray
+    ease_score: np.ndarray
+    banking_score: np.ndarray
+    partnership_score: np.ndarray
+    risk_factors: np.ndarray    # countries x RISK_FACTORS
+    seasonality: np.ndarray     # countries x 12
+    
+    @classmethod
+    def from_matrix(cls, version: str, countries: Dict[str, CountryData], matrix: np.ndarray) -> "CountryTable":
+        if not isinstance(matrix, np.memmap):
+            matrix = matrix.copy()
+            matrix.setflags(write=False)
+        return cls(
+            version=version,
+            keys=tuple(countries),
+            names=tuple(country.name for country in countries.values()),
+            index={key: row for row, key in enumerate(countries)},
+            matrix=matrix,
+            **{name: matrix[:, column] for column, name in enumerate(COUNTRY_COLUMNS)},
+            risk_factors=matrix[:, _RISK_COLUMNS],
+            seasonality=matrix[:, _SEASONALITY_COLUMNS]
+        )
+    
+    @classmethod
+    def from_countries(cls, countries: Dict[str, CountryData], version: str) -> "CountryTable":
+        return cls.from_matrix(version, countries, country_matrix(countries))
+    
+    def __len__(self) -> int:
+        return len(self.keys)
+    
+    def rows(self, keys) -> np.ndarray:
+        """Row indices of country keys"""
+        return np.array([self.index[key] for key in keys], dtype=np.intp)
+    
+    def country_params(self, rows=slice(None)) -> np.ndarray:
+        """(corp_tax, pers_tax, living_cost, business_cost) x rows, as taken by relocation_delta"""
+        return self.matrix[rows, _PARAM_COLUMNS].T
+    
+    def risk_scores(self, profile: UserProfile) -> np.ndarray:
+        return risk_score(self.risk_factors, profile.risk_tolerance)
+    
+    def opportunity_scores(self, roi) -> np.ndarray:
+        """Opportunity score of every country for its ROI (one value or one per country)"""
+        return opportunity_score(roi, self.market_growth, self.ease_score, self.partnership_score)
+    
+    def radar_scores(self) -> np.ndarray:
+        """Countries x RADAR_CATEGORIES on a 0-100 scale"""
+        return np.column_stack([
+            (1 - (self.corp_tax + self.pers_tax)) * 100,
+            np.maximum(0, 100 - self.living_cost / 100),
+            self.market_growth * 10,
+            self.ease_score * 10,
+            self.banking_score * 10,
+            self.partnership_score
+        ])
+
+# =========================
+# REFERENCE DATA
+# =========================
+
+# Profiles and countries; VISATIER_REFERENCE_DATA points the engine at another file
+REFERENCE_DATA_PATH = os.environ.get(
+    "VISATIER_REFERENCE_DATA",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "reference_data.json")
+)
+REFERENCE_SCHEMA_VERSION = 1
+# Seconds between checks of the reference file by watch_reference_data
+REFERENCE_POLL_INTERVAL = 5.0
+# Memory-mapped country matrices; VISATIER_COMPILED_DIR moves them out of the temp directory
+COMPILED_DATA_DIR = os.environ.get("VISATIER_COMPILED_DIR", os.path.join(tempfile.gettempdir(), "visatier-compiled"))
+# Seconds after its last load before a compiled matrix may be deleted
+COMPILED_MAX_AGE = 7 * 24 * 3600
+
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=list).encode()).hexdigest()[:16]
+
+@dataclass(frozen=True, eq=False)
+class ReferenceData:
+    """One immutable version of the profile and country tables"""
+    version: str                        # digest of every profile and country
+    path: str
+    mtime_ns: int
+    profiles: Dict[str, UserProfile]
+    countries: Dict[str, CountryData]
+    profile_versions: Dict[str, str]    # digest per profile
+    country_versions: Dict[str, str]    # digest per country
+    table: CountryTable
+    matrix_path: Optional[str]          # memory-mapped numeric matrix, None if it could not be written
+
+def _map_country_matrix(path: str, version: str, matrix: np.ndarray) -> Tuple[np.ndarray, Optional[str]]:
+    """Memory-map matrix from a file in COMPILED_DATA_DIR named after path and version.
+    
+    The file is written on first use and immutable afterwards, so every process
+    mapping a version shares its pages. Other processes may still map older
+    versions, so those are only deleted once no load has touched them for
+    COMPILED_MAX_AGE. Falls back to the in-memory matrix when the directory is
+    not writable.
+    """
+    prefix = f"countries-{_digest(os.path.abspath(path))}-"
+    matrix_path = os.path.join(COMPILED_DATA_DIR, f"{prefix}{version}.npy")
+    try:
+        if os.path.exists(matrix_path):
+            os.utime(matrix_path)
+        else:
+            os.makedirs(COMPILED_DATA_DIR, exist_ok=True)
+            staging = f"{matrix_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(staging, "wb") as handle:
+                    np.save(handle, matrix)
+                os.replace(staging, matrix_path)
+            finally:
+                if os.path.exists(staging):
+                    os.remove(staging)
+        mapped = np.load(matrix_path, mmap_mode='r')
+        if mapped.shape == matrix.shape and np.array_equal(mapped, matrix):
+            _prune_compiled_matrices(matrix_path)
+            return mapped, matrix_path
+    except (OSError, ValueError) as e:
+        record_error("Country matrix could not be memory-mapped", e, path=matrix_path)
+    return matrix, None
+
+def _prune_compiled_matrices(current: str):
+    """Delete matrix files no load has touched for COMPILED_MAX_AGE.
+    
+    A process still mapping one keeps its pages; pools it starts later give
+    their workers copies instead (see MonteCarloPool).
+    """
+    cutoff = time.time() - COMPILED_MAX_AGE
+    for name in os.listdir(COMPILED_DATA_DIR):
+        stale = os.path.join(COMPILED_DATA_DIR, name)
+        if not (name.startswith("countries-") and name.endswith(".npy")) or stale == current:
+            continue
+        try:
+            if os.stat(stale).st_mtime < cutoff:
+                os.remove(stale)
+        except OSError:
+            pass
+
+def load_reference_data(path: str = REFERENCE_DATA_PATH) -> ReferenceData:
+    """Read and validate a reference data file"""
+    mtime_ns = os.stat(path).st_mtime_ns
+    with open(path, encoding="utf-8") as handle:
+        document = json.load(handle)
+    if document.get("schema_version") != REFERENCE_SCHEMA_VERSION:
+        raise ValueError(f"{path}: unsupported schema_version {document.get('schema_version')!r}")
+    
+    profiles = {
+        key: UserProfile(**{**entry, "margin_expectations": tuple(entry["margin_expectations"])})
+        for key, entry in document["profiles"].items()
+    }
+    countries = {key: CountryData(**entry) for key, entry in document["countries"].items()}
+    if not profiles or not countries:
+        raise ValueError(f"{path}: needs at least one profile and one country")
+    
+    profile_data = {key: vars(profile) for key, profile in profiles.items()}
+    country_data = {key: vars(country) for key, country in countries.items()}
+    version = _digest({"profiles": profile_data, "countries": country_data})
+    matrix, matrix_path = _map_country_matrix(path, version, country_matrix(countries))
+    return ReferenceData(
+        version=version,
+        path=path,
+        mtime_ns=mtime_ns,
+        profiles=profiles,
+        countries=countries,
+        profile_versions={key: _digest(data) for key, data in profile_data.items()},
+        country_versions={key: _digest(data) for key, data in country_data.items()},
+        table=CountryTable.from_matrix(version, countries, matrix),
+        matrix_path=matrix_path
+    )
+
+_reference: ReferenceData = load_reference_data()
+_reference_lock = threading.Lock()
+
+class _LiveTable(Mapping):
+    """Read-only mapping over one table of whichever reference data is current"""
+    
+    def __init__(self, attribute: str):
+        self._attribute = attribute
+    
+    def _table(self) -> Dict:
+        return getattr(_reference, self._attribute)
+    
+    def __getitem__(self, key):
+        return self._table()[key]
+    
+    def __contains__(self, key) -> bool:
+        return key in self._table()
+    
+    def __iter__(self):
+        return iter(self._table())
+    
+    def __len__(self) -> int:
+        return len(self._table())
+    
+    def get(self, key, default=None):
+        return self._table().get(key, default)
+    
+    def keys(self):
+        return self._table().keys()
+    
+    def values(self):
+        return self._table().values()
+    
+    def items(self):
+        return self._table().items()
+    
+    def __repr__(self) -> str:
+        return repr(self._table())
+
+ENHANCED_PROFILES: Mapping = _LiveTable("profiles")
+ENHANCED_COUNTRIES: Mapping = _LiveTable("countries")
+
+def reference_data() -> ReferenceData:
+    """The current reference data; hold on to it to read one consistent version"""
+    return _reference
+
+def data_version() -> str:
+    """Digest of the current profile and country tables; follows reloads"""
+    return _reference.version
+
+def get_country_table() -> CountryTable:
+    """Columnar view of the current ENHANCED_COUNTRIES"""
+    return _reference.table
+
+def reload_reference_data(path: Optional[str] = None) -> ReferenceData:
+    """Load the reference file again and swap it in atomically.
+    
+    Readers see either the old or the new version. Cached results of profiles and
+    countries whose data changed are dropped; all other entries stay valid.
+    """
+    global _reference
+    with _reference_lock:
+        previous = _reference
+        current = load_reference_data(path or previous.path)
+        if current.version == previous.version:
+            return previous
+        _reference = current
+    
+    changed_profiles = {key for key, version in previous.profile_versions.items()
+                        if current.profile_versions.get(key) != version}
+    changed_countries = {key for key, version in previous.country_versions.items()
+                         if current.country_versions.get(key) != version}
+    ROI_RESULT_CACHE.invalidate(
+        lambda key: key[0].profile_id in changed_profiles or key[0].country_key in changed_countries
+    )
+    METRICS.increment("reference_reloads_total")
+    return current
+
+def watch_reference_data(interval: float = REFERENCE_POLL_INTERVAL) -> threading.Thread:
+    """Reload the reference file in a daemon thread whenever it changes on disk.
+    
+    A file that fails to load is reported and the current version stays in use.
+    """
+    def poll():
+        while True:
+            time.sleep(interval)
+            try:
+                if os.stat(_reference.path).st_mtime_ns != _reference.mtime_ns:
+                    reload_reference_data()
+            except Exception as e:
+                record_error("Reference data reload error", e, path=_reference.path)
+    
+    thread = threading.Thread(target=poll, name="reference-data", daemon=True)
+    thread.start()
+    return thread
+
+# =========================
+# SCENARIO VALUE TYPE
+# =========================
+
+def find_country_key(country: CountryData) -> str:
+    """Key of country in ENHANCED_COUNTRIES, or its name for countries outside the table"""
+    for key, candidate in ENHANCED_COUNTRIES.items():
+        if candidate is country:
+            return key
+    return country.name
+
+# Clamp range and default (used when the input is missing) per numeric field
+_SCENARIO_LIMITS = {
+    "current_revenue": (1000, None, 45000),
+    "current_margin": (1, 80, 25),
+    "current_corp_tax": (0, 50, 25),
+    "current_pers_tax": (0, 50, 15),
+    "current_living": (500, None, 4500),
+    "current_business": (100, None, 800),
+    "revenue_multiplier": (0.5, 10, 2.5),
+    "margin_improvement": (-20, 50, 8),
+    "success_probability": (10, 100, 75),
+    "time_horizon": (12, 120, 60),
+    "discount_rate": (1, 50, 12)
+}
+
+# Tornado swing per input: ("relative", fraction of the value) or ("absolute", units)
+SENSITIVITY_STEPS = {
+    "current_revenue": ("relative", 0.10),
+    "current_margin": ("absolute", 5.0),
+    "current_corp_tax": ("absolute", 5.0),
+    "current_pers_tax": ("absolute", 5.0),
+    "current_living": ("relative", 0.10),
+    "current_business": ("relative", 0.10),
+    "revenue_multiplier": ("absolute", 0.2),
+    "margin_improvement": ("absolute", 2.0),
+    "success_probability": ("absolute", 10.0),
+    "time_horizon": ("absolute", 12),
+    "discount_rate": ("absolute", 2.0)
+}
+
+SENSITIVITY_LABELS = {
+    "current_revenue": "Current Revenue",
+    "current_margin": "Current Margin",
+    "current_corp_tax": "Current Corporate Tax",
+    "current_pers_tax": "Current Personal Tax",
+    "current_living": "Current Living Costs",
+    "current_business": "Current Business Costs",
+    "revenue_multiplier": "Revenue Multiplier",
+    "margin_improvement": "Margin Improvement",
+    "success_probability": "Success Probability",
+    "time_horizon": "Time Horizon",
+    "discount_rate": "Discount Rate"
+}
+
+# Network byte order after the two length-prefixed keys: inputs in field order, the horizon as uint16
+_SCENARIO_NUMBERS = struct.Struct("!9dHd")
+
+@dataclass(frozen=True, slots=True)
+class Scenario:
+    """One normalized set of calculator inputs.
+    
+    Build it with Scenario.create, which applies the input guards once; the
+    engine, caches and batch APIs then pass the instance around as is.
+    """
+    profile_id: str
+    country_key: str
+    current_revenue: float
+    current_margin: float
+    current_corp_tax: float
+    current_pers_tax: float
+    current_living: float
+    current_business: float
+    revenue_multiplier: float
+    margin_improvement: float
+    success_probability: float
+    time_horizon: int
+    discount_rate: float
+    
+    @classmethod
+    def create(cls, profile_id: str, country_key: str, *values, **named) -> "Scenario":
+        """Clamp raw inputs, given in field order or by name, into a canonical Scenario"""
+        names = list(_SCENARIO_LIMITS)
+        raw = dict(zip(names, values), **named)
+        normalized = {}
+        for name, (low, high, default) in _SCENARIO_LIMITS.items():
+            value = raw.get(name)
+            value = float(default if value is None or value == "" else value)
+            value = max(low, value) if high is None else max(low, min(high, value))
+            # Adding 0.0 folds -0.0 into 0.0 so equal inputs hash equally
+            normalized[name] = int(value) if name == "time_horizon" else value + 0.0
+        return cls(str(profile_id), str(country_key), **normalized)
+    
+    def replace(self, **changes) -> "Scenario":
+        """Copy with some inputs changed, normalized again"""
+        return Scenario.create(self.profile_id, self.country_key, **{**self.inputs(), **changes})
+    
+    def inputs(self) -> Dict[str, float]:
+        """Numeric inputs by name, in field order"""
+        return {name: getattr(self, name) for name in _SCENARIO_LIMITS}
+    
+    @property
+    def profile(self) -> UserProfile:
+        return ENHANCED_PROFILES[self.profile_id]
+    
+    @property
+    def country(self) -> CountryData:
+        return ENHANCED_COUNTRIES[self.country_key]
+    
+    def digest(self) -> str:
+        """Stable hex digest of the canonical binary encoding"""
+        return hashlib.blake2b(self.to_bytes(), digest_size=8).hexdigest()
+    
+    def to_bytes(self) -> bytes:
+        keys = b"".join(
+            struct.pack("!B", len(encoded)) + encoded
+            for encoded in (self.profile_id.encode(), self.country_key.encode())
+        )
+        return keys + _SCENARIO_NUMBERS.pack(*self.inputs().values())
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Scenario":
+        keys = []
+        offset = 0
+        for _ in range(2):
+            length = data[offset]
+            keys.append(data[offset + 1:offset + 1 + length].decode())
+            offset += 1 + length
+        return cls(*keys, *_SCENARIO_NUMBERS.unpack_from(data, offset))
+    
+    def to_dict(self) -> Dict:
+        return {field.name: getattr(self, field.name) for field in fields(self)}
+    
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), separators=(",", ":"))
+    
+    @classmethod
+    def from_json(cls, text: str) -> "Scenario":
+        data = json.loads(text)
+        return cls.create(data.pop("profile_id"), data.pop("country_key"), **data)
+
+# =========================
+# ADVANCED CALCULATION ENGINE - IMPROVED
+# =========================
+
+@dataclass(frozen=True, eq=False)
+class SeasonalFactors:
+    """Precomputed per-month factors for flows of the form monthly_delta * seasonality.
+    
+    With a constant monthly delta, NPV is monthly_delta * annuity - setup_cost,
+    the undiscounted return is monthly_delta * total and payback is a lookup in
+    the cumulative seasonality.
+    """
+    months: np.ndarray      # 1..horizon
+    seasonal: np.ndarray    # seasonality factor per month
+    discount: np.ndarray    # (1 + r_monthly) ** -month
+    cumulative: np.ndarray  # running sum of seasonal
+    annuity: float          # sum(seasonal * discount)
+    total: float            # sum(seasonal)
+    
+    def payback_months(self, monthly_delta, setup_cost):
+        """First month where cumulative cash flow covers setup_cost (inf if never)"""
+        delta = np.asarray(monthly_delta, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            threshold = np.where(delta > 0, setup_cost / delta, np.inf)
+        index = np.searchsorted(self.cumulative, threshold, side='left')
+        months = np.where(index < len(self.cumulative), index + 1.0, np.inf)
+        # Non-positive flows only break even when there is nothing to recover
+        months = np.where((delta <= 0) & (delta * self.cumulative[0] >= setup_cost), 1.0, months)
+        return months if months.ndim else float(months)
+
+def build_seasonal_factors(seasonality: Tuple[float, ...], discount_rate: float, time_horizon: int) -> SeasonalFactors:
+    """Seasonal discount table for a seasonality profile, annual rate (%) and horizon"""
+    months = np.arange(1, time_horizon + 1)
+    seasonal = np.asarray(seasonality, dtype=float)[(months - 1) % len(seasonality)]
+    discount_monthly = (1 + discount_rate/100) ** (1/12) - 1
+    discount = (1 + discount_monthly) ** -months.astype(float)
+    cumulative = np.cumsum(seasonal)
+    for array in (months, seasonal, discount, cumulative):
+        array.setflags(write=False)
+    return SeasonalFactors(
+        months=months,
+        seasonal=seasonal,
+        discount=discount,
+        cumulative=cumulative,
+        annuity=float(seasonal @ discount),
+        total=float(cumulative[-1]) if time_horizon > 0 else 0.0
+    )
+
+@lru_cache(maxsize=4096)
+def get_seasonal_factors(seasonality: Tuple[float, ...], discount_rate: float, time_horizon: int) -> SeasonalFactors:
+    """build_seasonal_factors, built once per argument set and shared"""
+    return build_seasonal_factors(seasonality, discount_rate, time_horizon)
+
+@dataclass(frozen=True, eq=False)
+class IRRResult:
+    """Annual IRRs for a batch of cash-flow vectors"""
+    rate: np.ndarray        # annual IRR as a fraction, NaN where not converged
+    converged: np.ndarray   # False where no root was found inside the search range
+    iterations: int
+
+# Below this many (paths x months) cells one power table is cheaper than a Horner loop
+_IRR_POWER_TABLE_CELLS = 4096
+
+def _polynomial_with_derivative(coefficients: np.ndarray, constant, x: np.ndarray):
+    """Evaluate constant + sum_m coefficients[:, m-1] * x**m and its derivative in x"""
+    degree = coefficients.shape[1]
+    if x.size * degree <= _IRR_POWER_TABLE_CELLS:
+        powers = x[:, None] ** np.arange(degree)
+        value = constant + x * np.sum(coefficients * powers, axis=1)
+        derivative = np.sum(coefficients * powers * np.arange(1, degree + 1), axis=1)
+        return value, derivative
+    
+    # Horner's scheme on x * q(x), carrying q and q' along
+    q = coefficients[:, -1].copy()
+    dq = np.zeros_like(q)
+    for m in range(degree - 2, -1, -1):
+        dq = dq * x + q
+        q = q * x + coefficients[:, m]
+    return constant + x * q, q + x * dq
+
+def solve_irr(flows, initial_investment, low=-0.99, high=5.0, tolerance=1e-12, max_iterations=50) -> IRRResult:
+    """Annual IRR of one or many monthly cash-flow vectors.
+    
+    flows is (months,) or (paths, months) with month 1 in column 0, and
+    initial_investment is paid at month 0 (scalar or one per path). A single
+    flow vector is shared by every path when several investments are given.
+    The NPV is a polynomial in x = 1 / (1 + monthly rate), which is solved
+    with Newton steps safeguarded by a bisection bracket over [low, high].
+    """
+    coefficients = np.atleast_2d(np.asarray(flows, dtype=float))
+    investment = np.asarray(initial_investment, dtype=float)
+    shared = coefficients.shape[0] == 1
+    paths = max(coefficients.shape[0], investment.size)
+    constant = -np.broadcast_to(investment, (paths,))
+    
+    # x decreases as the rate increases
+    x_low = np.full(paths, (1 + high) ** (-1/12))
+    x_high = np.full(paths, (1 + low) ** (-1/12))
+    f_low, _ = _polynomial_with_derivative(coefficients, constant, x_low)
+    f_high, _ = _polynomial_with_derivative(coefficients, constant, x_high)
+    
+    bracketed = np.sign(f_low) != np.sign(f_high)
+    converged = (f_low == 0) | (f_high == 0)
+    x = np.where(f_low == 0, x_low, np.where(f_high == 0, x_high, (x_low + x_high) / 2))
+    active = bracketed & ~converged
+    step = x_high - x_low
+    
+    iterations = 0
+    while active.any() and iterations < max_iterations:
+        iterations += 1
+        index = np.flatnonzero(active)
+        xa, lo, hi, f_lo = x[index], x_low[index], x_high[index], f_low[index]
+        rows = coefficients if shared else coefficients[index]
+        f, df = _polynomial_with_derivative(rows, constant[index], xa)
+        
+        # Shrink the bracket around the sign change
+        same_side = np.sign(f) == np.sign(f_lo)
+        lo = np.where(same_side, xa, lo)
+        hi = np.where(same_side, hi, xa)
+        x_low[index], x_high[index] = lo, hi
+        f_low[index] = np.where(same_side, f, f_lo)
+        
+        # Newton step, falling back to bisection when it leaves the bracket
+        # or would shrink the step less than bisection does
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = xa - f / df
+        inside = np.isfinite(newton) & (newton >= lo) & (newton <= hi)
+        fast = np.abs(2 * f) <= np.abs(step[index] * df)
+        x_next = np.where(inside & fast, newton, (lo + hi) / 2)
+        step[index] = x_next - xa
+        
+        done = (f == 0) | (np.abs(x_next - xa) <= tolerance * np.abs(xa)) | (hi - lo <= tolerance * hi)
+        x[index] = np.where(f == 0, xa, x_next)
+        converged[index] = done
+        active[index] = ~done
+    
+    rate = np.where(converged, x ** -12 - 1, np.nan)
+    return IRRResult(rate=rate, converged=converged, iterations=iterations)
+
+def relocation_delta(
+    success_multiplier, corp_tax, pers_tax, living_cost, business_cost,
+    current_revenue, current_margin, current_corp_tax, current_pers_tax,
+    current_living, current_business, revenue_multiplier, margin_improvement,
+    success_probability
+):
+    """Expected monthly cash-flow gain of relocating (scalars or NumPy arrays)"""
+    # Current situation
+    current_profit = current_revenue * (current_margin / 100)
+    current_after_tax = current_profit * (1 - current_corp_tax/100) * (1 - current_pers_tax/100)
+    current_net = current_after_tax - current_living - current_business
+    
+    # New situation
+    new_revenue = current_revenue * revenue_multiplier * success_multiplier
+    new_margin = np.minimum(90, current_margin + margin_improvement)
+    new_profit = new_revenue * (new_margin / 100)
+    new_after_tax = new_profit * (1 - corp_tax * 100) * (1 - pers_tax * 100)
+    new_net = new_after_tax - living_cost - business_cost
+    
+    return (new_net - current_net) * (success_probability / 100)
+
+# Standard deviations of the revenue, margin and success shocks
+SHOCK_SCALES = np.array([0.15, 0.10, 0.20])
+
+def shocked_monthly_deltas(shocks: np.ndarray, success_multiplier, country_params, scenario: Scenario) -> np.ndarray:
+    """Monthly deltas for standard-normal revenue, margin and success shocks of shape (3, paths).
+    
+    country_params is (corp_tax, pers_tax, living_cost, business_cost).
+    """
+    variance = 1.0 + SHOCK_SCALES[:, None] * shocks
+    revenue_variance = np.maximum(0.5, variance[0])
+    margin_variance = np.maximum(0.5, variance[1])
+    success_variance = np.maximum(0.1, variance[2])
+    
+    # Same input guards as the deterministic calculation, applied per path
+    revenues = np.maximum(1000, scenario.current_revenue * revenue_variance)
+    margins = np.clip(scenario.current_margin * margin_variance, 1, 80)
+    return relocation_delta(
+        success_multiplier, *country_params, revenues, margins,
+        scenario.current_corp_tax, scenario.current_pers_tax,
+        scenario.current_living, scenario.current_business,
+        scenario.revenue_multiplier, scenario.margin_improvement,
+        scenario.success_probability * success_variance
+    )
+
+def draw_monthly_deltas(rng: np.random.Generator, paths: int, success_multiplier, country_params, scenario: Scenario) -> np.ndarray:
+    """Monthly deltas for `paths` pseudo-random scenarios drawn from rng"""
+    return shocked_monthly_deltas(rng.standard_normal((3, paths)), success_multiplier, country_params, scenario)
+
+# =========================
+# QUASI-MONTE CARLO
+# =========================
+
+_SOBOL_BITS = 32
+
+# (degree, polynomial coefficients, initial direction numbers) per dimension after
+# the first, from Joe and Kuo's new-joe-kuo-6.21201 table
+_SOBOL_PARAMETERS = (
+    (1, 0, (1,)),
+    (2, 1, (1, 3)),
+    (3, 1, (1, 3, 1)),
+    (3, 2, (1, 1, 1)),
+    (4, 1, (1, 1, 3, 3))
+)
+
+def _sobol_direction_numbers() -> List[List[int]]:
+    """Direction numbers v_j (as 32-bit integers) for the first six Sobol dimensions"""
+    directions = [[1 << (_SOBOL_BITS - 1 - j) for j in range(_SOBOL_BITS)]]
+    for degree, coefficients, initial in _SOBOL_PARAMETERS:
+        m = list(initial)
+        for k in range(degree, _SOBOL_BITS):
+            value = m[k - degree] ^ (m[k - degree] << degree)
+            for i in range(1, degree):
+                if (coefficients >> (degree - 1 - i)) & 1:
+                    value ^= m[k - i] << i
+            m.append(value)
+        directions.append([m[j] << (_SOBOL_BITS - 1 - j) for j in range(_SOBOL_BITS)])
+    return directions
+
+_SOBOL_DIRECTIONS = _sobol_direction_numbers()
+
+class SobolSampler:
+    """Scrambled Sobol points in [0, 1)^d (linear matrix scramble plus digital shift), d <= 6"""
+    
+    def __init__(self, seed=None, dimensions: int = 3):
+        if not 1 <= dimensions <= len(_SOBOL_DIRECTIONS):
+            raise ValueError(f"SobolSampler supports 1 to {len(_SOBOL_DIRECTIONS)} dimensions")
+        self.dimensions = dimensions
+        rng = np.random.default_rng(seed)
+        directions = []
+        for dimension in _SOBOL_DIRECTIONS[:dimensions]:
+            # Random lower-triangular binary matrix with unit diagonal, bit 0 = most significant
+            scramble = np.tril(rng.integers(0, 2, (_SOBOL_BITS, _SOBOL_BITS)), -1) + np.eye(_SOBOL_BITS, dtype=int)
+            scrambled = []
+            for v in dimension:
+                bits = [(v >> (_SOBOL_BITS - 1 - c)) & 1 for c in range(_SOBOL_BITS)]
+                rows = scramble @ bits % 2
+                scrambled.append(int(sum(int(bit) << (_SOBOL_BITS - 1 - r) for r, bit in enumerate(rows))))
+            directions.append(scrambled)
+        self._directions = np.array(directions, dtype=np.uint64)
+        self._shift = rng.integers(0, 1 << _SOBOL_BITS, self.dimensions, dtype=np.uint64)
+        self.position = 0
+    
+    def random(self, n: int) -> np.ndarray:
+        """Next n points as an array of shape (dimensions, n)"""
+        index = np.arange(self.position, self.position + n, dtype=np.uint64)
+        gray = index ^ (index >> np.uint64(1))
+        points = np.broadcast_to(self._shift[:, None], (self.dimensions, n)).copy()
+        # Every bit set in any index of the batch contributes, not just the low ones
+        used_bits = int(np.bitwise_or.reduce(gray)).bit_length() if n else 0
+        for j in range(used_bits):
+            bit = ((gray >> np.uint64(j)) & np.uint64(1)).astype(bool)
+            points ^= np.where(bit, self._directions[:, j:j + 1], np.uint64(0))
+        self.position += n
+        # Centre each point in its 2^-32 cell so the inverse CDF never sees 0
+        return (points.astype(float) + 0.5) / float(1 << _SOBOL_BITS)
+
+# Coefficients of Acklam's rational approximation to the inverse normal CDF
+_NORM_A = (-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+           1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00)
+_NORM_B = (-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+           6.680131188771972e+01, -1.328068155288572e+01)
+_NORM_C = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+           -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00)
+_NORM_D = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00,
+           3.754408661907416e+00)
+
+def normal_ppf(u: np.ndarray) -> np.ndarray:
+    """Standard normal quantiles of u in (0, 1), relative error below 1.2e-9"""
+    u = np.asarray(u, dtype=float)
+    tail = np.minimum(u, 1 - u)
+    low = tail < 0.02425
+    
+    q = u - 0.5
+    r = q * q
+    central = (((((_NORM_A[0]*r + _NORM_A[1])*r + _NORM_A[2])*r + _NORM_A[3])*r + _NORM_A[4])*r + _NORM_A[5]) * q / \
+              (((((_NORM_B[0]*r + _NORM_B[1])*r + _NORM_B[2])*r + _NORM_B[3])*r + _NORM_B[4])*r + 1)
+    
+    t = np.sqrt(-2 * np.log(np.where(low, tail, 0.5)))
+    outer = (((((_NORM_C[0]*t + _NORM_C[1])*t + _NORM_C[2])*t + _NORM_C[3])*t + _NORM_C[4])*t + _NORM_C[5]) / \
+            ((((_NORM_D[0]*t + _NORM_D[1])*t + _NORM_D[2])*t + _NORM_D[3])*t + 1)
+    return np.where(low, np.where(u < 0.5, outer, -outer), central)
+
+# =========================
+# PARALLEL MONTE CARLO
+# =========================
+
+# Paths per shard; also bounds worker memory for very large runs
+MONTE_CARLO_SHARD_PATHS = 1_000_000
+# Histogram resolution used to merge percentiles across shards
+MONTE_CARLO_BINS = 8192
+# Paths drawn by the parent to place the histogram range
+_MONTE_CARLO_PILOT_PATHS = 10_000
+
+_worker_country_table = None
+
+def _attach_country_table(path: Optional[str], matrix: Optional[np.ndarray]):
+    """Pool initializer: memory-map the parent's numeric country matrix into this worker"""
+    global _worker_country_table
+    _worker_country_table = np.load(path, mmap_mode='r') if path else matrix
+
+def _monte_carlo_shard(seed, paths, row, success_multiplier, scenario: Scenario, bounds) -> Dict:
+    """Simulate one shard in a worker and reduce it to mergeable statistics"""
+    country = _worker_country_table[row]
+    setup_cost = float(country[_SETUP_COST_COLUMN])
+    factors = get_seasonal_factors(
+        tuple(country[_SEASONALITY_COLUMNS].tolist()), scenario.discount_rate, scenario.time_horizon
+    )
+    
+    delta = draw_monthly_deltas(
+        np.random.default_rng(seed), paths, success_multiplier, country[_PARAM_COLUMNS], scenario
+    )
+    
+    # Moments are shifted by the pilot centre to keep the variance numerically stable
+    centre = (bounds[0] + bounds[1]) / 2
+    shifted = delta - centre
+    histogram, _ = np.histogram(np.clip(delta, *bounds), bins=MONTE_CARLO_BINS, range=bounds)
+    return {
+        "count": paths,
+        "sum": float(shifted.sum()),
+        "sum_squares": float(shifted @ shifted),
+        "positive": int(np.count_nonzero(delta > 0)),
+        "paid_back": int(np.count_nonzero(np.isfinite(factors.payback_months(delta, setup_cost)))),
+        "histogram": histogram
+    }
+
+class MonteCarloPool:
+    """Warm worker processes sharing one version of the memory-mapped country matrix"""
+    
+    def __init__(self, workers: int, reference: ReferenceData):
+        self.workers = workers
+        self.version = reference.version
+        self._countries = reference.countries
+        self._rows = {key: row for row, key in enumerate(reference.countries)}
+        
+        # Workers map the same file; without one they get their own copy of the matrix
+        path = reference.matrix_path
+        if path is not None and not os.path.exists(path):
+            path = None
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_attach_country_table,
+            initargs=(path, None if path else np.asarray(reference.table.matrix))
+        )
+    
+    def row(self, country_key: str, country: CountryData) -> Optional[int]:
+        """Row of country_key in the pool's matrix.
+        
+        None when that reference version has no such key or holds different data
+        for it, so the workers would simulate another country.
+        """
+        if self._countries.get(country_key) != country:
+            return None
+        return self._rows[country_key]
+    
+    def map(self, function, *iterables) -> List:
+        return list(self._executor.map(function, *iterables))
+    
+    def close(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+_monte_carlo_pool: Optional[MonteCarloPool] = None
+_monte_carlo_pool_lock = threading.Lock()
+
+def get_monte_carlo_pool(workers: int) -> MonteCarloPool:
+    """Shared pool with `workers` processes, started on first use and kept warm.
+    
+    A reference data reload replaces the pool; runs still on the old one finish there.
+    """
+    global _monte_carlo_pool
+    reference = reference_data()
+    with _monte_carlo_pool_lock:
+        pool = _monte_carlo_pool
+        if pool is None or pool.workers != workers or pool.version != reference.version:
+            if pool is not None:
+                pool.close(wait=False)
+            pool = _monte_carlo_pool = MonteCarloPool(workers, reference)
+        return pool
+
+def discard_monte_carlo_pool(pool: MonteCarloPool):
+    """Drop a pool whose workers died so the next get_monte_carlo_pool starts a new one"""
+    global _monte_carlo_pool
+    with _monte_carlo_pool_lock:
+        if _monte_carlo_pool is pool:
+            _monte_carlo_pool = None
+    pool.close(wait=False)
+
+@atexit.register
+def shutdown_monte_carlo_pool():
+    global _monte_carlo_pool
+    with _monte_carlo_pool_lock:
+        if _monte_carlo_pool is not None:
+            _monte_carlo_pool.close()
+            _monte_carlo_pool = None
+
+def histogram_percentiles(histogram: np.ndarray, bounds: Tuple[float, float], percentiles) -> np.ndarray:
+    """Percentiles (0-100) of binned data, interpolated linearly inside each bin"""
+    width = (bounds[1] - bounds[0]) / len(histogram)
+    cumulative = np.cumsum(histogram) / histogram.sum()
+    quantiles = np.asarray(percentiles, dtype=float) / 100
+    
+    # First bin whose cumulative share reaches each quantile, then interpolate inside it
+    index = np.minimum(np.searchsorted(cumulative, quantiles, side='left'), len(histogram) - 1)
+    before = np.where(index > 0, cumulative[index - 1], 0.0)
+    share = cumulative[index] - before
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.where(share > 0, (quantiles - before) / share, 0.0)
+    return bounds[0] + (index + np.clip(fraction, 0, 1)) * width
+
+# Bins in the ROI histogram returned with Monte Carlo results
+ROI_HISTOGRAM_BINS = 40
+# Tail mass folded into the outer bins, so outliers do not stretch the range
+_HISTOGRAM_TAIL_PERCENTILES = (0.5, 99.5)
+
+def summary_histogram(samples: np.ndarray, bins: int = ROI_HISTOGRAM_BINS) -> Dict:
+    """Fixed-size histogram of samples as {"edges", "counts"}, tails folded into the outer bins"""
+    low, high = (float(p) for p in np.percentile(samples, _HISTOGRAM_TAIL_PERCENTILES))
+    if high <= low:
+        high = low + 1.0
+    counts, edges = np.histogram(np.clip(samples, low, high), bins=bins, range=(low, high))
+    return {"edges": edges.tolist(), "counts": counts.tolist()}
+
+def rebin_histogram(histogram: np.ndarray, bounds: Tuple[float, float], scale: float = 1.0,
+                    offset: float = 0.0, bins: int = ROI_HISTOGRAM_BINS) -> Dict:
+    """summary_histogram of data held as a fine histogram over bounds, mapped through value * scale + offset"""
+    low, high = histogram_percentiles(histogram, bounds, _HISTOGRAM_TAIL_PERCENTILES)
+    if high <= low:
+        high = low + (bounds[1] - bounds[0]) / len(histogram)
+    edges = np.linspace(low, high, bins + 1)
+    
+    # Counts up to each coarse edge, interpolated inside the fine bins
+    cumulative = np.concatenate([[0], np.cumsum(histogram)])
+    below = np.interp(edges, np.linspace(bounds[0], bounds[1], len(histogram) + 1), cumulative)
+    below[0], below[-1] = 0, cumulative[-1]
+    counts = np.diff(np.round(below)).astype(int)
+    
+    edges = edges * scale + offset
+    if scale < 0:
+        edges, counts = edges[::-1], counts[::-1]
+    return {"edges": edges.tolist(), "counts": counts.tolist()}
+
+class ROICalculator:
+    def __init__(self):
+        self.monte_carlo_iterations = 100_000
+        self.confidence_intervals = [0.1, 0.25, 0.5, 0.75, 0.9]
+        # Seed for the next Monte Carlo run; None draws fresh entropy (recorded in the result)
+        self.monte_carlo_seed = None
+        # Worker processes for Monte Carlo; 0 or 1 runs in-process
+        self.parallel_workers = 0
+        # "pseudo" draws monte_carlo_iterations paths; "sobol" grows a scrambled Sobol
+        # sample until the estimates stabilize, with monte_carlo_iterations as the cap
+        self.sampling = "pseudo"
+        self.sobol_initial_paths = 4096
+        self.convergence_tolerance = 0.005
+        # Any of "antithetic" and "control_variate" for the pseudo-random estimator
+        self.variance_reduction = ()
+        # Add Sobol indices of the Monte Carlo shocks to every result
+        self.global_sensitivity = False
+        self.global_sensitivity_samples = 1 << 14
+    
+    def engine_settings(self) -> Tuple:
+        """Settings that change results, for use in cache keys"""
+        return (
+            self.monte_carlo_iterations, tuple(self.confidence_intervals), self.monte_carlo_seed,
+            self.parallel_workers, self.sampling, self.sobol_initial_paths,
+            self.convergence_tolerance, tuple(self.variance_reduction),
+            self.global_sensitivity, self.global_sensitivity_samples
+        )
+    
+    def calculate_enhanced_roi(
+        self,
+        profile: UserProfile,
+        country: CountryData,
+        current_revenue: float,
+        current_margin: float,
+        current_corp_tax: float,
+        current_pers_tax: float,
+        current_living: float,
+        current_business: float,
+        revenue_multiplier: float,
+        margin_improvement: float,
+        success_probability: float,
+        time_horizon: int,
+        discount_rate: float
+    ) -> Dict:
+        """Advanced ROI calculation with Monte Carlo simulation"""
+        scenario = Scenario.create(
+            profile.id, find_country_key(country), current_revenue, current_margin,
+            current_corp_tax, current_pers_tax, current_living, current_business,
+            revenue_multiplier, margin_improvement, success_probability,
+            time_horizon, discount_rate
+        )
+        return self.calculate_scenario(scenario, profile, country)
+    
+    def calculate_scenario(self, scenario: Scenario, profile: Optional[UserProfile] = None,
+                           country: Optional[CountryData] = None) -> Dict:
+        """Advanced ROI calculation for a normalized scenario.
+        
+        profile and country default to the scenario's entries in the profile and
+        country tables.
+        """
+        profile = profile or scenario.profile
+        country = country or scenario.country
+        try:
+            for _, result in self.iter_scenario(scenario, profile, country):
+                pass
+            return result
+        except Exception as e:
+            record_error("ROI calculation error", e)
+            METRICS.increment("fallbacks_total", stage="calculation")
+            # Return safe fallback values
+            return {
+                "npv": 0,
+                "roi": 0,
+                "irr_annual": None,
+                "irr_converged": False,
+                "payback_months": float('inf'),
+                "payback_years": float('inf'),
+                "monthly_delta": 0,
+                "total_return": 0,
+                "monthly_flows": [0] * scenario.time_horizon,
+                "setup_cost": country.setup_cost,
+                "risk_score": 50,
+                "opportunity_score": 50,
+                "fallback": True
+            }
+    
+    def iter_scenario(self, scenario: Scenario, profile: Optional[UserProfile] = None,
+                      country: Optional[CountryData] = None, preview_paths: int = 0) -> Iterator[Tuple[str, Dict]]:
+        """calculate_scenario one stage at a time, as (stage, result so far) pairs.
+        
+        Stages are "deterministic" (with the risk and opportunity scores),
+        "monte_carlo_preview" (a first estimate from preview_paths paths, only
+        when that is fewer than monte_carlo_iterations), "monte_carlo" and
+        "complete", whose result is calculate_scenario's. Every result extends
+        the one before; exceptions propagate. The complete result has
+        "fallback": True when any stage returned its fallback after an error.
+        """
+        profile = profile or scenario.profile
+        country = country or scenario.country
+        
+        # Base calculations
+        with METRICS.stage("deterministic"):
+            base_result = self._calculate_deterministic_roi(profile, country, scenario)
+        result = {
+            **base_result,
+            "risk_score": self._calculate_risk_score(country, profile),
+            "opportunity_score": self._calculate_opportunity_score(base_result, country, profile)
+        }
+        yield "deterministic", result
+        
+        if 0 < preview_paths < self.monte_carlo_iterations:
+            # Same seed and sampler on fewer paths, in-process
+            preview = copy.copy(self)
+            preview.monte_carlo_iterations = preview_paths
+            preview.parallel_workers = 0
+            with METRICS.stage("monte_carlo_preview"):
+                estimate = preview._run_monte_carlo_simulation(profile, country, scenario)
+            yield "monte_carlo_preview", {**result, "monte_carlo": {**estimate, "preview": True}}
+        
+        # Monte Carlo simulation for risk assessment
+        with METRICS.stage("monte_carlo") as timer:
+            monte_carlo_result = self._run_monte_carlo_simulation(profile, country, scenario)
+        paths = monte_carlo_result.get("iterations", 0)
+        METRICS.increment("monte_carlo_paths_total", paths)
+        if timer.seconds > 0:
+            METRICS.set_gauge("monte_carlo_paths_per_second", paths / timer.seconds)
+        result = {**result, "monte_carlo": monte_carlo_result}
+        yield "monte_carlo", result
+        
+        # Sensitivity analysis
+        with METRICS.stage("sensitivity"):
+            tornado = self._perform_sensitivity_analysis(profile, country, scenario)
+        result = {
+            **result,
+            "sensitivity": {row["input"]: row["roi_slope"] for row in tornado},
+            "tornado": tornado
+        }
+        if self.global_sensitivity:
+            with METRICS.stage("global_sensitivity"):
+                result["global_sensitivity"] = self.calculate_global_sensitivity(scenario, profile, country)
+        # A stage that failed returned its fallback; an empty tornado is the sensitivity one
+        if (base_result.get("fallback") or monte_carlo_result.get("fallback") or not tornado
+                or result.get("global_sensitivity", {}).get("fallback")):
+            result["fallback"] = True
+        yield "complete", result
+    
+    def _calculate_deterministic_roi(self, profile, country, scenario: Scenario) -> Dict:
+        """Core deterministic ROI calculation"""
+        try:
+            # Cash flow analysis
+            monthly_delta = float(self._monthly_delta(profile, country, scenario))
+            setup_cost = country.setup_cost
+            
+            # Closed-form NPV, ROI and payback from the cached seasonal factors
+            factors = self._seasonal_factors(country, scenario)
+            monthly_flows = (monthly_delta * factors.seasonal).tolist()
+            npv = -setup_cost + monthly_delta * factors.annuity
+            
+            payback = factors.payback_months(monthly_delta, setup_cost)
+            payback_month = int(payback) if math.isfinite(payback) else None
+            
+            # IRR calculation on the seasonal flows
+            irr = solve_irr(monthly_delta * factors.seasonal, setup_cost)
+            irr_converged = bool(irr.converged[0])
+            
+            # ROI calculation
+            total_return = monthly_delta * factors.total
+            roi = (total_return / setup_cost) * 100 if setup_cost > 0 else 0
+            
+            return {
+                "npv": npv,
+                "roi": roi,
+                # None when there is no root in the solver's range (see irr_converged)
+                "irr_annual": float(irr.rate[0]) * 100 if irr_converged else None,
+                "irr_converged": irr_converged,
+                "payback_months": payback_month or float('inf'),
+                "payback_years": (payback_month / 12) if payback_month else float('inf'),
+                "monthly_delta": monthly_delta,
+                "total_return": total_return,
+                "monthly_flows": monthly_flows,
+                "setup_cost": setup_cost
+            }
+        except Exception as e:
+            record_error("Deterministic ROI calculation error", e)
+            METRICS.increment("fallbacks_total", stage="deterministic")
+            return {
+                "npv": 0, "roi": 0, "irr_annual": None, "irr_converged": False,
+                "payback_months": float('inf'), "payback_years": float('inf'),
+                "monthly_delta": 0, "total_return": 0,
+                "monthly_flows": [0] * 60, "setup_cost": 50000, "fallback": True
+            }
+    
+    def _monthly_delta(self, profile, country, scenario: Scenario):
+        """Expected monthly cash-flow gain of relocating"""
+        return relocation_delta(
+            profile.success_multiplier, *self._country_params(country),
+            scenario.current_revenue, scenario.current_margin,
+            scenario.current_corp_tax, scenario.current_pers_tax,
+            scenario.current_living, scenario.current_business,
+            scenario.revenue_multiplier, scenario.margin_improvement,
+            scenario.success_probability
+        )
+    
+    @staticmethod
+    def _country_params(country: CountryData) -> Tuple[float, float, float, float]:
+        return country.corp_tax, country.pers_tax, country.living_cost, country.business_cost
+    
+    def _seasonal_factors(self, country: CountryData, scenario: Scenario) -> SeasonalFactors:
+        """Cached seasonal discount table for a country and the scenario's rate and horizon"""
+        return get_seasonal_factors(tuple(country.seasonality), scenario.discount_rate, scenario.time_horizon)
+    
+    def _run_monte_carlo_simulation(self, profile, country, scenario: Scenario) -> Dict:
+        """Monte Carlo simulation for risk assessment, vectorized across paths"""
+        try:
+            paths = self.monte_carlo_iterations
+            seed = self.monte_carlo_seed
+            if seed is None:
+                seed = np.random.SeedSequence().entropy
+            
+            if self.sampling == "sobol":
+                return self._run_adaptive_sobol(profile, country, seed, scenario)
+            
+            techniques = tuple(self.variance_reduction)
+            # A broken pool is replaced once; if that breaks too the run stays in-process
+            for attempt in range(2 if self.parallel_workers > 1 and not techniques else 0):
+                pool = get_monte_carlo_pool(self.parallel_workers)
+                row = pool.row(scenario.country_key, country)
+                if row is None:
+                    break
+                try:
+                    return self._run_parallel_monte_carlo(pool, row, profile, country, seed, scenario)
+                except BrokenProcessPool as e:
+                    record_error("Monte Carlo pool broke", e, attempt=attempt)
+                    discard_monte_carlo_pool(pool)
+            
+            rng = np.random.default_rng(seed)
+            antithetic = "antithetic" in techniques
+            if antithetic:
+                # Mirror every draw; odd path counts round up to whole pairs
+                half = rng.standard_normal((3, (paths + 1) // 2))
+                shocks = np.concatenate([half, -half], axis=1)
+            else:
+                shocks = rng.standard_normal((3, paths))
+            monthly_delta = shocked_monthly_deltas(shocks, profile.success_multiplier, self._country_params(country), scenario)
+            
+            factors = self._seasonal_factors(country, scenario)
+            setup_cost = country.setup_cost
+            summary = self._summarize_monte_carlo(monthly_delta, factors, setup_cost)
+            
+            mean_delta, se_delta = self._estimate_mean_delta(
+                profile, country, scenario, monthly_delta, shocks, antithetic, "control_variate" in techniques
+            )
+            roi_scale = factors.total / setup_cost * 100 if setup_cost > 0 else 0.0
+            return {
+                **summary,
+                "mean_roi": mean_delta * roi_scale,
+                "mean_npv": mean_delta * factors.annuity - setup_cost,
+                "se_roi": se_delta * abs(roi_scale),
+                "se_npv": se_delta * abs(factors.annuity),
+                "variance_reduction": list(techniques),
+                "seed": seed,
+                "sampling": "pseudo",
+                "workers": 1
+            }
+        except Exception as e:
+            record_error("Monte Carlo simulation error", e)
+            METRICS.increment("fallbacks_total", stage="monte_carlo")
+            return {
+                "mean_roi": 0, "std_roi": 0, "mean_npv": 0, "std_npv": 0,
+                "confidence_intervals": {}, "probability_positive_roi": 0, "fallback": True
+            }
+    
+    def _summarize_monte_carlo(self, monthly_delta: np.ndarray, factors: SeasonalFactors, setup_cost) -> Dict:
+        """Distribution statistics for a sample of monthly deltas"""
+        paths = len(monthly_delta)
+        
+        # Every path shares the seasonal profile, so each reduces to O(1) work
+        npvs = monthly_delta * factors.annuity - setup_cost
+        rois = (monthly_delta * factors.total / setup_cost) * 100 if setup_cost > 0 else np.zeros(paths)
+        payback = factors.payback_months(monthly_delta, setup_cost)
+        
+        # Calculate confidence intervals
+        percentiles = [ci * 100 for ci in self.confidence_intervals]
+        roi_percentiles = np.percentile(rois, percentiles)
+        npv_percentiles = np.percentile(npvs, percentiles)
+        
+        confidence_intervals = {}
+        for ci, roi_p, npv_p in zip(self.confidence_intervals, roi_percentiles, npv_percentiles):
+            confidence_intervals[f'roi_{int(ci*100)}'] = roi_p
+            confidence_intervals[f'npv_{int(ci*100)}'] = npv_p
+        
+        return {
+            "mean_roi": np.mean(rois),
+            "std_roi": np.std(rois),
+            "mean_npv": np.mean(npvs),
+            "std_npv": np.std(npvs),
+            "confidence_intervals": confidence_intervals,
+            "probability_positive_roi": np.count_nonzero(rois > 0) / paths,
+            "probability_payback": np.count_nonzero(np.isfinite(payback)) / paths,
+            "median_payback_months": np.median(payback),
+            "roi_histogram": summary_histogram(rois),
+            "iterations": paths
+        }
+    
+    def _estimate_mean_delta(self, profile, country, scenario, monthly_delta, shocks, antithetic, control) -> Tuple[float, float]:
+        """Mean monthly delta and its standard error.
+        
+        The control variate is the linear term of the delta's first-order
+        expansion in the shocks; the shocks are standard normal, so its mean is
+        known to be zero. Antithetic pairs are averaged before the standard error
+        is taken. A linear control cancels within each pair, so combined with
+        antithetic it adds nothing.
+        """
+        values = monthly_delta
+        if control:
+            step = 1e-3
+            probes = np.concatenate([np.eye(3), -np.eye(3)], axis=1) * step
+            probed = shocked_monthly_deltas(probes, profile.success_multiplier, self._country_params(country), scenario)
+            gradient = (probed[:3] - probed[3:]) / (2 * step)
+            
+            # Zero-mean control, so no centring on an estimated mean is needed
+            control_values = gradient @ shocks
+            variance = float(np.var(control_values))
+            if variance > 0:
+                beta = float(np.mean((values - values.mean()) * (control_values - control_values.mean()))) / variance
+                values = values - beta * control_values
+        
+        if antithetic:
+            half = len(values) // 2
+            values = (values[:half] + values[half:]) / 2
+        
+        standard_error = float(np.std(values, ddof=1) / math.sqrt(len(values))) if len(values) > 1 else 0.0
+        return float(np.mean(values)), standard_error
+    
+    def _run_adaptive_sobol(self, profile, country, seed, scenario: Scenario) -> Dict:
+        """Quasi-Monte Carlo on scrambled Sobol shocks, doubling the sample until it stabilizes.
+        
+        The run stops once no ROI percentile moves by more than convergence_tolerance
+        standard deviations and probability_positive_roi by more than
+        convergence_tolerance between two sample sizes, or at monte_carlo_iterations.
+        Always runs in-process.
+        """
+        factors = self._seasonal_factors(country, scenario)
+        sampler = SobolSampler(seed)
+        cap = max(1, self.monte_carlo_iterations)
+        
+        # Powers of two keep every prefix a balanced Sobol net
+        deltas = []
+        paths = 0
+        previous = None
+        converged = False
+        while True:
+            batch = min(paths or self.sobol_initial_paths, cap - paths)
+            shocks = normal_ppf(sampler.random(batch))
+            deltas.append(shocked_monthly_deltas(shocks, profile.success_multiplier, self._country_params(country), scenario))
+            paths += batch
+            
+            summary = self._summarize_monte_carlo(np.concatenate(deltas), factors, country.setup_cost)
+            if previous is not None and self._has_stabilized(previous, summary):
+                converged = True
+                break
+            if paths >= cap:
+                break
+            previous = summary
+        
+        return {
+            **summary,
+            "seed": seed,
+            "sampling": "sobol",
+            "converged": converged,
+            "workers": 1
+        }
+    
+    def _has_stabilized(self, previous: Dict, current: Dict) -> bool:
+        tolerance = self.convergence_tolerance
+        scale = max(float(current["std_roi"]), 1e-12)
+        moved = max(
+            abs(current["confidence_intervals"][f'roi_{int(ci*100)}'] - previous["confidence_intervals"][f'roi_{int(ci*100)}'])
+            for ci in self.confidence_intervals
+        )
+        return (moved <= tolerance * scale
+                and abs(current["probability_positive_roi"] - previous["probability_positive_roi"]) <= tolerance)
+    
+    def _run_parallel_monte_carlo(self, pool: MonteCarloPool, row: int, profile, country, seed, scenario: Scenario) -> Dict:
+        """Shard the paths across the pool and merge the per-shard statistics.
+        
+        Shards depend only on the path count, so a seed replays the same result
+        whatever the number of workers.
+        """
+        paths = self.monte_carlo_iterations
+        shards = max(1, math.ceil(paths / MONTE_CARLO_SHARD_PATHS))
+        shard_paths = [paths // shards + (1 if i < paths % shards else 0) for i in range(shards)]
+        *shard_seeds, pilot_seed = np.random.SeedSequence(seed).spawn(shards + 1)
+        
+        # Place the shared histogram range from a small pilot sample
+        pilot = draw_monthly_deltas(
+            np.random.default_rng(pilot_seed), _MONTE_CARLO_PILOT_PATHS,
+            profile.success_multiplier, self._country_params(country), scenario
+        )
+        spread = max(float(pilot.max() - pilot.min()), 1.0)
+        bounds = (float(pilot.min()) - spread / 2, float(pilot.max()) + spread / 2)
+        
+        stats = pool.map(
+            _monte_carlo_shard, shard_seeds, shard_paths,
+            [row] * shards, [profile.success_multiplier] * shards,
+            [scenario] * shards, [bounds] * shards
+        )
+        
+        # Merge the shards and map monthly deltas onto NPV and ROI (both affine in the delta)
+        total_sum = sum(s["sum"] for s in stats)
+        total_squares = sum(s["sum_squares"] for s in stats)
+        histogram = np.sum([s["histogram"] for s in stats], axis=0)
+        mean_delta = (bounds[0] + bounds[1]) / 2 + total_sum / paths
+        std_delta = math.sqrt(max(0.0, total_squares / paths - (total_sum / paths) ** 2))
+        
+        factors = self._seasonal_factors(country, scenario)
+        setup_cost = country.setup_cost
+        roi_scale = factors.total / setup_cost * 100 if setup_cost > 0 else 0.0
+        
+        percentiles = [ci * 100 for ci in self.confidence_intervals]
+        delta_percentiles = histogram_percentiles(histogram, bounds, percentiles + [50])
+        confidence_intervals = {}
+        for ci, delta_p in zip(self.confidence_intervals, delta_percentiles):
+            confidence_intervals[f'roi_{int(ci*100)}'] = delta_p * roi_scale
+            confidence_intervals[f'npv_{int(ci*100)}'] = delta_p * factors.annuity - setup_cost
+        
+        return {
+            "mean_roi": mean_delta * roi_scale,
+            "std_roi": std_delta * abs(roi_scale),
+            "mean_npv": mean_delta * factors.annuity - setup_cost,
+            "std_npv": std_delta * abs(factors.annuity),
+            "se_roi": std_delta * abs(roi_scale) / math.sqrt(paths),
+            "se_npv": std_delta * abs(factors.annuity) / math.sqrt(paths),
+            "confidence_intervals": confidence_intervals,
+            "probability_positive_roi": sum(s["positive"] for s in stats) / paths if setup_cost > 0 else 0.0,
+            "probability_payback": sum(s["paid_back"] for s in stats) / paths,
+            # Payback only falls as the delta grows, so its median sits at the median delta
+            "median_payback_months": factors.payback_months(delta_percentiles[-1], setup_cost),
+            "roi_histogram": rebin_histogram(histogram, bounds, scale=roi_scale),
+            "iterations": paths,
+            "seed": seed,
+            "sampling": "pseudo",
+            "workers": pool.workers
+        }
+    
+    def _perform_sensitivity_analysis(self, profile, country, scenario: Scenario) -> List[Dict]:
+        """Tornado dataset: ROI and NPV with each input at its low and high value.
+        
+        All perturbations are evaluated in one vectorized pass. Rows are sorted by
+        ROI swing and carry roi_slope, the central-difference ROI change per unit.
+        """
+        try:
+            names = list(_SCENARIO_LIMITS)
+            base = scenario.inputs()
+            
+            # Row 2k moves input k to its low value, row 2k + 1 to its high value
+            bounds = [self._sensitivity_bounds(scenario, name) for name in names]
+            columns = {name: np.full(2 * len(names), value, dtype=float) for name, value in base.items()}
+            for k, (name, (low, high)) in enumerate(zip(names, bounds)):
+                columns[name][2 * k:2 * k + 2] = (low, high)
+            
+            delta = relocation_delta(
+                profile.success_multiplier, *self._country_params(country),
+                *(columns[name] for name in names[:9])
+            )
+            factors = [
+                get_seasonal_factors(tuple(country.seasonality), float(rate), int(horizon))
+                for horizon, rate in zip(columns['time_horizon'], columns['discount_rate'])
+            ]
+            setup_cost = country.setup_cost
+            npv = delta * np.array([f.annuity for f in factors]) - setup_cost
+            roi = delta * np.array([f.total for f in factors]) / setup_cost * 100 if setup_cost > 0 else np.zeros_like(delta)
+            
+            tornado = []
+            for k, (name, (low, high)) in enumerate(zip(names, bounds)):
+                roi_low, roi_high = roi[2 * k], roi[2 * k + 1]
+                tornado.append({
+                    "input": name,
+                    "label": SENSITIVITY_LABELS[name],
+                    "base_value": base[name],
+                    "low_value": low,
+                    "high_value": high,
+                    "roi_low": float(roi_low),
+                    "roi_high": float(roi_high),
+                    "npv_low": float(npv[2 * k]),
+                    "npv_high": float(npv[2 * k + 1]),
+                    "roi_swing": float(abs(roi_high - roi_low)),
+                    "roi_slope": float((roi_high - roi_low) / (high - low)) if high != low else 0.0
+                })
+            return sorted(tornado, key=lambda row: row["roi_swing"], reverse=True)
+        except Exception as e:
+            record_error("Sensitivity analysis error", e)
+            METRICS.increment("fallbacks_total", stage="sensitivity")
+            return []
+    
+    def calculate_global_sensitivity(self, scenario: Scenario, profile: Optional[UserProfile] = None,
+                                     country: Optional[CountryData] = None, samples: Optional[int] = None,
+                                     seed=None) -> Dict:
+        """First-order and total Sobol indices of ROI for the revenue, margin and success shocks.
+        
+        Uses Saltelli's design with the Saltelli (2010) first-order and Jansen
+        total-effect estimators. The base matrices A and B are the
+        first and last three dimensions of one scrambled Sobol sequence, and all
+        samples * (d + 2) model
+        runs go through the engine as one vectorized batch. NPV is affine in the
+        monthly delta, exactly like ROI, so it has the same indices.
+        """
+        try:
+            profile = profile or scenario.profile
+            country = country or scenario.country
+            samples = int(samples or self.global_sensitivity_samples)
+            if seed is None:
+                seed = self.monte_carlo_seed if self.monte_carlo_seed is not None else np.random.SeedSequence().entropy
+            points = normal_ppf(SobolSampler(seed, dimensions=6).random(samples))
+            a, b = points[:3], points[3:]
+            dimensions = len(a)
+            # AB_i is A with row i taken from B
+            mixed = np.repeat(a[:, None, :], dimensions, axis=1)
+            mixed[np.arange(dimensions), np.arange(dimensions)] = b
+            shocks = np.concatenate([a, b, mixed.reshape(dimensions, -1)], axis=1)
+            
+            delta = shocked_monthly_deltas(shocks, profile.success_multiplier, self._country_params(country), scenario)
+            factors = self._seasonal_factors(country, scenario)
+            roi = delta * factors.total / country.setup_cost * 100 if country.setup_cost > 0 else np.zeros_like(delta)
+            f_a, f_b = roi[:samples], roi[samples:2 * samples]
+            f_ab = roi[2 * samples:].reshape(dimensions, samples)
+            
+            variance = float(np.var(np.concatenate([f_a, f_b])))
+            names = ("revenue_shock", "margin_shock", "success_shock")
+            if variance == 0:
+                first_order = total = dict.fromkeys(names, 0.0)
+            else:
+                first_order = dict(zip(names, (np.mean(f_b * (f_ab - f_a), axis=1) / variance).tolist()))
+                total = dict(zip(names, (0.5 * np.mean((f_a - f_ab) ** 2, axis=1) / variance).tolist()))
+            
+            return {
+                "first_order": first_order,
+                "total": total,
+                # Share of variance from interactions between the shocks
+                "interaction": max(0.0, 1 - sum(first_order.values())),
+                "variance_roi": variance,
+                "samples": samples,
+                "evaluations": samples * (dimensions + 2),
+                "seed": seed
+            }
+        except Exception as e:
+            record_error("Global sensitivity error", e)
+            METRICS.increment("fallbacks_total", stage="global_sensitivity")
+            return {"first_order": {}, "total": {}, "interaction": 0, "variance_roi": 0, "samples": 0, "fallback": True}
+    
+    @staticmethod
+    def _sensitivity_bounds(scenario: Scenario, name: str) -> Tuple[float, float]:
+        """Low and high value of one input for the tornado, inside the Scenario limits"""
+        kind, amount = SENSITIVITY_STEPS[name]
+        value = getattr(scenario, name)
+        step = abs(value) * amount if kind == "relative" else amount
+        low = getattr(scenario.replace(**{name: value - step}), name)
+        high = getattr(scenario.replace(**{name: value + step}), name)
+        return low, high
+    
+    def _calculate_risk_score(self, country: CountryData, profile: UserProfile) -> float:
+        """Calculate overall risk score (0-100, lower is better)"""
+        try:
+            factors = [country.risk_factors.get(factor, _DEFAULT_RISK_FACTOR) for factor in RISK_FACTORS]
+            return float(risk_score(factors, profile.risk_tolerance))
+        except:
+            return 50
+    
+    def _calculate_opportunity_score(self, result: Dict, country: CountryData, profile: UserProfile) -> float:
+        """Calculate opportunity score (0-100, higher is better)"""
+        try:
+            return float(opportunity_score(result['roi'], country.market_growth, country.ease_score, country.partnership_score))
+        except:
+            return 50
+
+# =========================
+# BATCH SCENARIO API
+# =========================
+
+# Inputs that evaluate_scenario_grid can sweep, in grid axis order
+GRID_AXES = ('revenue_multiplier', 'margin_improvement', 'success_probability', 'time_horizon', 'discount_rate')
+
+def _normalize_axis(name: str, values) -> np.ndarray:
+    """Apply the Scenario clamp for one input to a whole grid axis"""
+    low, high, _ = _SCENARIO_LIMITS[name]
+    axis = np.clip(np.atleast_1d(np.asarray(values, dtype=float)), low, high)
+    return axis.astype(int) if name == 'time_horizon' else axis
+
+def evaluate_scenario_grid(
+    base: Optional[Scenario] = None,
+    profiles: Optional[List[str]] = None,
+    countries: Optional[List[str]] = None,
+    chunk_size: int = 1_000_000,
+    irr: bool = True,
+    **axes
+) -> "pd.DataFrame":
+    """Deterministic NPV, ROI, IRR and payback over a full scenario grid.
+    
+    The grid is profiles x countries x the GRID_AXES passed as keyword arrays;
+    every other input, and any axis left out, comes from base. profiles and
+    countries default to every entry of ENHANCED_PROFILES and ENHANCED_COUNTRIES.
+    Rows are evaluated in vectorized chunks of chunk_size and returned as one
+    columnar table; irr is NaN where it does not exist inside the solver range
+    and payback_months is inf when the setup cost is never recovered.
+    """
+    # pandas is only needed here, so it stays out of the engine's import cost
+    import pandas as pd
+    
+    if base is None:
+        base = Scenario.create("tech_startup", "UAE")
+    profile_keys = list(ENHANCED_PROFILES if profiles is None else profiles)
+    country_keys = list(ENHANCED_COUNTRIES if countries is None else countries)
+    unknown = set(axes) - set(GRID_AXES)
+    if unknown:
+        raise ValueError(f"Unknown grid axes: {sorted(unknown)}")
+    grid = {name: _normalize_axis(name, axes.get(name, getattr(base, name))) for name in GRID_AXES}
+    
+    profile_list = [ENHANCED_PROFILES[key] for key in profile_keys]
+    table = get_country_table()
+    country_rows = table.rows(country_keys)
+    success_multipliers = np.array([profile.success_multiplier for profile in profile_list])
+    country_params = table.country_params(country_rows)
+    setup_costs = table.setup_cost[country_rows]
+    
+    # Seasonal factors per (country, horizon, rate) and per (country, horizon)
+    horizons, rates = grid['time_horizon'], grid['discount_rate']
+    factors = [[[get_seasonal_factors(tuple(seasonality.tolist()), float(rate), int(horizon)) for rate in rates]
+                for horizon in horizons] for seasonality in table.seasonality[country_rows]]
+    annuities = np.array([[[f.annuity for f in by_rate] for by_rate in by_horizon] for by_horizon in factors])
+    totals = np.array([[by_rate[0].total for by_rate in by_horizon] for by_horizon in factors])
+    
+    shape = (len(profile_list), len(country_rows)) + tuple(len(grid[name]) for name in GRID_AXES)
+    size = int(np.prod(shape))
+    chunks = []
+    for start in range(0, size, chunk_size):
+        p, c, rm, mi, sp, h, r = np.unravel_index(np.arange(start, min(start + chunk_size, size)), shape)
+        delta = relocation_delta(
+            success_multipliers[p], *country_params[:, c],
+            base.current_revenue, base.current_margin,
+            base.current_corp_tax, base.current_pers_tax,
+            base.current_living, base.current_business,
+            grid['revenue_multiplier'][rm], grid['margin_improvement'][mi], grid['success_probability'][sp]
+        )
+        setup = setup_costs[c]
+        npv = delta * annuities[c, h, r] - setup
+        with np.errstate(divide='ignore', invalid='ignore'):
+            roi = np.where(setup > 0, delta * totals[c, h] / setup * 100, 0.0)
+        
+        # Payback and IRR only depend on the country's seasonal shape and the horizon
+        payback = np.full(len(delta), np.inf)
+        irr_annual = np.full(len(delta), np.nan)
+        for ci in range(len(country_rows)):
+            for hi in range(len(horizons)):
+                rows = np.flatnonzero((c == ci) & (h == hi))
+                if not len(rows):
+                    continue
+                seasonal = factors[ci][hi][0]
+                payback[rows] = seasonal.payback_months(delta[rows], setup_costs[ci])
+                # With a fixed seasonal shape the IRR only depends on setup_cost / delta
+                gaining = rows[delta[rows] > 0]
+                if irr and len(gaining):
+                    solved = solve_irr(seasonal.seasonal, setup_costs[ci] / delta[gaining])
+                    irr_annual[gaining] = solved.rate * 100
+        
+        chunks.append(pd.DataFrame({
+            "profile": pd.Categorical.from_codes(p, profile_keys),
+            "country": pd.Categorical.from_codes(c, country_keys),
+            **{name: grid[name][index] for name, index in zip(GRID_AXES, (rm, mi, sp, h, r))},
+            "monthly_delta": delta,
+            "npv": npv,
+            "roi": roi,
+            "irr_annual": irr_annual,
+            "payback_months": payback
+        }))
+    
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+# =========================
+# DESTINATION RECOMMENDER
+# =========================
+
+# Result fields recommend_destinations can rank by, and whether higher is better
+RECOMMEND_RANKINGS = {
+    'npv': True,
+    'roi': True,
+    'opportunity_score': True,
+    'payback_months': False,
+    'risk_score': False
+}
+
+def recommend_destinations(
+    scenario: Scenario,
+    k: int = 5,
+    max_payback_months: Optional[float] = None,
+    max_risk: Optional[float] = None,
+    rank_by: str = 'npv'
+) -> Dict:
+    """Rank every country for the scenario's profile, business metrics and growth assumptions.
+    
+    NPV, ROI, payback, risk and opportunity scores are computed for the whole
+    country table in one vectorized pass; scenario.country_key is ignored.
+    Countries over max_payback_months or max_risk are dropped, the rest are
+    sorted by rank_by (ties keep table order) and the IRR is solved for the
+    top k only.
+    """
+    if rank_by not in RECOMMEND_RANKINGS:
+        raise ValueError(f"Unknown ranking: {rank_by!r}")
+    if k < 1:
+        raise ValueError("k must be at least 1")
+    
+    with METRICS.stage("recommend"):
+        # One snapshot, so the profile and the table agree across a reload
+        snapshot = reference_data()
+        profile = snapshot.profiles[scenario.profile_id]
+        table = snapshot.table
+        
+        delta = relocation_delta(
+            profile.success_multiplier, *table.country_params(),
+            scenario.current_revenue, scenario.current_margin,
+            scenario.current_corp_tax, scenario.current_pers_tax,
+            scenario.current_living, scenario.current_business,
+            scenario.revenue_multiplier, scenario.margin_improvement,
+            scenario.success_probability
+        )
+        setup = table.setup_cost
+        
+        # Seasonal factors of every country at once: countries x months
+        months = np.arange(1, scenario.time_horizon + 1)
+        seasonal = table.seasonality[:, (months - 1) % SEASONALITY_MONTHS]
+        discount_monthly = (1 + scenario.discount_rate/100) ** (1/12) - 1
+        discount = (1 + discount_monthly) ** -months.astype(float)
+        cumulative = np.cumsum(seasonal, axis=1)
+        
+        npv = delta * (seasonal @ discount) - setup
+        with np.errstate(divide='ignore', invalid='ignore'):
+            roi = np.where(setup > 0, delta * cumulative[:, -1] / setup * 100, 0.0)
+            threshold = np.where(delta > 0, setup / delta, np.inf)
+        # Same rule as SeasonalFactors.payback_months, one row per country
+        recovered = (cumulative < threshold[:, None]).sum(axis=1)
+        payback = np.where(recovered < len(months), recovered + 1.0, np.inf)
+        payback = np.where((delta <= 0) & (delta * cumulative[:, 0] >= setup), 1.0, payback)
+        
+        values = {
+            'npv': npv,
+            'roi': roi,
+            'opportunity_score': table.opportunity_scores(roi),
+            'payback_months': payback,
+            'risk_score': table.risk_scores(profile)
+        }
+        
+        eligible = np.ones(len(table), dtype=bool)
+        if max_payback_months is not None:
+            eligible &= payback <= max_payback_months
+        if max_risk is not None:
+            eligible &= values['risk_score'] <= max_risk
+        
+        candidates = np.flatnonzero(eligible)
+        key = values[rank_by][candidates]
+        order = np.argsort(-key if RECOMMEND_RANKINGS[rank_by] else key, kind='stable')
+        top = candidates[order[:k]]
+        
+        irr = solve_irr(delta[top, None] * seasonal[top], setup[top]) if len(top) else None
+        destinations = []
+        for rank, row in enumerate(top):
+            converged = bool(irr.converged[rank])
+            destinations.append({
+                "rank": rank + 1,
+                "country_key": table.keys[row],
+                "name": table.names[row],
+                "monthly_delta": float(delta[row]),
+                "setup_cost": float(setup[row]),
+                **{name: float(column[row]) for name, column in values.items()},
+                "irr_annual": float(irr.rate[rank]) * 100 if converged else None,
+                "irr_converged": converged
+            })
+    
+    return {
+        "data_version": snapshot.version,
+        "rank_by": rank_by,
+        "evaluated": len(table),
+        "eligible": len(candidates),
+        "destinations": destinations
+    }
+
+# =========================
+# GOAL SEEK
+# =========================
+
+# Targets goal_seek can solve for; a payback target is met at or below it, the others at or above
+GOAL_METRICS = ('roi', 'npv', 'irr_annual', 'payback_months')
+# Inputs that only move the monthly delta, in relocation_delta's keyword names
+_DELTA_INPUTS = tuple(name for name in _SCENARIO_LIMITS if name not in ('time_horizon', 'discount_rate'))
+# Grid points scanned for a sign change before bisecting, and the bisection stopping rules
+_GOAL_SCAN_POINTS = 65
+_GOAL_TOLERANCE = 1e-10
+_GOAL_MAX_ITERATIONS = 100
+
+def required_monthly_delta(factors: SeasonalFactors, setup_cost: float, metric: str, target: float) -> float:
+    """Constant monthly delta at which metric reaches target; any larger delta meets it too.
+    
+    NPV, ROI and payback are linear in the monthly delta, and an IRR target is
+    an NPV of zero at the target rate, so every target is one division.
+    """
+    if metric == 'npv':
+        return (target + setup_cost) / factors.annuity
+    if metric == 'roi':
+        if setup_cost <= 0:
+            return -math.inf if target <= 0 else math.inf
+        return target * setup_cost / (100 * factors.total)
+    if metric == 'irr_annual':
+        if target <= -100:
+            raise ValueError("An IRR target must be above -100%")
+        monthly = (1 + target/100) ** (1/12) - 1
+        return setup_cost / float(factors.seasonal @ (1 + monthly) ** -factors.months.astype(float))
+    if metric == 'payback_months':
+        month = min(int(math.floor(target)), len(factors.cumulative))
+        if month < 1:
+            return math.inf
+        # Just above the exact break-even, so rounding cannot push payback a month later
+        return setup_cost / factors.cumulative[month - 1] * (1 + 1e-9)
+    raise ValueError(f"Unknown metric: {metric!r}")
+
+def _bracket_threshold(gap, low: float, high: float, current: float, integer: bool) -> Tuple[Optional[float], Optional[bool], int]:
+    """Input value where gap(x) (>= 0 when the target is met) changes sign, nearest to current.
+    
+    Returns (threshold, whether values above it meet the target, evaluations);
+    the threshold is None when gap keeps one sign over [low, high].
+    """
+    xs = np.arange(low, high + 1) if integer else np.linspace(low, high, _GOAL_SCAN_POINTS)
+    gaps = np.array([gap(x) for x in xs])
+    evaluations = len(xs)
+    meets = gaps >= 0
+    changes = np.flatnonzero(meets[1:] != meets[:-1])
+    if not len(changes):
+        return None, None, evaluations
+    i = changes[np.argmin(np.abs(xs[changes] - current))]
+    rising = bool(meets[i + 1])
+    if integer:
+        # First whole value on the side that meets the target
+        return float(xs[i + 1] if rising else xs[i]), rising, evaluations
+    
+    a, b = float(xs[i]), float(xs[i + 1])
+    for _ in range(_GOAL_MAX_ITERATIONS):
+        if b - a <= _GOAL_TOLERANCE * max(1.0, abs(a)):
+            break
+        middle = (a + b) / 2
+        evaluations += 1
+        if (gap(middle) >= 0) == rising:
+            b = middle
+        else:
+            a = middle
+    return (b if rising else a), rising, evaluations
+
+def goal_seek(scenario: Scenario, name: str, metric: str, target: float) -> Dict:
+    """Value of one input at which metric reaches target, all other inputs held.
+    
+    Every target is first turned into the monthly delta that reaches it. Inputs
+    that only move the delta are solved from two evaluations where the delta is
+    linear in them, and by a scan and bisection where it is not (margins, whose
+    new margin is capped at 90%); the time horizon and discount rate are always
+    bracketed. status is "solved", "always_met" or "unreachable" (over the
+    input's whole clamp range) or "no_effect"; better says whether values
+    "higher" or "lower" than the threshold meet the target. A linear solution
+    outside the clamp range is still reported as value.
+    """
+    if name not in _SCENARIO_LIMITS:
+        raise ValueError(f"Unknown input: {name!r}")
+    if metric not in GOAL_METRICS:
+        raise ValueError(f"Unknown metric: {metric!r}")
+    if metric == 'irr_annual' and target <= -100:
+        # A -100% annual rate has no monthly equivalent to discount at
+        raise ValueError("An IRR target must be above -100%")
+    
+    with METRICS.stage("goal_seek"):
+        profile, country = scenario.profile, scenario.country
+        params = ROICalculator._country_params(country)
+        setup_cost = country.setup_cost
+        seasonality = tuple(country.seasonality)
+        inputs = scenario.inputs()
+        current = inputs[name]
+        low, high, _ = _SCENARIO_LIMITS[name]
+        high = high if high is not None else max(low, current) * 100
+        
+        delta_inputs = {key: inputs[key] for key in _DELTA_INPUTS}
+        
+        def delta_at(value):
+            return relocation_delta(profile.success_multiplier, *params, **{**delta_inputs, name: value})
+        
+        value, better, method, evaluations = None, None, "linear", 0
+        status = "unreachable"
+        if name in _DELTA_INPUTS:
+            factors = get_seasonal_factors(seasonality, scenario.discount_rate, scenario.time_horizon)
+            required = required_monthly_delta(factors, setup_cost, metric, target)
+            # Two evaluations fix the line; a third confirms the delta really is linear here
+            x0, x1 = float(low), float(high)
+            d0, d1 = float(delta_at(x0)), float(delta_at(x1))
+            evaluations = 3
+            slope = (d1 - d0) / (x1 - x0)
+            if not math.isfinite(required):
+                status = "always_met" if required < 0 else "unreachable"
+            elif slope == 0:
+                status = "no_effect"
+            else:
+                candidate = x0 + (required - d0) / slope
+                if math.isclose(float(delta_at(candidate)), required, rel_tol=1e-9, abs_tol=1e-6):
+                    value, better = candidate, slope > 0
+                    if low <= candidate <= high:
+                        status = "solved"
+                    else:
+                        # The whole range lies on one side of the threshold
+                        status = "always_met" if (candidate < low) == better else "unreachable"
+                else:
+                    method = "bracket"
+                    value, better, scanned = _bracket_threshold(
+                        lambda x: float(delta_at(x)) - required, low, high, current, integer=False)
+                    evaluations += scanned
+                    if value is not None:
+                        status = "solved"
+                    elif delta_at(current) >= required:
+                        status = "always_met"
+        elif name == 'discount_rate' and metric != 'npv':
+            # ROI, payback and IRR do not discount
+            status, method = "no_effect", None
+        else:
+            method = "bracket"
+            delta = float(relocation_delta(profile.success_multiplier, *params, **delta_inputs))
+            horizon, rate = scenario.time_horizon, scenario.discount_rate
+            
+            def gap(x):
+                if name == 'time_horizon':
+                    factors = get_seasonal_factors(seasonality, rate, int(x))
+                else:
+                    # Bypass the cache so a bisection does not flood it with one-off rates
+                    factors = build_seasonal_factors(seasonality, float(x), horizon)
+                return delta - required_monthly_delta(factors, setup_cost, metric, target)
+            
+            value, better, evaluations = _bracket_threshold(gap, low, high, current, integer=name == 'time_horizon')
+            if value is not None:
+                status = "solved"
+            elif gap(current) >= 0:
+                status = "always_met"
+        
+        outcome = {
+            "input": name,
+            "metric": metric,
+            "target": target,
+            "status": status,
+            "value": value,
+            "current_value": current,
+            "better": None if better is None else ("higher" if better else "lower"),
+            "method": method,
+            "evaluations": evaluations
+        }
+        if status == "solved":
+            # Full deterministic result at the threshold, which also checks the solve
+            result = ROICalculator()._calculate_deterministic_roi(profile, country, scenario.replace(**{name: value}))
+            outcome["achieved"] = {key: result[key] for key in GOAL_METRICS}
+        return outcome
+
+# =========================
+# RESULT CACHE
+# =========================
+
+class ResultCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds.
+    
+    Values are shared between callers and must be treated as read-only.
+    """
+    
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Cached value for key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+    
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def invalidate(self, predicate) -> int:
+        """Drop every entry whose key satisfies predicate; returns how many were dropped"""
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+ROI_RESULT_CACHE = ResultCache()
+
+def _cache_metrics():
+    stats = ROI_RESULT_CACHE.stats()
+    lookups = stats["hits"] + stats["misses"]
+    return [
+        *((f"result_cache_{name}_total", "counter", stats[name], {}) for name in ("hits", "misses", "evictions", "expirations")),
+        ("result_cache_size", "gauge", stats["size"], {}),
+        ("result_cache_hit_ratio", "gauge", stats["hits"] / lookups if lookups else 0.0, {})
+    ]
+
+METRICS.register_collector(_cache_metrics)
+
+def _result_cache_key(calculator: ROICalculator, scenario: Scenario, reference: ReferenceData) -> Tuple:
+    return (
+        scenario, calculator.engine_settings(),
+        reference.profile_versions[scenario.profile_id], reference.country_versions[scenario.country_key]
+    )
+
+def calculate_cached(calculator: ROICalculator, scenario: Scenario) -> Dict:
+    """calculate_scenario through ROI_RESULT_CACHE; failed calculations are not cached.
+    
+    Entries are keyed on the versions of the scenario's own profile and country,
+    so a reference data reload only misses for the entries it changed.
+    """
+    reference = reference_data()
+    cache_key = _result_cache_key(calculator, scenario, reference)
+    result = ROI_RESULT_CACHE.get(cache_key)
+    if result is None:
+        result = calculator.calculate_scenario(
+            scenario, reference.profiles[scenario.profile_id], reference.countries[scenario.country_key]
+        )
+        if not result.get("fallback"):
+            ROI_RESULT_CACHE.put(cache_key, result)
+    return result
+
+def iter_cached(calculator: ROICalculator, scenario: Scenario, preview_paths: int = 0) -> Iterator[Tuple[str, Dict]]:
+    """ROICalculator.iter_scenario through ROI_RESULT_CACHE; a hit yields only ("complete", result).
+    
+    Like calculate_cached, results that fell back after an error are not cached.
+    """
+    reference = reference_data()
+    cache_key = _result_cache_key(calculator, scenario, reference)
+    result = ROI_RESULT_CACHE.get(cache_key)
+    if result is not None:
+        yield "complete", result
+        return
+    for stage, result in calculator.iter_scenario(
+        scenario, reference.profiles[scenario.profile_id], reference.countries[scenario.country_key], preview_paths
+    ):
+        # Stored before it is yielded, so a consumer that stops at "complete" still fills the cache
+        if stage == "complete" and not result.get("fallback"):
+            ROI_RESULT_CACHE.put(cache_key, result)
+        yield stage, result
+
+# =========================
+# LEAD GENERATION & MONETIZATION ENGINE
+# =========================
+
+# Offer content per tier, best first; {country} in a title is the destination's name
+OFFER_TIERS = {
+    'premium': {
+        'title': 'Complete {country} Immigration Concierge',
+        'price': '$4,997',
+        'discount_price': '$2,497',
+        'value': '$15,000+',
+        'urgency': 'Only 5 spots available this month',
+        'includes': (
+            'Personal immigration lawyer consultation',
+            'Tax optimization strategy session',
+            'Business setup and banking introductions',
+            '12-month ongoing support',
+            'Exclusive network access'
+        ),
+        'cta': 'Secure Your Premium Package',
+        'guarantee': '100% money-back guarantee if visa rejected'
+    },
+    'standard': {
+        'title': '{country} Business Migration Blueprint',
+        'price': '$997',
+        'discount_price': '$497',
+        'value': '$3,000+',
+        'urgency': 'Limited time 50% discount',
+        'includes': (
+            'Complete legal requirements guide',
+            'Step-by-step timeline and checklist',
+            'Tax optimization strategies',
+            '60-day email support',
+            'Resource directory'
+        ),
+        'cta': 'Get Your Blueprint Now',
+        'guarantee': '30-day money-back guarantee'
+    },
+    'starter': {
+        'title': '{country} Exploration Package',
+        'price': '$297',
+        'discount_price': '$97',
+        'value': '$500+',
+        'urgency': 'Free for first 100 users',
+        'includes': (
+            'Country overview report',
+            'Visa options comparison',
+            'Basic cost calculator',
+            'Initial checklist'
+        ),
+        'cta': 'Start Your Journey',
+        'guarantee': 'Risk-free trial'
+    }
+}
+
+# Offered when the tier cannot be determined
+FALLBACK_OFFER = {
+    'tier': 'starter',
+    'title': 'Immigration Exploration Package',
+    'price': '$297',
+    'discount_price': '$97',
+    'value': '$500+',
+    'urgency': 'Limited time offer',
+    'includes': ('Basic consultation', 'Initial assessment'),
+    'cta': 'Get Started',
+    'guarantee': 'Money-back guarantee'
+}
+
+class LeadEngine:
+    def __init__(self):
+        self.conversion_thresholds = {
+            'email_capture': {'roi_min': 50, 'confidence': 0.3},
+            'consultation_booking': {'roi_min': 150, 'confidence': 0.6},
+            'premium_service': {'roi_min': 250, 'confidence': 0.8}
+        }
+    
+    def offer_tier(self, result: Dict) -> str:
+        """OFFER_TIERS key for a calculation result"""
+        roi = result.get('roi', 0)
+        confidence = result.get('monte_carlo', {}).get('probability_positive_roi', 0)
+        
+        if roi >= 250 and confidence >= 0.8:
+            return 'premium'
+        elif roi >= 150 and confidence >= 0.6:
+            return 'standard'
+        return 'starter'
+    
+    def generate_personalized_offer(self, result: Dict, profile: UserProfile, country: CountryData) -> Dict:
+        """Generate personalized offer based on calculation results"""
+        try:
+            tier = self.offer_tier(result)
+            offer = OFFER_TIERS[tier]
+            return {
+                'tier': tier,
+                **offer,
+                'title': offer['title'].format(country=country.name),
+                'includes': list(offer['includes'])
+            }
+        except Exception as e:
+            record_error("Offer generation error", e)
+            return {**FALLBACK_OFFER, 'includes': list(FALLBACK_OFFER['includes'])}
+
+# =========================
+# ADDITIONAL UTILITY FUNCTIONS
+# =========================
+
+def generate_pdf_report(result: Dict, profile: UserProfile, country: CountryData) -> str:
+    """Generate comprehensive PDF report (placeholder for actual implementation)"""
+    return f"PDF report generated for {profile.name} -> {country.name} migration analysis"
+
+def send_to_crm(email: str, profile: str, result: Dict) -> bool:
+    """Send lead data to CRM system (placeholder)"""
+    print(f"CRM: New lead {email} - {profile} - ROI: {result.get('roi', 0):.1f}%")
+    return True
+
+def schedule_consultation(email: str, profile: str, country: str, roi: float) -> str:
+    """Schedule consultation via Calendly API (placeholder)"""
+    return f"https://calendly.com/visatier/consultation?email={email}&profile={profile}"
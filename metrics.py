@@ -0,0 +1,149 @@
+# VisaTier 4.0 - Per-stage timing and throughput metrics
+# Prometheus text exposition format, standard library only
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from tracing import span
+
+# Upper bounds (seconds) of the stage latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Local port of the standalone metrics server started by app.py
+METRICS_PORT = 9464
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+class StageTimer:
+    """Elapsed seconds of a finished stage"""
+    __slots__ = ("seconds",)
+    
+    def __init__(self):
+        self.seconds = 0.0
+
+class MetricsRegistry:
+    """Thread-safe stage latency histograms, counters and gauges.
+    
+    Collectors are called at render time and return (name, type, value, labels)
+    samples, for statistics kept elsewhere such as cache hit counts.
+    """
+    
+    def __init__(self, prefix: str = "visatier", buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self._histograms: Dict[str, List[float]] = {}
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._gauges: Dict[Tuple[str, Tuple], float] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, float, Dict[str, str]]]]] = []
+        self._lock = threading.Lock()
+    
+    def observe(self, stage: str, seconds: float):
+        """Record one call of stage taking seconds"""
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                # Per-bucket counts, then the +Inf bucket, sum and count
+                histogram = self._histograms[stage] = [0] * (len(self.buckets) + 3)
+            histogram[index] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+    
+    @contextmanager
+    def stage(self, stage: str):
+        """Time the body as one call of stage, inside a trace span of the same name.
+        
+        Exceptions are counted and re-raised.
+        """
+        timer = StageTimer()
+        started = time.perf_counter()
+        try:
+            with span(stage):
+                yield timer
+        except BaseException:
+            self.increment("errors_total", stage=stage)
+            raise
+        finally:
+            timer.seconds = time.perf_counter() - started
+            self.observe(stage, timer.seconds)
+    
+    def increment(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+    
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+    
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, str, float, Dict[str, str]]]]):
+        self._collectors.append(collector)
+    
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+    
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            histograms = {stage: list(values) for stage, values in self._histograms.items()}
+            samples = [(name, "counter", value, dict(labels)) for (name, labels), value in self._counters.items()]
+            samples += [(name, "gauge", value, dict(labels)) for (name, labels), value in self._gauges.items()]
+        for collector in self._collectors:
+            samples.extend(collector())
+        
+        lines = []
+        name = f"{self.prefix}_stage_seconds"
+        if histograms:
+            lines += [f"# HELP {name} Latency of each calculation stage", f"# TYPE {name} histogram"]
+        for stage, values in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels({'stage': stage, 'le': bound})} {cumulative}")
+            lines.append(f"{name}_sum{_labels({'stage': stage})} {values[-2]!r}")
+            lines.append(f"{name}_count{_labels({'stage': stage})} {values[-1]}")
+        
+        # Samples sharing a name form one metric family
+        families: Dict[str, Tuple[str, List[str]]] = {}
+        for sample_name, kind, value, labels in samples:
+            full_name = f"{self.prefix}_{sample_name}"
+            families.setdefault(full_name, (kind, []))[1].append(f"{full_name}{_labels(labels)} {float(value)!r}")
+        for full_name, (kind, rows) in sorted(families.items()):
+            lines.append(f"# TYPE {full_name} {kind}")
+            lines.extend(sorted(rows))
+        return "\n".join(lines) + "\n"
+
+METRICS = MetricsRegistry()
+
+def start_metrics_server(registry: MetricsRegistry = METRICS, port: int = METRICS_PORT,
+                         host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve registry at http://host:port/metrics from a daemon thread"""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", METRICS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from api import API_SETTINGS, create_api_app
+from engine import ROI_RESULT_CACHE
+
+SCENARIO = {"profile_id": "tech_startup", "country_key": "UAE"}
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(create_api_app())
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    ROI_RESULT_CACHE.clear()
+    yield
+    ROI_RESULT_CACHE.clear()
+
+def post_roi(client, **settings):
+    return client.post("/api/v1/roi", json={"scenario": SCENARIO, "settings": {"monte_carlo_iterations": 2000, **settings}})
+
+def test_roi_returns_result_and_trace_id(client):
+    response = post_roi(client, monte_carlo_seed=3)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["result"]["scenario"]["country_key"] == "UAE"
+    assert body["result"]["result"]["monte_carlo"]["iterations"] == 2000
+    assert response.headers["X-Trace-Id"]
+
+def test_seeded_requests_replay(client):
+    first = post_roi(client, monte_carlo_seed=3).json()
+    ROI_RESULT_CACHE.clear()
+    assert post_roi(client, monte_carlo_seed=3).json()["result"] == first["result"]
+
+@pytest.mark.parametrize("settings", [
+    {"variance_reduction": 5},
+    {"variance_reduction": ["importance"]},
+    {"global_sensitivity": "false"},
+    {"monte_carlo_seed": -1},
+    {"monte_carlo_seed": 1.5},
+    {"monte_carlo_iterations": "many"},
+    {"monte_carlo_iterations": True},
+    {"sampling": "halton"},
+    {"parallel_workers": 4},
+])
+def test_invalid_settings_are_rejected(client, settings):
+    response = post_roi(client, **settings)
+    assert response.status_code == 422, response.text
+    assert ROI_RESULT_CACHE.stats()["size"] == 0
+
+def test_settings_are_parsed_explicitly():
+    assert API_SETTINGS["global_sensitivity"](False) is False
+    assert API_SETTINGS["monte_carlo_seed"]("42") == 42
+    assert API_SETTINGS["monte_carlo_seed"](None) is None
+    assert API_SETTINGS["monte_carlo_iterations"](5e7) == 1_000_000
+    assert API_SETTINGS["variance_reduction"](["antithetic"]) == ("antithetic",)
+
+def test_invalid_scenario_in_batch_gets_an_error_entry(client):
+    response = client.post("/api/v1/roi", json={
+        "scenarios": [SCENARIO, {"profile_id": "nobody", "country_key": "UAE"}],
+        "settings": {"monte_carlo_iterations": 1000, "monte_carlo_seed": 1}
+    })
+    assert response.status_code == 200
+    first, second = response.json()["results"]
+    assert "result" in first and "error" in second
+
+def test_reference_lists_inputs_and_versions(client):
+    body = client.get("/api/v1/reference").json()
+    assert "UAE" in body["countries"] and "tech_startup" in body["profiles"]
+    assert body["inputs"]["current_margin"]["max"] == 80
+    assert set(body["versions"]) == {"profiles", "countries"}
+
+def test_standalone_app_does_not_import_the_ui():
+    check = "import sys, api; assert api.app.routes; assert not {'gradio', 'plotly'} & set(sys.modules)"
+    subprocess.run([sys.executable, "-c", check], check=True, cwd=os.path.dirname(os.path.abspath(api.__file__)))
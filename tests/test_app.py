@@ -0,0 +1,88 @@
+import asyncio
+import threading
+from dataclasses import replace
+
+import pytest
+
+import app
+from engine import ROI_RESULT_CACHE, ROICalculator, Scenario
+
+INPUTS = ("tech_startup", "UAE", 45000, 25, 25, 15, 4500, 800, 2.5, 8, 75, 60, 12)
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    ROI_RESULT_CACHE.clear()
+    yield
+    ROI_RESULT_CACHE.clear()
+
+def drain(stream):
+    async def collect():
+        return [outputs async for outputs in stream]
+    return asyncio.run(collect())
+
+def deterministic(**country_changes):
+    scenario = Scenario.create("tech_startup", "UAE")
+    country = replace(scenario.country, **country_changes)
+    return ROICalculator()._calculate_deterministic_roi(scenario.profile, country, scenario)
+
+@pytest.mark.parametrize("changes, expected", [
+    # Taxes scaled down and the setup cost up so the IRR lands inside the solver's range
+    ({"corp_tax": 0.00009, "pers_tax": 0.00005, "setup_cost": 1_000_000}, "%"),
+    ({"corp_tax": 0.00009, "pers_tax": 0.00005, "setup_cost": 10}, "> 500%"),
+    ({}, "n/a")
+])
+def test_irr_is_only_shown_when_it_converged(changes, expected):
+    result = deterministic(**changes)
+    assert result["irr_converged"] == (expected == "%")
+    text = app.irr_text(result)
+    assert text.endswith(expected)
+    if result["irr_converged"]:
+        assert text == f"{result['irr_annual']:.1f}%"
+    assert text in app.kpi_html(result)
+
+def test_stream_yields_each_stage_in_order():
+    kpis, preview, monte_carlo, final = drain(app.calculate_advanced_roi(*INPUTS))
+    assert kpis[0]["visible"] and not kpis[1]["visible"]
+    assert "Running Monte Carlo simulation" in kpis[2]["value"]
+    assert "Estimate from" in preview[2]["value"]
+    assert "Running sensitivity analysis" in monte_carlo[2]["value"]
+    assert all(update["visible"] for update in final[:5])
+    assert final[5]["monte_carlo"]["iterations"] == ROICalculator().monte_carlo_iterations
+    
+    # A cached result arrives as the final update alone
+    (cached,) = drain(app.calculate_advanced_roi(*INPUTS))
+    assert cached[5] == final[5]
+
+def test_stream_reports_a_timeout(monkeypatch):
+    monkeypatch.setattr(app, "ANALYSIS_TIMEOUT", 0.0)
+    (outputs,) = drain(app.calculate_advanced_roi(*INPUTS))
+    assert "taking longer than expected" in outputs[0]["value"]
+    assert outputs[5] == {}
+
+def test_abandoned_stream_stops_its_worker(monkeypatch):
+    produced, resumed, finished = [], threading.Event(), threading.Event()
+    stream_advanced_roi = app.stream_advanced_roi
+    
+    def recording(*inputs):
+        try:
+            for index, outputs in enumerate(stream_advanced_roi(*inputs)):
+                # Hold the second stage until the consumer has gone
+                if index:
+                    resumed.wait(10)
+                produced.append(outputs)
+                yield outputs
+        finally:
+            finished.set()
+    monkeypatch.setattr(app, "stream_advanced_roi", recording)
+    
+    async def take_first():
+        stream = app.calculate_advanced_roi(*INPUTS)
+        first = await stream.__anext__()
+        await stream.aclose()
+        resumed.set()
+        return first
+    first = asyncio.run(take_first())
+    assert finished.wait(10)
+    # The worker stops at its next stage boundary, before the Monte Carlo run finishes
+    assert first[0]["visible"] and len(produced) <= 2
+    assert ROI_RESULT_CACHE.stats()["size"] == 0
@@ -0,0 +1,67 @@
+import math
+from dataclasses import replace
+
+import pytest
+
+from engine import ENHANCED_COUNTRIES, ENHANCED_PROFILES, ROICalculator, Scenario
+from tests.test_irr import bisect_irr
+
+def baseline_deterministic(profile, country, scenario):
+    """The original month-by-month calculation the closed-form engine replaced"""
+    current_profit = scenario.current_revenue * (scenario.current_margin / 100)
+    current_after_tax = current_profit * (1 - scenario.current_corp_tax/100) * (1 - scenario.current_pers_tax/100)
+    current_net = current_after_tax - scenario.current_living - scenario.current_business
+    
+    new_revenue = scenario.current_revenue * scenario.revenue_multiplier * profile.success_multiplier
+    new_margin = min(90, scenario.current_margin + scenario.margin_improvement)
+    new_after_tax = new_revenue * (new_margin / 100) * (1 - country.corp_tax * 100) * (1 - country.pers_tax * 100)
+    new_net = new_after_tax - country.living_cost - country.business_cost
+    monthly_delta = (new_net - current_net) * (scenario.success_probability / 100)
+    
+    setup_cost = country.setup_cost
+    monthly_flows, cumulative, payback_month = [], -setup_cost, None
+    for month in range(1, scenario.time_horizon + 1):
+        monthly_flows.append(monthly_delta * country.seasonality[(month - 1) % 12])
+        cumulative += monthly_flows[-1]
+        if payback_month is None and cumulative >= 0:
+            payback_month = month
+    
+    discount_monthly = (1 + scenario.discount_rate/100) ** (1/12) - 1
+    npv = -setup_cost + sum(cf / (1 + discount_monthly) ** month for month, cf in enumerate(monthly_flows, 1))
+    irr = bisect_irr(monthly_flows, setup_cost)
+    return {
+        "npv": npv,
+        "roi": sum(monthly_flows) / setup_cost * 100,
+        "irr_annual": irr * 100 if irr else None,
+        "payback_months": payback_month or math.inf,
+        "monthly_delta": monthly_delta,
+        "monthly_flows": monthly_flows
+    }
+
+# Real countries, plus copies with taxes low and setup costs high enough that payback
+# and IRR land inside the horizon and the solver's range
+COUNTRIES = [
+    *ENHANCED_COUNTRIES.values(),
+    *(replace(country, corp_tax=country.corp_tax / 1000, pers_tax=country.pers_tax / 1000,
+              setup_cost=country.setup_cost * scale)
+      for country in ENHANCED_COUNTRIES.values() for scale in (20, 40, 80))
+]
+
+@pytest.mark.parametrize("profile_key", list(ENHANCED_PROFILES))
+@pytest.mark.parametrize("inputs", [{}, {"time_horizon": 120, "discount_rate": 3}, {"current_revenue": 150_000, "time_horizon": 24}])
+def test_closed_form_matches_baseline(profile_key, inputs):
+    calculator = ROICalculator()
+    profile = ENHANCED_PROFILES[profile_key]
+    for country in COUNTRIES:
+        scenario = Scenario.create(profile_key, next(iter(ENHANCED_COUNTRIES)), **inputs)
+        result = calculator._calculate_deterministic_roi(profile, country, scenario)
+        expected = baseline_deterministic(profile, country, scenario)
+        assert "fallback" not in result
+        for name in ("npv", "roi", "monthly_delta"):
+            assert result[name] == pytest.approx(expected[name], rel=1e-9, abs=1e-6), (country.name, name)
+        assert result["payback_months"] == expected["payback_months"], country.name
+        assert result["monthly_flows"] == pytest.approx(expected["monthly_flows"], rel=1e-12)
+        if expected["irr_annual"] is None:
+            assert (result["irr_annual"], result["irr_converged"]) == (None, False), country.name
+        else:
+            assert result["irr_annual"] == pytest.approx(expected["irr_annual"], abs=1e-6), country.name
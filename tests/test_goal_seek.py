@@ -0,0 +1,53 @@
+import warnings
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import create_api_app
+from engine import ROICalculator, Scenario, get_seasonal_factors, goal_seek, required_monthly_delta
+
+SCENARIO = Scenario.create("tech_startup", "UAE")
+
+def current_npv():
+    return ROICalculator()._calculate_deterministic_roi(SCENARIO.profile, SCENARIO.country, SCENARIO)["npv"]
+
+@pytest.mark.parametrize("name", ["current_revenue", "current_living", "revenue_multiplier", "success_probability"])
+def test_linear_solution_hits_the_target(name):
+    target = current_npv() + 1000
+    outcome = goal_seek(SCENARIO, name, "npv", target)
+    assert (outcome["status"], outcome["method"]) == ("solved", "linear")
+    assert outcome["achieved"]["npv"] == pytest.approx(target, rel=1e-6)
+
+def test_bracketed_solution_meets_the_target_on_the_better_side():
+    target = current_npv() + 1000
+    outcome = goal_seek(SCENARIO, "discount_rate", "npv", target)
+    assert (outcome["status"], outcome["method"], outcome["better"]) == ("solved", "bracket", "higher")
+    assert outcome["achieved"]["npv"] >= target
+
+def test_goal_seek_does_not_fill_the_factor_cache():
+    before = get_seasonal_factors.cache_info().currsize
+    goal_seek(SCENARIO, "discount_rate", "npv", current_npv() + 1000)
+    assert get_seasonal_factors.cache_info().currsize - before <= 1
+
+@pytest.mark.parametrize("target", [-100.0, -150.0])
+def test_irr_targets_at_or_below_minus_100_are_rejected(target):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        with pytest.raises(ValueError):
+            goal_seek(SCENARIO, "revenue_multiplier", "irr_annual", target)
+        with pytest.raises(ValueError):
+            required_monthly_delta(get_seasonal_factors((1.0,) * 12, 10.0, 60), 50_000, "irr_annual", target)
+
+def test_unknown_input_or_metric_is_rejected():
+    with pytest.raises(ValueError):
+        goal_seek(SCENARIO, "weather", "npv", 0)
+    with pytest.raises(ValueError):
+        goal_seek(SCENARIO, "current_revenue", "happiness", 0)
+
+def test_goal_seek_route_solves_and_validates():
+    client = TestClient(create_api_app())
+    payload = {"scenario": {"profile_id": "tech_startup", "country_key": "UAE"},
+               "input": "discount_rate", "metric": "npv", "target": -1e12}
+    assert client.post("/api/v1/goal-seek", json=payload).json()["status"] == "always_met"
+    payload.update(input="revenue_multiplier", metric="irr_annual", target=-100)
+    assert client.post("/api/v1/goal-seek", json=payload).status_code == 422
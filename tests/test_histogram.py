@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+
+from engine import MONTE_CARLO_BINS, rebin_histogram, summary_histogram
+
+@pytest.mark.parametrize("scale, offset", [(1.0, 0.0), (3.0, -5.0), (-2.5, 100.0)])
+def test_rebinned_fine_histogram_matches_the_samples(scale, offset):
+    samples = np.random.default_rng(1).gamma(2.0, 1.0, 200_000)
+    bounds = (float(samples.min()) - 1, float(samples.max()) + 1)
+    fine, _ = np.histogram(samples, bins=MONTE_CARLO_BINS, range=bounds)
+    fine_width = (bounds[1] - bounds[0]) / MONTE_CARLO_BINS
+    
+    rebinned = rebin_histogram(fine, bounds, scale=scale, offset=offset)
+    expected = summary_histogram(samples * scale + offset)
+    # Edges can only be placed to within one fine bin, and counts shift by what that moves
+    np.testing.assert_allclose(rebinned["edges"], expected["edges"], rtol=0, atol=fine_width * abs(scale))
+    np.testing.assert_allclose(rebinned["counts"], expected["counts"], rtol=0, atol=0.001 * len(samples))
+    assert sum(rebinned["counts"]) == len(samples)
+    assert np.all(np.diff(rebinned["edges"]) > 0)
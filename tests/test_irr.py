@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from engine import solve_irr
+
+def npv_at(rate, flows, investment):
+    monthly = (1 + rate) ** (1/12) - 1
+    return -investment + sum(flow / (1 + monthly) ** month for month, flow in enumerate(flows, 1))
+
+def bisect_irr(flows, investment, low=-0.99, high=5.0):
+    """The original scalar bisection, run to full precision"""
+    if npv_at(low, flows, investment) * npv_at(high, flows, investment) > 0:
+        return None
+    for _ in range(200):
+        mid = (low + high) / 2
+        if npv_at(mid, flows, investment) * npv_at(low, flows, investment) > 0:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+@pytest.fixture
+def flows():
+    rng = np.random.default_rng(20240601)
+    seasonality = rng.uniform(0.8, 1.2, 12)
+    return rng.uniform(500, 5000, (8, 1)) * np.resize(seasonality, 60)
+
+def test_single_vector_matches_bisection(flows):
+    investment = flows[0].sum() / 2
+    result = solve_irr(flows[0], investment)
+    assert result.converged.all()
+    assert result.rate[0] == pytest.approx(bisect_irr(flows[0], investment), abs=1e-9)
+
+def test_batch_matches_scalar_solves(flows):
+    # From well inside the payback horizon to never paying back
+    investments = flows.sum(axis=1) * np.linspace(0.2, 1.5, len(flows))
+    batch = solve_irr(flows, investments)
+    for row, investment, rate in zip(flows, investments, batch.rate):
+        assert rate == pytest.approx(bisect_irr(row, investment), abs=1e-9)
+
+def test_shared_flows_with_many_investments(flows):
+    investments = flows[0].sum() * np.array([0.2, 0.5, 0.9])
+    shared = solve_irr(flows[0], investments)
+    separate = [solve_irr(flows[0], investment).rate[0] for investment in investments]
+    np.testing.assert_allclose(shared.rate, separate, rtol=1e-12)
+    assert np.all(np.diff(shared.rate) < 0)
+
+def test_converges_in_a_handful_of_steps(flows):
+    assert solve_irr(flows, flows.sum(axis=1) / 2).iterations <= 12
+
+def test_missing_root_is_reported(flows):
+    # Losses every month never pay back a positive investment
+    result = solve_irr(np.vstack([-flows[0], flows[1]]), flows[1].sum() / 2)
+    assert result.converged.tolist() == [False, True]
+    assert np.isnan(result.rate[0]) and np.isfinite(result.rate[1])
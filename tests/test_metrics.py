@@ -0,0 +1,60 @@
+import pytest
+
+from engine import ROI_RESULT_CACHE, ROICalculator, Scenario, calculate_cached
+from metrics import METRICS, MetricsRegistry
+
+def samples(text):
+    """Sample lines of an exposition as {name with labels: value}"""
+    return {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+            for line in text.splitlines() if line and not line.startswith("#")}
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.1, 0.5, 5.0):
+        registry.observe("chart", seconds)
+    text = registry.render()
+    assert "# TYPE visatier_stage_seconds histogram" in text
+    assert samples(text) == {
+        'visatier_stage_seconds_bucket{stage="chart",le="0.1"}': 2,
+        'visatier_stage_seconds_bucket{stage="chart",le="1.0"}': 3,
+        'visatier_stage_seconds_bucket{stage="chart",le="+Inf"}': 4,
+        'visatier_stage_seconds_sum{stage="chart"}': pytest.approx(5.65),
+        'visatier_stage_seconds_count{stage="chart"}': 4
+    }
+
+def test_failed_stages_are_timed_and_counted():
+    registry = MetricsRegistry()
+    with pytest.raises(RuntimeError):
+        with registry.stage("chart"):
+            raise RuntimeError("boom")
+    rendered = samples(registry.render())
+    assert rendered['visatier_stage_seconds_count{stage="chart"}'] == 1
+    assert rendered['visatier_errors_total{stage="chart"}'] == 1
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.increment("requests_total", route='say "hi"\\now\n')
+    registry.set_gauge("queue_depth", 3, route="/api")
+    text = registry.render()
+    assert 'visatier_requests_total{route="say \\"hi\\"\\\\now\\n"} 1.0' in text
+    assert "# TYPE visatier_queue_depth gauge" in text.splitlines()
+    assert 'visatier_queue_depth{route="/api"} 3.0' in text.splitlines()
+
+def test_cache_collector_reports_the_result_cache():
+    ROI_RESULT_CACHE.clear()
+    calculator = ROICalculator()
+    calculator.monte_carlo_iterations = 1000
+    calculator.monte_carlo_seed = 1
+    scenario = Scenario.create("tech_startup", "UAE")
+    calculate_cached(calculator, scenario)
+    calculate_cached(calculator, scenario)
+    
+    stats = ROI_RESULT_CACHE.stats()
+    text = METRICS.render()
+    rendered = samples(text)
+    for name in ("hits", "misses", "evictions", "expirations"):
+        assert f"# TYPE visatier_result_cache_{name}_total counter" in text
+        assert rendered[f"visatier_result_cache_{name}_total"] == stats[name]
+    assert rendered["visatier_result_cache_size"] == stats["size"] == 1
+    assert rendered["visatier_result_cache_hit_ratio"] == stats["hits"] / (stats["hits"] + stats["misses"])
+    ROI_RESULT_CACHE.clear()
@@ -0,0 +1,81 @@
+import copy
+import json
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from api import to_json_compatible
+from engine import (
+    ROICalculator, Scenario, draw_monthly_deltas, get_monte_carlo_pool, reference_data, shutdown_monte_carlo_pool
+)
+
+SCENARIO = Scenario.create("tech_startup", "UAE")
+
+def simulate(paths=20_000, seed=5, **settings):
+    calc = ROICalculator()
+    calc.monte_carlo_iterations = paths
+    calc.monte_carlo_seed = seed
+    for name, value in settings.items():
+        setattr(calc, name, value)
+    return calc._run_monte_carlo_simulation(SCENARIO.profile, SCENARIO.country, SCENARIO)
+
+@pytest.mark.parametrize("techniques", [("control_variate",), ("antithetic",), ("antithetic", "control_variate")])
+def test_variance_reduction_agrees_with_plain_sampling(techniques):
+    plain = simulate(paths=200_000)
+    reduced = simulate(variance_reduction=techniques)
+    assert "fallback" not in reduced
+    assert reduced["variance_reduction"] == list(techniques)
+    assert reduced["mean_npv"] == pytest.approx(plain["mean_npv"], abs=4 * plain["se_npv"] + 4 * reduced["se_npv"])
+
+def test_control_variate_lowers_the_standard_error():
+    assert simulate(variance_reduction=("control_variate",))["se_npv"] < simulate()["se_npv"]
+
+@pytest.fixture
+def pool():
+    yield get_monte_carlo_pool(2)
+    shutdown_monte_carlo_pool()
+
+def test_pool_rows_are_keyed_on_country_key_and_data(pool):
+    country = reference_data().countries["UAE"]
+    assert pool.row("UAE", copy.deepcopy(country)) == pool.row("UAE", country) is not None
+    assert pool.row("UAE", replace(country, setup_cost=country.setup_cost + 1)) is None
+    assert pool.row("Atlantis", country) is None
+
+def test_parallel_runs_are_identical_for_any_worker_count(pool):
+    runs = [simulate(paths=300_000, parallel_workers=workers) for workers in (2, 3)]
+    assert [run["workers"] for run in runs] == [2, 3]
+    assert runs[0]["mean_roi"] == runs[1]["mean_roi"]
+    assert runs[0]["confidence_intervals"] == runs[1]["confidence_intervals"]
+
+def test_a_broken_pool_is_replaced(pool):
+    expected = simulate(paths=300_000, parallel_workers=2)
+    for process in list(pool._executor._processes.values()):
+        process.kill()
+        process.join()
+    result = simulate(paths=300_000, parallel_workers=2)
+    assert "fallback" not in result
+    assert result["mean_roi"] == expected["mean_roi"]
+    assert get_monte_carlo_pool(2) is not pool
+
+def test_seeded_runs_replay():
+    def run(seed):
+        calc = ROICalculator()
+        calc.monte_carlo_iterations = 5_000
+        calc.monte_carlo_seed = seed
+        return json.dumps(to_json_compatible(calc.calculate_scenario(SCENARIO)), sort_keys=True)
+    assert run(42) == run(42)
+    assert run(42) != run(43)
+
+def test_summary_matches_the_seeded_paths():
+    calc = ROICalculator()
+    result = simulate(paths=50_000, seed=9)
+    country = SCENARIO.country
+    delta = draw_monthly_deltas(np.random.default_rng(9), 50_000, SCENARIO.profile.success_multiplier,
+                                calc._country_params(country), SCENARIO)
+    factors = calc._seasonal_factors(country, SCENARIO)
+    npvs = delta * factors.annuity - country.setup_cost
+    assert result["mean_npv"] == pytest.approx(npvs.mean(), rel=1e-12)
+    assert result["std_npv"] == pytest.approx(npvs.std(), rel=1e-9)
+    assert result["probability_positive_roi"] == np.count_nonzero(delta > 0) / 50_000
+    assert result["confidence_intervals"]["npv_50"] == pytest.approx(np.percentile(npvs, 50), rel=1e-12)
@@ -0,0 +1,34 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from api import create_api_app
+from engine import ENHANCED_COUNTRIES, ROICalculator, Scenario, recommend_destinations
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(create_api_app())
+
+def test_recommendations_match_per_country_results():
+    scenario = Scenario.create("tech_startup", "UAE")
+    calculator = ROICalculator()
+    ranked = recommend_destinations(scenario, k=len(ENHANCED_COUNTRIES))
+    assert ranked["evaluated"] == ranked["eligible"] == len(ENHANCED_COUNTRIES)
+    npvs = [entry["npv"] for entry in ranked["destinations"]]
+    assert npvs == sorted(npvs, reverse=True)
+    for entry in ranked["destinations"]:
+        country = ENHANCED_COUNTRIES[entry["country_key"]]
+        expected = calculator._calculate_deterministic_roi(scenario.profile, country, scenario.replace())
+        assert entry["npv"] == pytest.approx(expected["npv"], rel=1e-12)
+        assert entry["roi"] == pytest.approx(expected["roi"], rel=1e-12)
+        assert entry["payback_months"] == expected["payback_months"]
+
+def test_recommend_ranks_destinations(client):
+    response = client.post("/api/v1/recommend", json={"scenario": {"profile_id": "tech_startup"}, "k": 3, "rank_by": "roi"})
+    assert response.status_code == 200
+    destinations = response.json()["destinations"]
+    assert [entry["rank"] for entry in destinations] == [1, 2, 3]
+    assert [entry["roi"] for entry in destinations] == sorted((entry["roi"] for entry in destinations), reverse=True)
+
+def test_recommend_rejects_unknown_ranking(client):
+    response = client.post("/api/v1/recommend", json={"scenario": {"profile_id": "tech_startup"}, "rank_by": "vibes"})
+    assert response.status_code == 422
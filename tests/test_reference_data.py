@@ -0,0 +1,100 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pytest
+
+import engine
+from engine import (
+    REFERENCE_DATA_PATH, MonteCarloPool, Scenario, data_version, get_country_table, load_reference_data,
+    reference_data, reload_reference_data
+)
+
+@pytest.fixture
+def data_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(engine, "COMPILED_DATA_DIR", str(tmp_path / "compiled"))
+    path = tmp_path / "data" / "reference_data.json"
+    path.parent.mkdir()
+    shutil.copy(REFERENCE_DATA_PATH, path)
+    return path
+
+def bump_setup_cost(path, country_key, amount):
+    document = json.loads(path.read_text())
+    document["countries"][country_key]["setup_cost"] += amount
+    path.write_text(json.dumps(document))
+
+def test_matrix_is_mapped_outside_the_data_directory(data_file):
+    reference = load_reference_data(str(data_file))
+    assert os.listdir(data_file.parent) == ["reference_data.json"]
+    assert os.path.dirname(reference.matrix_path) == engine.COMPILED_DATA_DIR
+    assert isinstance(reference.table.matrix, np.memmap)
+
+def test_superseded_versions_stay_until_they_age_out(data_file):
+    first = load_reference_data(str(data_file))
+    bump_setup_cost(data_file, "UAE", 1000)
+    second = load_reference_data(str(data_file))
+    assert first.version != second.version
+    assert second.countries["UAE"].setup_cost == first.countries["UAE"].setup_cost + 1000
+    assert os.path.exists(first.matrix_path)
+    
+    idle = time.time() - engine.COMPILED_MAX_AGE - 60
+    os.utime(first.matrix_path, (idle, idle))
+    load_reference_data(str(data_file))
+    assert os.listdir(engine.COMPILED_DATA_DIR) == [os.path.basename(second.matrix_path)]
+
+def test_pool_starts_after_another_process_reloads(data_file):
+    reference = load_reference_data(str(data_file))
+    bump_setup_cost(data_file, "UAE", 1000)
+    environment = {**os.environ, "VISATIER_REFERENCE_DATA": str(data_file),
+                   "VISATIER_COMPILED_DIR": engine.COMPILED_DATA_DIR}
+    subprocess.run([sys.executable, "-c", "import engine"], check=True, env=environment,
+                   cwd=os.path.dirname(os.path.abspath(engine.__file__)))
+    assert len(os.listdir(engine.COMPILED_DATA_DIR)) == 2
+    assert_pool_simulates(reference)
+
+def test_pool_copies_the_matrix_once_its_file_is_gone(data_file):
+    reference = load_reference_data(str(data_file))
+    os.remove(reference.matrix_path)
+    assert_pool_simulates(reference)
+
+def assert_pool_simulates(reference):
+    scenario = Scenario.create("tech_startup", "UAE")
+    pool = MonteCarloPool(2, reference)
+    try:
+        row = pool.row("UAE", reference.countries["UAE"])
+        shards = pool.map(engine._monte_carlo_shard, [1, 2], [1000, 1000], [row, row],
+                          [1.0, 1.0], [scenario, scenario], [(-1e7, 1e7)] * 2)
+    finally:
+        pool.close()
+    assert [shard["count"] for shard in shards] == [1000, 1000]
+    assert all(shard["histogram"].sum() == 1000 for shard in shards)
+
+def test_other_data_files_keep_their_matrices(data_file, tmp_path):
+    other = tmp_path / "other.json"
+    shutil.copy(data_file, other)
+    bump_setup_cost(other, "UAE", 500)
+    load_reference_data(str(other))
+    load_reference_data(str(data_file))
+    assert len(os.listdir(engine.COMPILED_DATA_DIR)) == 2
+
+def test_unwritable_directory_falls_back_to_memory(data_file, monkeypatch):
+    blocker = data_file.parent / "not-a-directory"
+    blocker.write_text("")
+    monkeypatch.setattr(engine, "COMPILED_DATA_DIR", str(blocker / "compiled"))
+    reference = load_reference_data(str(data_file))
+    assert reference.matrix_path is None
+    assert reference.table.matrix.shape[0] == len(reference.countries)
+
+def test_data_version_follows_reloads(data_file):
+    original = reference_data()
+    bump_setup_cost(data_file, "UAE", 1000)
+    try:
+        reloaded = reload_reference_data(str(data_file))
+        assert data_version() == reloaded.version == get_country_table().version != original.version
+    finally:
+        reload_reference_data(original.path)
+    assert data_version() == original.version
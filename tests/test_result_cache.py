@@ -0,0 +1,68 @@
+import pytest
+
+import engine
+from engine import ROI_RESULT_CACHE, ROICalculator, ResultCache, Scenario, calculate_cached, iter_cached
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    ROI_RESULT_CACHE.clear()
+    yield
+    ROI_RESULT_CACHE.clear()
+
+def calculator(seed=1, paths=2_000):
+    calc = ROICalculator()
+    calc.monte_carlo_seed = seed
+    calc.monte_carlo_iterations = paths
+    return calc
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(engine.time, "monotonic", lambda: now[0])
+    cache = ResultCache(ttl=10)
+    cache.put("a", 1)
+    now[0] = 109.0
+    assert cache.get("a") == 1
+    now[0] = 111.0
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+def test_invalidate_drops_matching_keys():
+    cache = ResultCache()
+    for key in ("ua", "ub", "x"):
+        cache.put(key, key)
+    assert cache.invalidate(lambda key: key.startswith("u")) == 2
+    assert cache.stats()["size"] == 1
+
+def test_calculate_cached_returns_the_stored_result():
+    scenario = Scenario.create("tech_startup", "UAE")
+    first = calculate_cached(calculator(), scenario)
+    # The hit counter is monotonic across clear(), so count from here
+    hits = ROI_RESULT_CACHE.stats()["hits"]
+    assert calculate_cached(calculator(), scenario) is first
+    assert ROI_RESULT_CACHE.stats()["hits"] == hits + 1
+
+def test_stream_fills_the_cache_for_calculate_cached():
+    scenario = Scenario.create("tech_startup", "UAE")
+    stages = [stage for stage, _ in iter_cached(calculator(), scenario, preview_paths=500)]
+    assert stages == ["deterministic", "monte_carlo_preview", "monte_carlo", "complete"]
+    assert [stage for stage, _ in iter_cached(calculator(), scenario)] == ["complete"]
+
+def test_fallback_results_are_not_cached():
+    # default_rng rejects negative seeds, so the Monte Carlo stage falls back
+    scenario = Scenario.create("tech_startup", "UAE")
+    result = calculate_cached(calculator(seed=-1), scenario)
+    assert result["fallback"] and result["monte_carlo"]["fallback"]
+    list(iter_cached(calculator(seed=-1), scenario))
+    assert ROI_RESULT_CACHE.stats()["size"] == 0
+    assert "fallback" not in calculate_cached(calculator(), scenario)
+    assert ROI_RESULT_CACHE.stats()["size"] == 1
@@ -0,0 +1,52 @@
+import dataclasses
+import math
+
+import pytest
+
+from engine import Scenario
+
+SCENARIO = Scenario.create("tech_startup", "UAE", current_revenue=52_000.5, time_horizon=84, discount_rate=7.25)
+
+def test_bytes_round_trip():
+    data = SCENARIO.to_bytes()
+    assert Scenario.from_bytes(data) == SCENARIO
+    assert Scenario.from_bytes(data).to_bytes() == data
+    assert isinstance(Scenario.from_bytes(data).time_horizon, int)
+
+def test_json_round_trip():
+    assert Scenario.from_json(SCENARIO.to_json()) == SCENARIO
+    assert Scenario.from_json(SCENARIO.to_json()).to_json() == SCENARIO.to_json()
+
+def test_digest_is_stable_and_tracks_every_input():
+    # A change to the binary encoding changes every digest and orphans stored keys
+    pinned = Scenario.create("tech_startup", "UAE", 45000, 25, 25, 15, 4500, 800, 2.5, 8, 75, 60, 12)
+    assert pinned.digest() == "6833da18e891d404"
+    assert SCENARIO.digest() == Scenario.from_bytes(SCENARIO.to_bytes()).digest()
+    digests = {SCENARIO.digest(), SCENARIO.replace(current_revenue=52_000).digest(),
+               Scenario.create("consulting", "UAE").digest(), Scenario.create("tech_startup", "Estonia").digest()}
+    assert len(digests) == 4
+
+def test_equal_inputs_make_equal_keys():
+    raw = Scenario.create("tech_startup", "UAE", "45000", 25, current_living=4500.0, time_horizon=60.0)
+    default = Scenario.create("tech_startup", "UAE")
+    assert raw == default and hash(raw) == hash(default)
+    assert {default: "cached"}[raw] == "cached"
+    assert SCENARIO != default and SCENARIO.replace(current_revenue=45_000, time_horizon=60, discount_rate=12) == default
+
+def test_out_of_range_inputs_are_clamped_before_hashing():
+    clamped = Scenario.create("tech_startup", "UAE", current_margin=95, success_probability=-3)
+    assert (clamped.current_margin, clamped.success_probability) == (80, 10)
+    assert clamped == Scenario.create("tech_startup", "UAE", current_margin=80, success_probability=10)
+
+def test_negative_zero_is_normalized():
+    negative = Scenario.create("tech_startup", "UAE", margin_improvement=-0.0, current_corp_tax=-0.0)
+    positive = Scenario.create("tech_startup", "UAE", margin_improvement=0.0, current_corp_tax=0.0)
+    assert math.copysign(1, negative.margin_improvement) == 1
+    assert math.copysign(1, negative.current_corp_tax) == 1
+    assert negative.to_bytes() == positive.to_bytes()
+    assert negative.digest() == positive.digest() and hash(negative) == hash(positive)
+
+def test_scenarios_are_immutable_and_slotted():
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        SCENARIO.current_revenue = 1
+    assert not hasattr(SCENARIO, "__dict__")
@@ -0,0 +1,43 @@
+import math
+
+import numpy as np
+import pytest
+
+from engine import ENHANCED_PROFILES, GRID_AXES, ROICalculator, Scenario, evaluate_scenario_grid
+
+# A current living cost this high makes the moves to UAE gain a little for some revenue
+# multipliers, so those rows carry an IRR inside the solver's range
+BASE = Scenario.create("tech_startup", "UAE", current_living=1_000_000)
+AXES = {
+    "revenue_multiplier": np.linspace(0.5, 10, 96),
+    "success_probability": [10, 55, 100],
+    "time_horizon": [12, 60, 120],
+    "discount_rate": [1, 12]
+}
+
+@pytest.fixture(scope="module")
+def grid():
+    return evaluate_scenario_grid(BASE, **AXES)
+
+def test_rows_match_the_deterministic_calculation(grid):
+    with_irr = np.flatnonzero(grid["irr_annual"].notna())
+    assert len(with_irr) > 100
+    sample = np.random.default_rng(4).choice(len(grid), 300, replace=False)
+    calculator = ROICalculator()
+    for index in [*with_irr, *sample]:
+        row = grid.iloc[index]
+        scenario = Scenario.create(row["profile"], row["country"],
+                                   **{**BASE.inputs(), **{name: row[name] for name in GRID_AXES}})
+        expected = calculator._calculate_deterministic_roi(scenario.profile, scenario.country, scenario)
+        for name in ("monthly_delta", "npv", "roi"):
+            assert row[name] == pytest.approx(expected[name], rel=1e-9, abs=1e-6), (index, name)
+        assert row["payback_months"] == expected["payback_months"], index
+        if expected["irr_converged"]:
+            assert row["irr_annual"] == pytest.approx(expected["irr_annual"], rel=1e-9, abs=1e-9), index
+        else:
+            assert math.isnan(row["irr_annual"]), index
+
+def test_empty_selections_give_an_empty_grid():
+    assert evaluate_scenario_grid(BASE, profiles=[]).empty
+    assert evaluate_scenario_grid(BASE, countries=[]).empty
+    assert len(evaluate_scenario_grid(BASE, countries=["UAE"])) == len(ENHANCED_PROFILES)
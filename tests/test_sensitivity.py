@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from engine import ROICalculator, Scenario, normal_ppf, shocked_monthly_deltas
+
+SCENARIO = Scenario.create("tech_startup", "UAE")
+
+@pytest.mark.parametrize("inputs", [
+    {},
+    # At the limits, so the horizon, discount rate and success probability bounds are clamped
+    {"time_horizon": 120, "discount_rate": 1, "success_probability": 100, "current_corp_tax": 2}
+])
+def test_tornado_rows_match_the_deterministic_calculation(inputs):
+    scenario = SCENARIO.replace(**inputs)
+    calculator = ROICalculator()
+    tornado = calculator._perform_sensitivity_analysis(scenario.profile, scenario.country, scenario)
+    assert {row["input"] for row in tornado} == set(scenario.inputs())
+    swings = [row["roi_swing"] for row in tornado]
+    assert swings == sorted(swings, reverse=True)
+    for row in tornado:
+        for side in ("low", "high"):
+            moved = scenario.replace(**{row["input"]: row[f"{side}_value"]})
+            assert getattr(moved, row["input"]) == row[f"{side}_value"]
+            expected = calculator._calculate_deterministic_roi(scenario.profile, scenario.country, moved)
+            assert row[f"roi_{side}"] == pytest.approx(expected["roi"], rel=1e-9), (row["input"], side)
+            assert row[f"npv_{side}"] == pytest.approx(expected["npv"], rel=1e-9), (row["input"], side)
+    if inputs:
+        bounds = {row["input"]: (row["low_value"], row["high_value"]) for row in tornado}
+        assert bounds["time_horizon"] == (108, 120)
+        assert bounds["discount_rate"] == (1, 3)
+        assert bounds["success_probability"] == (90, 100)
+        assert bounds["current_corp_tax"] == (0, 7)
+
+def brute_force_indices(nodes=80):
+    """Sobol indices of the monthly delta (ROI is proportional to it) from a full
+    grid of equal-probability nodes per shock"""
+    z = normal_ppf((np.arange(nodes) + 0.5) / nodes)
+    shocks = np.stack(np.meshgrid(z, z, z, indexing='ij')).reshape(3, -1)
+    params = ROICalculator._country_params(SCENARIO.country)
+    delta = shocked_monthly_deltas(shocks, SCENARIO.profile.success_multiplier, params, SCENARIO)
+    delta = delta.reshape(nodes, nodes, nodes)
+    variance = delta.var()
+    others = [(1, 2), (0, 2), (0, 1)]
+    first_order = [delta.mean(axis=axes).var() / variance for axes in others]
+    total = [delta.var(axis=axis).mean() / variance for axis in range(3)]
+    return first_order, total
+
+def test_global_indices_match_brute_force():
+    result = ROICalculator().calculate_global_sensitivity(SCENARIO, samples=2 ** 14, seed=3)
+    first_order, total = brute_force_indices()
+    names = ("revenue_shock", "margin_shock", "success_shock")
+    assert [result["first_order"][name] for name in names] == pytest.approx(first_order, abs=0.01)
+    assert [result["total"][name] for name in names] == pytest.approx(total, abs=0.01)
+    assert result["evaluations"] == 5 * 2 ** 14
+    assert result["interaction"] == pytest.approx(1 - sum(first_order), abs=0.02)
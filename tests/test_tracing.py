@@ -0,0 +1,95 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+
+import pytest
+
+import tracing
+from tracing import current_trace_id, record_error, span, trace_request
+
+class Records(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+    
+    def emit(self, record):
+        self.records.append(json.loads(record.getMessage()))
+
+@pytest.fixture
+def emitted(monkeypatch):
+    """Written trace lines; nothing is sampled and nothing counts as slow unless a test says so"""
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(tracing, "TRACE_SLOW_SECONDS", 3600.0)
+    handler = Records()
+    tracing.logger.addHandler(handler)
+    yield handler.records
+    tracing.logger.removeHandler(handler)
+
+def test_sampled_out_traces_emit_nothing(emitted):
+    with trace_request("roi"):
+        with span("chart"):
+            pass
+    assert emitted == []
+
+def test_sampled_traces_are_written(emitted, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+    with trace_request("roi"):
+        pass
+    assert [(record["name"], record["kept"]) for record in emitted] == [("roi", "sampled")]
+
+def test_slow_traces_are_always_kept(emitted, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SLOW_SECONDS", 0.0)
+    with trace_request("roi"):
+        pass
+    assert emitted[0]["kept"] == "slow"
+
+def test_error_traces_are_always_kept(emitted):
+    with pytest.raises(ValueError):
+        with trace_request("roi"):
+            with span("chart"):
+                raise ValueError("bad input")
+    with trace_request("roi"):
+        record_error("Fallback used", stage="monte_carlo")
+    
+    raised, recorded = emitted[:2], emitted[2:]
+    assert [record["status"] for record in raised] == ["error", "error"]
+    assert raised[0]["kept"] == "error" and raised[1]["events"][0]["error_type"] == "ValueError"
+    assert recorded[0]["kept"] == "error"
+    assert recorded[0]["events"] == [{"message": "Fallback used", "stage": "monte_carlo"}]
+
+def test_spans_nest_under_the_request_trace(emitted, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+    with trace_request("roi", country="UAE") as root:
+        trace_id = current_trace_id()
+        with span("calculation"):
+            with span("monte_carlo", paths=100):
+                pass
+            # A request started inside another one joins it as a span
+            with trace_request("recommend"):
+                assert current_trace_id() == trace_id
+    assert current_trace_id() is None
+    
+    by_name = {record["name"]: record for record in emitted}
+    assert {record["trace_id"] for record in emitted} == {trace_id}
+    assert by_name["roi"]["parent_id"] is None and by_name["roi"]["span_id"] == root.span_id
+    assert by_name["roi"]["attributes"] == {"country": "UAE"}
+    assert by_name["calculation"]["parent_id"] == root.span_id
+    assert by_name["monte_carlo"]["parent_id"] == by_name["calculation"]["span_id"]
+    assert by_name["recommend"]["parent_id"] == by_name["calculation"]["span_id"]
+    assert "kept" not in by_name["calculation"]
+
+def test_errors_outside_a_request_are_written_at_once(emitted):
+    record_error("Reload failed", path="data.json")
+    assert emitted == [{"trace_id": None, "timestamp": emitted[0]["timestamp"], "status": "error",
+                        "events": [{"message": "Reload failed", "path": "data.json"}]}]
+
+@pytest.mark.parametrize("rate, lines", [("0", 0), ("1", 1)])
+def test_sample_rate_comes_from_the_environment(rate, lines):
+    script = "from tracing import trace_request\nwith trace_request('roi'):\n    pass\n"
+    environment = {**os.environ, "VISATIER_TRACE_SAMPLE_RATE": rate}
+    environment.pop("VISATIER_TRACE_FILE", None)
+    completed = subprocess.run([sys.executable, "-c", script], env=environment, capture_output=True, text=True,
+                               check=True, cwd=os.path.dirname(os.path.abspath(tracing.__file__)))
+    assert len(completed.stderr.splitlines()) == lines
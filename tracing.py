@@ -0,0 +1,167 @@
+# VisaTier 4.0 - Request tracing with tail-sampled JSON-lines logs
+#
+# Every request gets a trace id and records its nested spans in memory, which
+# costs a few list appends. When the request ends the trace is written out as
+# one JSON line per span if it was sampled, slow, or recorded an error;
+# otherwise it is dropped. Errors outside any request are written immediately.
+#
+# Environment: VISATIER_TRACE_SAMPLE_RATE (fraction of requests kept, default 0.01),
+# VISATIER_TRACE_SLOW_MS (requests at least this slow are always kept, default 2000),
+# VISATIER_TRACE_FILE (append to this file instead of stderr).
+
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+TRACE_SAMPLE_RATE = float(os.environ.get("VISATIER_TRACE_SAMPLE_RATE", "0.01"))
+TRACE_SLOW_SECONDS = float(os.environ.get("VISATIER_TRACE_SLOW_MS", "2000")) / 1000
+
+logger = logging.getLogger("visatier.trace")
+
+class Span:
+    __slots__ = ("span_id", "parent_id", "name", "attributes", "events", "status", "start", "duration")
+    
+    def __init__(self, span_id: int, parent_id: Optional[int], name: str, attributes: Dict):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.events: List[Dict] = []
+        self.status = "ok"
+        self.start = time.perf_counter()
+        self.duration = 0.0
+
+class Trace:
+    """Spans of one request; written out or dropped when the request ends"""
+    __slots__ = ("trace_id", "sampled", "failed", "started_at", "spans", "_next_span_id")
+    
+    def __init__(self, sampled: bool):
+        self.trace_id = f"{random.getrandbits(64):016x}"
+        self.sampled = sampled
+        self.failed = False
+        self.started_at = time.time()
+        self.spans: List[Span] = []
+        self._next_span_id = 0
+    
+    def new_span_id(self) -> int:
+        self._next_span_id += 1
+        return self._next_span_id
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("visatier_trace", default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar("visatier_span", default=None)
+
+def configure_tracing(sample_rate: Optional[float] = None, slow_seconds: Optional[float] = None,
+                      handler: Optional[logging.Handler] = None):
+    """Override the sampling rate, slow threshold or output handler set from the environment"""
+    global TRACE_SAMPLE_RATE, TRACE_SLOW_SECONDS
+    if sample_rate is not None:
+        TRACE_SAMPLE_RATE = sample_rate
+    if slow_seconds is not None:
+        TRACE_SLOW_SECONDS = slow_seconds
+    if handler is not None:
+        for existing in list(logger.handlers):
+            logger.removeHandler(existing)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace is not None else None
+
+def _emit(record: Dict):
+    logger.info(json.dumps(record, default=str))
+
+def _error_event(message: str, error: Optional[BaseException], attributes: Dict) -> Dict:
+    event = {"message": message, **attributes}
+    if error is not None:
+        event["error_type"] = type(error).__name__
+        event["error"] = str(error)
+        event["traceback"] = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+    return event
+
+def _write_trace(trace: Trace, root: Span, reason: str):
+    for record in sorted(trace.spans, key=lambda s: s.start):
+        offset = record.start - root.start
+        _emit({
+            "trace_id": trace.trace_id,
+            "span_id": record.span_id,
+            "parent_id": record.parent_id,
+            "name": record.name,
+            "timestamp": trace.started_at + offset,
+            "start_ms": round(offset * 1000, 3),
+            "duration_ms": round(record.duration * 1000, 3),
+            "status": record.status,
+            "attributes": record.attributes,
+            "events": record.events,
+            **({"kept": reason} if record.parent_id is None else {})
+        })
+
+@contextmanager
+def span(name: str, **attributes):
+    """Nested span of the current request; a no-op outside a request"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    record = Span(trace.new_span_id(), parent.span_id if parent is not None else None, name, attributes)
+    token = _current_span.set(record)
+    try:
+        yield record
+    except BaseException as e:
+        record.status = "error"
+        record.events.append(_error_event(f"{name} raised", e, {}))
+        trace.failed = True
+        raise
+    finally:
+        record.duration = time.perf_counter() - record.start
+        _current_span.reset(token)
+        trace.spans.append(record)
+
+@contextmanager
+def trace_request(name: str, **attributes):
+    """Root span of a request; nested calls become ordinary spans"""
+    if _current_trace.get() is not None:
+        with span(name, **attributes) as record:
+            yield record
+        return
+    
+    trace = Trace(sampled=random.random() < TRACE_SAMPLE_RATE)
+    token = _current_trace.set(trace)
+    try:
+        with span(name, **attributes) as root:
+            yield root
+    finally:
+        _current_trace.reset(token)
+        if trace.failed:
+            _write_trace(trace, root, "error")
+        elif root.duration >= TRACE_SLOW_SECONDS:
+            _write_trace(trace, root, "slow")
+        elif trace.sampled:
+            _write_trace(trace, root, "sampled")
+
+def record_error(message: str, error: Optional[BaseException] = None, **attributes):
+    """Attach an error to the current span and keep its trace; written at once outside a request"""
+    event = _error_event(message, error, attributes)
+    trace = _current_trace.get()
+    if trace is None:
+        _emit({"trace_id": None, "timestamp": time.time(), "status": "error", "events": [event]})
+        return
+    trace.failed = True
+    record = _current_span.get()
+    if record is not None:
+        record.status = "error"
+        record.events.append(event)
+
+if not logger.handlers:
+    trace_file = os.environ.get("VISATIER_TRACE_FILE")
+    configure_tracing(handler=logging.FileHandler(trace_file) if trace_file else logging.StreamHandler(sys.stderr))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False